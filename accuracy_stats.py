@@ -0,0 +1,345 @@
+# accuracy_stats.py (PRE-AGGREGATED MODEL ACCURACY ROLLUPS)
+#
+# Every stored round is scored against the probabilities stored with it (same
+# argmax rules as the dashboard and replay) and folded into per-game summary
+# documents for its minute, hour and day. A summary holds, per target, the
+# round count, hits, Brier and log-loss sums and a 10-bin calibration table,
+# so any time window is answered by summing a bounded number of buckets
+# instead of scanning game_results.
+#
+#      python accuracy_stats.py rebuild [--game WinGo_1M] [--batch-size 2000]
+
+import argparse
+import asyncio
+import datetime
+import math
+import re
+from collections import Counter
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from games import GAMES, game_filter
+from jsonlog import log
+
+STATS_COLLECTION_NAME = "accuracy_stats"
+
+TARGETS = ("color", "size", "number")
+RESOLUTIONS = ("minute", "hour", "day")
+CALIBRATION_BINS = 10     # Confidence of the predicted class, in 0.1 wide bins
+LOG_LOSS_EPS = 1e-15      # Clip for log(0) when the true class got probability 0
+
+# Only the fields scoring needs
+STATS_PROJECTION = {
+    "_id": 0, "game_code": 1, "timestamp": 1, "number": 1, "color": 1, "size": 1,
+    "prob_red": 1, "prob_green": 1, "prob_violet": 1,
+    "prob_size_big": 1, "prob_size_small": 1, "prob_numbers": 1,
+}
+
+STATS_INDEXES = [
+    ([("game_code", ASCENDING), ("resolution", ASCENDING), ("bucket_start", ASCENDING)],
+     {"name": "game_resolution_bucket_unique", "unique": True}),
+    ([("resolution", ASCENDING), ("bucket_start", ASCENDING)], {"name": "resolution_bucket"}),  # All-games windows
+]
+
+
+async def ensure_stats_indexes(stats):
+    for keys, options in STATS_INDEXES:
+        await stats.create_index(keys, **options)
+
+
+# -------------------- Scoring --------------------
+
+def _target_probs(doc):
+    """(probabilities by class, actual class) per target; targets without stored probabilities are left out."""
+    targets = {}
+
+    color = (doc.get("color") or "").lower()
+    if doc.get("prob_red") is not None and color:
+        targets["color"] = ({"red": doc.get("prob_red") or 0.0, "green": doc.get("prob_green") or 0.0,
+                             "violet": doc.get("prob_violet") or 0.0}, color)
+
+    size = (doc.get("size") or "").lower()
+    if doc.get("prob_size_big") is not None and size:
+        big = doc["prob_size_big"]
+        small = doc.get("prob_size_small")
+        targets["size"] = ({"big": big, "small": 1.0 - big if small is None else small}, size)
+
+    number = doc.get("number")
+    if doc.get("prob_numbers") and number is not None and str(number).isdigit():
+        targets["number"] = ({str(k): v for k, v in doc["prob_numbers"].items()}, str(int(number)))
+
+    return targets
+
+
+def _predicted(target, probs):
+    if target == "size":
+        return "big" if probs["big"] > 0.5 else "small"  # Dashboard rule (ties go to small)
+    return max(probs, key=probs.get)
+
+
+def score_round(doc):
+    """
+    {target: (hit, brier, log_loss, confidence)} for one stored round.
+    Brier is the multi-class form, sum over classes of (p - y)^2; confidence
+    is the probability of the predicted class.
+    """
+    scores = {}
+    for target, (probs, actual) in _target_probs(doc).items():
+        predicted = _predicted(target, probs)
+        brier = sum((p - (cls == actual)) ** 2 for cls, p in probs.items())
+        if actual not in probs:
+            brier += 1.0
+        log_loss = -math.log(max(probs.get(actual, 0.0), LOG_LOSS_EPS))
+        scores[target] = (predicted == actual, brier, log_loss, probs[predicted])
+    return scores
+
+
+def calibration_bin(confidence):
+    return min(max(int(confidence * CALIBRATION_BINS), 0), CALIBRATION_BINS - 1)
+
+
+def round_increments(doc):
+    """Flat $inc document adding one round to a summary bucket (empty if nothing can be scored)."""
+    scores = score_round(doc)
+    if not scores:
+        return {}
+    inc = {"rounds": 1}
+    for target, (hit, brier, log_loss, confidence) in scores.items():
+        prefix = f"targets.{target}"
+        calib = f"{prefix}.calibration.{calibration_bin(confidence)}"
+        inc[f"{prefix}.n"] = 1
+        inc[f"{prefix}.hits"] = int(hit)
+        inc[f"{prefix}.brier_sum"] = brier
+        inc[f"{prefix}.log_loss_sum"] = log_loss
+        inc[f"{calib}.n"] = 1
+        inc[f"{calib}.hits"] = int(hit)
+        inc[f"{calib}.confidence_sum"] = confidence
+    return inc
+
+
+# -------------------- Buckets --------------------
+
+def bucket_start(ts, resolution):
+    if resolution == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+RESOLUTION_STEPS = {
+    "minute": datetime.timedelta(minutes=1),
+    "hour": datetime.timedelta(hours=1),
+    "day": datetime.timedelta(days=1),
+}
+
+
+def accumulate(updates, doc):
+    """Fold one round into `updates`: (game_code, resolution, bucket_start) -> Counter of $inc fields."""
+    ts = doc.get("timestamp")
+    inc = round_increments(doc) if isinstance(ts, datetime.datetime) else {}
+    if not inc:
+        return False
+    ts = ts.replace(tzinfo=None)
+    for resolution in RESOLUTIONS:
+        key = (doc.get("game_code"), resolution, bucket_start(ts, resolution))
+        updates.setdefault(key, Counter()).update(inc)
+    return True
+
+
+async def record_rounds(stats, docs):
+    """
+    Add newly stored rounds to their buckets: one upserted $inc per touched
+    bucket, however many rounds the batch holds. Call only for rounds that
+    were actually inserted (duplicates would be counted twice).
+    """
+    updates = {}
+    for doc in docs:
+        accumulate(updates, doc)
+    await asyncio.gather(*(
+        stats.update_one({"game_code": game_code, "resolution": resolution, "bucket_start": start},
+                         {"$inc": dict(inc)}, upsert=True)
+        for (game_code, resolution, start), inc in updates.items()
+    ))
+    return len(updates)
+
+
+def stats_recorder(stats):
+    """`on_written` hook for WriteBehindWriter: a failed rollup update never fails the round write."""
+    async def on_written(docs):
+        try:
+            await record_rounds(stats, docs)
+        except PyMongoError as e:
+            log("stats_update_failed", "error", rounds=len(docs), error=str(e),
+                hint="run `python accuracy_stats.py rebuild`")
+    return on_written
+
+
+# -------------------- Window queries --------------------
+
+WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_window(value):
+    """'15m' / '6h' / '7d' -> seconds (ValueError otherwise)."""
+    match = re.fullmatch(r"(\d+)([mhd])", (value or "").strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid window {value!r}; use e.g. 15m, 6h or 7d.")
+    return int(match.group(1)) * WINDOW_UNITS[match.group(2)]
+
+
+def _ceil(ts, resolution):
+    start = bucket_start(ts, resolution)
+    return start if start == ts else start + RESOLUTION_STEPS[resolution]
+
+
+def cover_window(start, end):
+    """
+    Split [start, end) (minute aligned) into the fewest minute/hour/day
+    buckets: [(resolution, first bucket_start, last bucket_start), ...].
+    """
+    first_hour, last_hour = _ceil(start, "hour"), bucket_start(end, "hour")
+    first_day, last_day = _ceil(start, "day"), bucket_start(end, "day")
+    if first_day < last_day:
+        bounds = [("minute", start, first_hour), ("hour", first_hour, first_day), ("day", first_day, last_day),
+                  ("hour", last_day, last_hour), ("minute", last_hour, end)]
+    elif first_hour < last_hour:
+        bounds = [("minute", start, first_hour), ("hour", first_hour, last_hour), ("minute", last_hour, end)]
+    else:
+        bounds = [("minute", start, end)]
+    return [(resolution, lo, hi - RESOLUTION_STEPS[resolution]) for resolution, lo, hi in bounds if hi > lo]
+
+
+def _merge(total, doc):
+    total["rounds"] += doc.get("rounds", 0)
+    for target, values in (doc.get("targets") or {}).items():
+        t = total["targets"].setdefault(target, {"n": 0, "hits": 0, "brier_sum": 0.0, "log_loss_sum": 0.0,
+                                                 "calibration": {}})
+        for field in ("n", "hits", "brier_sum", "log_loss_sum"):
+            t[field] += values.get(field, 0)
+        for b, cell in (values.get("calibration") or {}).items():
+            c = t["calibration"].setdefault(int(b), {"n": 0, "hits": 0, "confidence_sum": 0.0})
+            for field in c:
+                c[field] += cell.get(field, 0)
+
+
+def summarize(total):
+    """Means and the reliability table from summed bucket counters."""
+    targets = {}
+    for target, t in total["targets"].items():
+        n = t["n"]
+        targets[target] = {
+            "rounds": n,
+            "accuracy": round(t["hits"] / n, 4) if n else None,
+            "brier": round(t["brier_sum"] / n, 4) if n else None,
+            "log_loss": round(t["log_loss_sum"] / n, 4) if n else None,
+            "calibration": [
+                {"bin": f"{b / CALIBRATION_BINS:.1f}-{(b + 1) / CALIBRATION_BINS:.1f}", "rounds": c["n"],
+                 "mean_confidence": round(c["confidence_sum"] / c["n"], 4),
+                 "accuracy": round(c["hits"] / c["n"], 4)}
+                for b, c in sorted(t["calibration"].items()) if c["n"]
+            ],
+        }
+    return {"rounds": total["rounds"], "targets": targets}
+
+
+async def window_stats(stats, seconds, game=None, now=None):
+    """Accuracy over the last `seconds` (whole minutes, current minute included) from the rollups."""
+    now = now or datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    end = bucket_start(now, "minute") + RESOLUTION_STEPS["minute"]
+    start = end - datetime.timedelta(seconds=max(60, seconds - seconds % 60))
+    spans = cover_window(start, end)
+
+    query = dict(game_filter(game), **{"$or": [
+        {"resolution": resolution, "bucket_start": {"$gte": first, "$lte": last}}
+        for resolution, first, last in spans
+    ]})
+    total = {"rounds": 0, "targets": {}}
+    buckets = 0
+    async for doc in stats.find(query, {"_id": 0, "rounds": 1, "targets": 1}):
+        _merge(total, doc)
+        buckets += 1
+
+    summary = summarize(total)
+    summary.update({"game": game, "from": start, "to": end, "buckets_read": buckets})
+    return summary
+
+
+# -------------------- Rebuild --------------------
+
+async def rebuild(results, stats, game_codes=None, batch_size=1000, report_every=50_000):
+    """
+    Recompute the rollups of `game_codes` (default: all) from game_results in
+    one streaming pass per game, in timestamp order. Finished buckets are
+    written as soon as the stream moves past them, so memory stays constant.
+    Run it while ingestion is stopped (live $inc updates would race the rebuild).
+    """
+    total_rounds = 0
+    for game_code in game_codes or GAMES:
+        await stats.delete_many({"game_code": game_code})
+        cursor = results.find({"game_code": game_code}, STATS_PROJECTION).sort("timestamp", 1).batch_size(batch_size)
+
+        open_buckets = {}       # resolution -> (bucket_start, Counter)
+        pending = []            # Finished summary docs waiting for insert_many
+        scored = 0
+
+        def close_bucket(resolution):
+            start, inc = open_buckets.pop(resolution)
+            doc = {"game_code": game_code, "resolution": resolution, "bucket_start": start}
+            for path, value in inc.items():
+                node = doc
+                *parents, leaf = path.split(".")
+                for key in parents:
+                    node = node.setdefault(key, {})
+                node[leaf] = value
+            pending.append(doc)
+
+        async for doc in cursor:
+            ts = doc.get("timestamp")
+            inc = round_increments(doc) if isinstance(ts, datetime.datetime) else {}
+            if not inc:
+                continue
+            ts = ts.replace(tzinfo=None)
+            for resolution in RESOLUTIONS:
+                start = bucket_start(ts, resolution)
+                if resolution in open_buckets and open_buckets[resolution][0] != start:
+                    close_bucket(resolution)
+                open_buckets.setdefault(resolution, (start, Counter()))[1].update(inc)
+            scored += 1
+            if len(pending) >= batch_size:
+                await stats.insert_many(pending)
+                pending.clear()
+            if report_every and scored % report_every == 0:
+                print(f"[STATS] {game_code}: {scored} rounds folded into rollups...")
+
+        for resolution in list(open_buckets):
+            close_bucket(resolution)
+        if pending:
+            await stats.insert_many(pending)
+        print(f"[STATS] {game_code}: rebuilt rollups from {scored} rounds.")
+        total_rounds += scored
+    return total_rounds
+
+
+# -------------------- Start --------------------
+if __name__ == "__main__":
+    from database import close_client, get_collection, open_client
+
+    parser = argparse.ArgumentParser(description="Accuracy rollup maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("rebuild", help="Recompute accuracy_stats from game_results in one streaming pass")
+    p.add_argument("--game", choices=list(GAMES), help="Only this game code (default: all)")
+    p.add_argument("--batch-size", type=int, default=1000, help="Cursor / insert batch size")
+    args = parser.parse_args()
+
+    async def main():
+        open_client()
+        try:
+            stats = get_collection(name=STATS_COLLECTION_NAME)
+            await ensure_stats_indexes(stats)
+            await rebuild(get_collection(), stats, [args.game] if args.game else None, args.batch_size)
+        finally:
+            close_client()
+
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+# batch_features.py (VECTORIZED BATCH FEATURE EXTRACTION)
+#
+# Columnar equivalent of utils.extract_features for bulk training / analysis.
+# Row i holds the features extract_features(rounds[i-100:i], rounds[i]) would
+# build; keys that extract_features omits (short history) are NaN.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+HISTORY = 100
+MEDIUM_WINDOW = 50
+SHORT_WINDOW = 10
+LAG_WINDOW = 5
+
+# Fixed column order (same key order as extract_features with a full history)
+FEATURE_COLUMNS = ["number", "is_big", "is_alternating_3"]
+for _lag in range(LAG_WINDOW, 0, -1):
+    FEATURE_COLUMNS += [f"lag_color_{_lag}", f"lag_size_{_lag}", f"lag_num_diff_{_lag}"]
+FEATURE_COLUMNS += [
+    "red_ratio_100", "big_ratio_100", "big_freq_50",
+    "red_freq_10", "green_freq_10", "big_freq_10", "small_freq_10",
+    "current_color_streak",
+]
+COLUMN_INDEX = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+
+def rounds_to_arrays(rounds):
+    """Split stored round documents into number/color/size arrays."""
+    numbers = np.fromiter((int(r["number"]) for r in rounds), dtype=np.int64)
+    colors = np.array([(r.get("color") or "N/A") for r in rounds])
+    sizes = np.array([(r.get("size") or "N/A") for r in rounds])
+    return numbers, colors, sizes
+
+
+def _window_counts(flags, lengths):
+    """Count of True flags in the `lengths[i]` rounds before round i (cumulative sums)."""
+    csum = np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+    idx = np.arange(len(flags))
+    return csum[idx] - csum[idx - lengths]
+
+
+def _run_lengths(values):
+    """Length of the run of equal values ending at each position."""
+    n = len(values)
+    idx = np.arange(n)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = values[1:] != values[:-1]
+    last_start = np.maximum.accumulate(np.where(starts, idx, 0))
+    return idx - last_start + 1
+
+
+def _lagged(values, fill):
+    """(n, LAG_WINDOW + 1) view where column k holds values[i - (LAG_WINDOW + 1) + k]."""
+    padded = np.concatenate((np.full(LAG_WINDOW + 1, fill, dtype=values.dtype), values))
+    return sliding_window_view(padded, LAG_WINDOW + 1)[:len(values)]
+
+
+def extract_features_batch(numbers, colors, sizes, history=HISTORY):
+    """
+    Build the (N, len(FEATURE_COLUMNS)) float64 feature matrix for N rounds.
+
+    `numbers` are the round digits, `colors`/`sizes` their labels (any case).
+    Each row is computed against the up to `history` rounds preceding it.
+    """
+    numbers = np.asarray(numbers).astype(np.int64)
+    colors = np.char.lower(np.asarray(colors, dtype=str))
+    sizes = np.char.lower(np.asarray(sizes, dtype=str))
+    n = len(numbers)
+
+    X = np.full((n, len(FEATURE_COLUMNS)), np.nan)
+    if n == 0:
+        return X
+
+    h = np.minimum(np.arange(n), history)      # History length behind each round
+    is_red = colors == "red"
+    is_green = colors == "green"
+    is_big = sizes == "big"
+    is_small = sizes == "small"
+
+    # 1. Base features
+    X[:, COLUMN_INDEX["number"]] = numbers
+    X[:, COLUMN_INDEX["is_big"]] = is_big
+
+    # 2. Zig-Zag over the three most recent history sizes
+    lag_sizes = _lagged(sizes, "")
+    alternating = (lag_sizes[:, -1] != lag_sizes[:, -2]) & (lag_sizes[:, -2] != lag_sizes[:, -3])
+    X[:, COLUMN_INDEX["is_alternating_3"]] = alternating & (h >= 3)
+
+    # 3. Lag features (only lags that exist in the history)
+    lag_red = _lagged(is_red, False)
+    lag_big = _lagged(is_big, False)
+    lag_nums = _lagged(numbers, 0)
+    lags = np.minimum(h, LAG_WINDOW)
+    for lag in range(1, LAG_WINDOW + 1):
+        col = LAG_WINDOW + 1 - lag
+        present = lag <= lags
+        diff = np.where(lag < lags, lag_nums[:, col] - lag_nums[:, col - 1], 0)
+        X[present, COLUMN_INDEX[f"lag_color_{lag}"]] = lag_red[present, col]
+        X[present, COLUMN_INDEX[f"lag_size_{lag}"]] = lag_big[present, col]
+        X[present, COLUMN_INDEX[f"lag_num_diff_{lag}"]] = diff[present]
+
+    # 4. Long-term ratios (only once more than 10 rounds of history exist)
+    long = h > SHORT_WINDOW
+    medium = np.minimum(h, MEDIUM_WINDOW)
+    X[long, COLUMN_INDEX["red_ratio_100"]] = _window_counts(is_red, h)[long] / h[long]
+    X[long, COLUMN_INDEX["big_ratio_100"]] = _window_counts(is_big, h)[long] / h[long]
+    X[long, COLUMN_INDEX["big_freq_50"]] = _window_counts(is_big, medium)[long] / medium[long]
+
+    # 5. Short-term frequency
+    short = np.minimum(h, SHORT_WINDOW)
+    X[:, COLUMN_INDEX["red_freq_10"]] = _window_counts(is_red, short)
+    X[:, COLUMN_INDEX["green_freq_10"]] = _window_counts(is_green, short)
+    X[:, COLUMN_INDEX["big_freq_10"]] = _window_counts(is_big, short)
+    X[:, COLUMN_INDEX["small_freq_10"]] = _window_counts(is_small, short)
+
+    # 6. Current color streak (run ending at the previous round, capped at the history)
+    streak = np.zeros(n, dtype=np.int64)
+    if n > 1:
+        runs = _run_lengths(colors)
+        same = colors[1:] == colors[:-1]
+        streak[1:] = np.where(same, np.minimum(runs[:-1], h[1:]), 0)
+    X[:, COLUMN_INDEX["current_color_streak"]] = streak
+
+    return X
+
+
+def row_to_dict(row):
+    """Convert one matrix row back to an extract_features-style dict (NaN keys dropped)."""
+    return {name: row[i] for i, name in enumerate(FEATURE_COLUMNS) if not np.isnan(row[i])}
@@ -1,15 +1,22 @@
 import asyncio
 import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from database import collection 
-from model_updater import update_model
-from PIL import Image
-import pytesseract
-import re
+import os
+from database import INGEST_CLIENT_OPTIONS, close_client, ensure_indexes, get_collection, open_client, pool_stats
+from model_updater import shutdown_lanes, update_model
+from history_cache import history_for
+from utils import derive_prediction_fields
+from checkpoint import CHECKPOINT_EVERY, schedule_checkpoint, flush_checkpoint, save_checkpoint_sync, warm_start
+from ocr import ocr_service
+from staged_pipeline import StagedPipeline, capture_frame, parse_frame, read_page_period
+from scheduler import RoundScheduler
+from games import DEFAULT_GAME, GAMES, game_url, parse_game_codes
+from tab_pool import TabPool
+from migrate_game_code import backfill_game_code
+from write_behind import WriteBehindWriter
+from accuracy_stats import STATS_COLLECTION_NAME, ensure_stats_indexes, stats_recorder
+from gaps import GAPS_COLLECTION_NAME, ensure_gaps_indexes, estimated_timestamp, gap_event, missing_count, missing_rows, period_number, record_gap
+from jsonlog import log
+from metrics import serve_metrics
 import sys 
 
 
@@ -19,45 +26,76 @@ ANSI_RED = '\033[91m'
 ANSI_YELLOW = '\033[93m'
 ANSI_END = '\033[0m'
 
-# point pytesseract to exe if needed
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-
 # --- GLOBAL CONTROL FLAG ---
 is_running = False
 # ---------------------------
 
-# Initial OCR test block (optional)
-try:
-    img = Image.open("result_box.png") 
-    text = pytesseract.image_to_string(img, config="--psm 7")
-    print("OCR Output:", text)
-except FileNotFoundError:
-    pass # Silent fail if file not found
+# Games tracked by this process (comma separated codes or "all", default: DEFAULT_GAME only) and browser instances shared by their tabs
+GAME_CODES = parse_game_codes(os.environ.get("BDG_GAMES"))
+BROWSERS = int(os.environ.get("BDG_BROWSERS", "1"))
 
-# -------------------- Selenium setup --------------------
-options = Options()
-options.headless = False 
-options.add_argument(r"user-data-dir=C:\Users\vgopi\ChromeAutomationProfile") 
+# Prometheus /metrics of this process (stage, OCR, model and Mongo latencies); 0 disables it
+METRICS_PORT = int(os.environ.get("BDG_METRICS_PORT", "9108"))
+
+# Shared browser/tab pool (one tab per game), opened in __main__
+tabs = None
 
-driver = webdriver.Chrome(options=options)
+# MongoDB collection and write-behind persistence for stored rounds, opened in main_async
+collection = None
+writer = None
+gaps = None  # round_gaps log (see gaps.py)
 
-GAME_URL = "https://bdgwink.me/#/saasLottery/WinGo?gameCode=WinGo_30S&lottery=WinGo"
 
-# -------------------- Open game page --------------------
-def open_game_page():
-    driver.get(GAME_URL)
-    driver.implicitly_wait(15)
-    print("[INFO] Game page opened.")
+def save_shutdown_checkpoint():
+    """Snapshot each game's models through its last stored round before exiting."""
+    shutdown_lanes()  # A learn step still running in a model lane finishes before the pickle
+    for game_code in GAME_CODES:
+        last = history_for(game_code).last()
+        if last is not None:
+            save_checkpoint_sync(last.period, last.timestamp, game_code)
 
-try:
-    game_history = driver.find_element(By.XPATH, "//*[contains(text(), 'Game history')]")
-    container = game_history.find_element(By.XPATH, "following::div[1]")
-    print("[DEBUG] Game history container text:")
-    print(container.text[:1000])
-except Exception as e:
-    print("[DEBUG ERROR] Could not locate Game history container:", e)
+# Initial OCR test (optional, run from __main__ so importing this module stays side-effect free)
+def ocr_self_test(path="result_box.png"):
+    from PIL import Image
+    from ocr import _pytesseract
+    try:
+        img = Image.open(path)
+        text = _pytesseract().image_to_string(img, config="--psm 7")
+        print("OCR Output:", text)
+    except FileNotFoundError:
+        pass # Silent fail if file not found
+
+# -------------------- Selenium setup --------------------
+def make_driver(index=0):
+    """Browser instance `index` of the tab pool (each instance needs its own Chrome profile)."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    options.headless = False 
+    suffix = "" if index == 0 else str(index)
+    options.add_argument(rf"user-data-dir=C:\Users\vgopi\ChromeAutomationProfile{suffix}") 
+    return webdriver.Chrome(options=options)
+
+# -------------------- Open game pages --------------------
+def open_game_pages():
+    global tabs
+    tabs = TabPool(make_driver, BROWSERS)
+    for game_code in GAME_CODES:
+        tabs.open(game_code, game_url(game_code))
+        with tabs.tab(game_code) as driver:
+            debug_history_container(driver)
+
+def debug_history_container(driver):
+    from selenium.webdriver.common.by import By
+    try:
+        game_history = driver.find_element(By.XPATH, "//*[contains(text(), 'Game history')]")
+        container = game_history.find_element(By.XPATH, "following::div[1]")
+        print("[DEBUG] Game history container text:")
+        print(container.text[:1000])
+    except Exception as e:
+        print("[DEBUG ERROR] Could not locate Game history container:", e)
 
-def debug_page():
+def debug_page(driver):
     print("[DEBUG] Dumping first 5000 chars of page source...")
     html = driver.page_source
     print(html[:5000])
@@ -65,97 +103,10 @@ def debug_page():
         f.write(html)
     print("[DEBUG] Saved full page to page_dump.html")
 
-# -------------------- Extract latest result (FIXED) --------------------
-def fetch_result():
-    global is_running
-    if not is_running:
-        return None # Do nothing if paused
-
-    try:
-        WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'Game history')]"))
-        )
-        page_text = driver.find_element(By.TAG_NAME, "body").text
-
-        number_text = None
-        period_id = "Unknown"
-        size_from_number = None
-        color_from_number = None
-        raw_ocr_text = ""
-
-        try:
-            driver.save_screenshot("full_page.png")
-            
-            img = Image.open("full_page.png")
-            x, y = 655, 175
-            w, h = 460, 54
-            cropped = img.crop((x, y, x + w, y + h))
-            cropped.save("cropped_number.png")
-            print("[DEBUG] Cropped number saved as cropped_number.png")
-
-            ocr_attempts = [
-                "--psm 7 -c tessedit_char_whitelist=0123456789 ",
-                "--psm 6 -c tessedit_char_whitelist=0123456789 ",
-                "--psm 8 -c tessedit_char_whitelist=0123456789 ",
-            ]
-            
-            for cfg in ocr_attempts:
-                raw_ocr_text = pytesseract.image_to_string(cropped, config=cfg).strip()
-                print(f"[OCR TRY] config='{cfg}' → '{raw_ocr_text}'")
-                if ' ' in raw_ocr_text and len(raw_ocr_text) > 5:
-                    break
-            
-            if raw_ocr_text:
-                parts = [p for p in raw_ocr_text.split() if p] 
-                
-                if len(parts) >= 2:
-                    period_id = parts[0]
-                    result_number_str = parts[-1] 
-
-                    if result_number_str.isdigit() and len(result_number_str) == 1:
-                        number_text = result_number_str
-                        num = int(number_text)
-
-                        if 0 <= num <= 9:
-                            size_from_number = "Small" if num <= 4 else "Big"
-                            color_from_number = "Red" if num % 2 == 0 else "Green"
-                        else:
-                            print(f"[DEBUG] Ignored invalid single-digit result: {num}")
-                            number_text = None 
-                    else:
-                        print(f"[DEBUG] Failed to parse a single result digit from '{raw_ocr_text}'")
-                elif len(parts) == 1 and len(parts[0]) > 10:
-                    period_id = parts[0]
-                    
-            print(f"[OCR DEBUG] Raw Text: '{raw_ocr_text}', ID: {period_id}, Number: {number_text}, Size: {size_from_number}, Color: {color_from_number}")
-
-        except Exception as ocr_e:
-            print("[OCR ERROR] Could not OCR result box:", ocr_e)
-
-        if period_id == "Unknown":
-            match = re.search(r"\b20\d{11,}\b", page_text)
-            period_id = match.group(0) if match else "Unknown"
-
-
-        result = {
-            "period": period_id, 
-            "color": color_from_number,
-            "size": size_from_number,
-            "number": number_text, 
-            "timestamp": datetime.datetime.utcnow()
-        }
-
-        print(f"[INFO] Parsed result: {result}")
-        return result
-
-    except Exception as e:
-        print("[ERROR] Could not fetch result:", e)
-        return None
-
 # -------------------- Input Listener (NEW) --------------------
 async def input_listener():
     global is_running
-    print("\n--- Controls: Press 's' to START, 'x' to STOP, 'q' to QUIT ---\n")
+    print("\n--- Controls: Press 's' to START, 'x' to STOP, 'r' to RESYNC history, 'q' to QUIT ---\n")
     while True:
         try:
             # Note: This requires the script to be run in a terminal/console
@@ -169,13 +120,22 @@ async def input_listener():
                 if is_running:
                     is_running = False
                     print("\n[CONTROL] >>> ALGORITHM STOPPED! Waiting for START command. <<<\n")
+            elif user_input.lower() == 'r':
+                # Rebuild the history caches after a restart or manual DB edits
+                for game_code in GAME_CODES:
+                    await history_for(game_code).resync(collection)
             elif user_input.lower() == 'q':
                 print("[CONTROL] Quitting application.")
                 # Force exit the entire application gracefully
-                driver.quit()
+                await flush_checkpoint()
+                save_shutdown_checkpoint()
+                await writer.close()
+                close_client()
+                ocr_service.shutdown()
+                tabs.quit()
                 sys.exit(0)
             else:
-                print("Invalid command. Use 's', 'x', or 'q'.")
+                print("Invalid command. Use 's', 'x', 'r', or 'q'.")
         except EOFError:
             # Handle Ctrl+D or disconnection
             break
@@ -183,114 +143,216 @@ async def input_listener():
             print(f"[INPUT ERROR] {e}")
             break
 
-async def fetch_loop():
-    while True:
-        # PAUSE CHECK: Sleep while the algorithm is stopped
-        if not is_running:
-            await asyncio.sleep(0.1) 
-            continue
-
-        try:
-            result = fetch_result()
-            
-            if result and result.get("number") is not None:
-                
-                # --- FIX: Convert the number string to an integer for model math ---
-                model_result = result.copy()
-                try:
-                    # Convert the string number to integer before passing to model
-                    model_result['number'] = int(model_result['number']) 
-                except ValueError:
-                    print(f"[ERROR] Failed to convert result number '{result['number']}' to integer. Skipping model update.")
-                    await asyncio.sleep(10)
-                    continue 
-                
-                # Train ALL models and get ALL predictions (returns a dict of probabilities)
-                next_probs = await update_model(model_result, collection)
-
-                # --- STORE ALL PREDICTIONS ---
-                
-                # Color Predictions
-                result["prob_red"] = next_probs.get("prob_red")
-                result["prob_green"] = next_probs.get("prob_green")
-                result["prob_violet"] = next_probs.get("prob_violet")
-                
-                # Size Predictions
-                result["prob_size_big"] = next_probs.get("prob_big")
-                result["prob_size_small"] = next_probs.get("prob_small")
-                
-                # Number Predictions (Stored as a dictionary/JSON object)
-                result["prob_numbers"] = next_probs.get("prob_numbers")
-
-                # Store in MongoDB (using original result)
-                await collection.insert_one(result)
-                
-                
-                # --- START COLORIZED TERMINAL LOGIC ---
-                
-                p_r = result.get("prob_red", 0)
-                p_g = result.get("prob_green", 0)
-                p_v = result.get("prob_violet", 0)
-                p_big = result.get("prob_size_big", 0)
-                p_small = result.get("prob_size_small", 0)
-                
-                # 1. Color String (Highlight the highest probability above 35%)
-                max_color_prob = max(p_r, p_g, p_v)
-                
-                color_str = f"R:{p_r}|G:{p_g}|V:{p_v}"
-                
-                if max_color_prob > 0.35: # Use 35% as a confidence threshold
-                    if p_r == max_color_prob:
-                        color_str = f"{ANSI_RED}R:{p_r}{ANSI_END}|G:{p_g}|V:{p_v}"
-                    elif p_g == max_color_prob:
-                        color_str = f"R:{p_r}|{ANSI_GREEN}G:{p_g}{ANSI_END}|V:{p_v}"
-                    elif p_v == max_color_prob:
-                        color_str = f"R:{p_r}|G:{p_g}|{ANSI_YELLOW}V:{p_v}{ANSI_END}"
-
-                # 2. Size String (Highlight the highest probability)
-                size_str = f"B:{p_big}|S:{p_small}"
-                
-                # --- CORRECTED LOGIC: Highlight the strictly highest prediction ---
-                if p_big > p_small :
-                    size_str = f"{ANSI_RED}BIG:{p_big}{ANSI_END}|S:{p_small}"
-                elif p_small > p_big :
-                    size_str = f"B:{p_big}|{ANSI_GREEN}SMALL:{p_small}{ANSI_END}"
-                # If equal (0.5/0.5), no color is applied (default logic)
-                
-                # Print the enhanced log line
-                print(
-                    f"[{datetime.datetime.now(datetime.UTC)}] "
-                    f"PERIOD: {result['period'][-4:]} | "
-                    f"ACTUAL: {result['color']}-{result['size']} ({result['number']}) | "
-                    f"PRED COLOR: [{color_str}] | PRED SIZE: [{size_str}]"
-                )
-                
-                # --- END COLORIZED TERMINAL LOGIC ---
+# -------------------- Model + persist stage --------------------
+rounds_since_checkpoint = {}  # game_code -> rounds stored since its last checkpoint
+
+async def backfill_gap(rows, result, game_code):
+    """
+    Store and train on the rounds between the last stored period and `result`
+    that are still visible in the history rows (oldest first), before `result`
+    itself is processed. Returns the number of rounds recovered.
+    """
+    last = history_for(game_code).last()
+    period = result.get("period")
+    if last is None or not missing_count(last.period, period):
+        return 0
+
+    recovered = 0
+    for row in missing_rows(last.period, rows, period):
+        row = dict(row, backfilled=True, timestamp=estimated_timestamp(
+            result["timestamp"], period, row["period"], GAMES[game_code]))
+        recovered += bool(await process_result(row, game_code))
+
+    event = gap_event(game_code, last.period, period, recovered)
+    log("gap", "warning", game_code=game_code, after=last.period, before=period,
+        missing=event["missing"], backfilled=recovered, lost=event["lost"])
+    if gaps is not None:
+        await record_gap(gaps, event)
+    return recovered
+
+async def process_result(result, game_code=DEFAULT_GAME):
+    """Train/predict, store and log one parsed round of `game_code` (last stage of its pipeline)."""
+    history = history_for(game_code)
+    result["game_code"] = game_code
+
+    # A round without a readable period id cannot be deduplicated (every such
+    # round would collide on the unique game_code + period index), ordered or
+    # gap-checked: neither train on it nor store it
+    period = result.get("period")
+    if period_number(period) is None:
+        log("no_period", "warning", game_code=game_code, period=period, number=result.get("number"))
+        return False
+
+    # Recover rounds missed since the last stored one before this round trains the models
+    rows = result.pop("_rows", None)
+    if rows:
+        await backfill_gap(rows, result, game_code)
+
+    # Skip rounds that are already stored (re-read of a recent period; the
+    # unique game_code + period index catches anything older at write time)
+    if history.has_period(period):
+        log("already_stored", game_code=game_code, period=period)
+        return False
+
+    # --- FIX: Convert the number string to an integer for model math ---
+    model_result = result.copy()
+    try:
+        # Convert the string number to integer before passing to model
+        model_result['number'] = int(model_result['number']) 
+    except ValueError:
+        log("bad_number", "error", game_code=game_code, period=period, number=result["number"])
+        return False
+    
+    # Train ALL models and get ALL predictions (returns a dict of probabilities)
+    next_probs = await update_model(model_result, collection, game_code)
+    
+    # --- STORE ALL PREDICTIONS ---
+    
+    # Color Predictions
+    result["prob_red"] = next_probs.get("prob_red")
+    result["prob_green"] = next_probs.get("prob_green")
+    result["prob_violet"] = next_probs.get("prob_violet")
+    
+    # Size Predictions
+    result["prob_size_big"] = next_probs.get("prob_big")
+    result["prob_size_small"] = next_probs.get("prob_small")
+    
+    # Number Predictions (Stored as a dictionary/JSON object)
+    result["prob_numbers"] = next_probs.get("prob_numbers")
+    
+    # Dashboard fields (model guess + match flags), computed once at write time
+    result.update(derive_prediction_fields(result))
+    
+    # Store in MongoDB (using original result) via the write-behind queue: never waits on mongod
+    await writer.submit(result)
+    history.append(result)
+    
+    # Periodic model snapshot (written in a background thread)
+    rounds_since_checkpoint[game_code] = rounds_since_checkpoint.get(game_code, 0) + 1
+    if rounds_since_checkpoint[game_code] >= CHECKPOINT_EVERY:
+        rounds_since_checkpoint[game_code] = 0
+        schedule_checkpoint(result["period"], result["timestamp"], game_code)
+    
+    
+    # --- START COLORIZED TERMINAL LOGIC ---
+    
+    p_r = result.get("prob_red", 0)
+    p_g = result.get("prob_green", 0)
+    p_v = result.get("prob_violet", 0)
+    p_big = result.get("prob_size_big", 0)
+    p_small = result.get("prob_size_small", 0)
+    
+    # 1. Color String (Highlight the highest probability above 35%)
+    max_color_prob = max(p_r, p_g, p_v)
+    
+    color_str = f"R:{p_r}|G:{p_g}|V:{p_v}"
+    
+    if max_color_prob > 0.35: # Use 35% as a confidence threshold
+        if p_r == max_color_prob:
+            color_str = f"{ANSI_RED}R:{p_r}{ANSI_END}|G:{p_g}|V:{p_v}"
+        elif p_g == max_color_prob:
+            color_str = f"R:{p_r}|{ANSI_GREEN}G:{p_g}{ANSI_END}|V:{p_v}"
+        elif p_v == max_color_prob:
+            color_str = f"R:{p_r}|G:{p_g}|{ANSI_YELLOW}V:{p_v}{ANSI_END}"
+    
+    # 2. Size String (Highlight the highest probability)
+    size_str = f"B:{p_big}|S:{p_small}"
+    
+    # --- CORRECTED LOGIC: Highlight the strictly highest prediction ---
+    if p_big > p_small :
+        size_str = f"{ANSI_RED}BIG:{p_big}{ANSI_END}|S:{p_small}"
+    elif p_small > p_big :
+        size_str = f"B:{p_big}|{ANSI_GREEN}SMALL:{p_small}{ANSI_END}"
+    # If equal (0.5/0.5), no color is applied (default logic)
+    
+    # Print the enhanced log line
+    print(
+        f"[{datetime.datetime.now(datetime.UTC)}] [{game_code}] "
+        f"PERIOD: {result['period'][-4:]} | "
+        f"ACTUAL: {result['color']}-{result['size']} ({result['number']}) | "
+        f"PRED COLOR: [{color_str}] | PRED SIZE: [{size_str}]"
+    )
+    
+    # --- END COLORIZED TERMINAL LOGIC ---
 
-            else:
-                # This handles OCR failure (transient) or insufficient data at start
-                print("[INFO] No complete result fetched, retrying...")
+    return True
 
-        except Exception as e:
-            print("[ERROR] Loop exception:", e)
+def _in_tab(game_code, fn):
+    """Run a blocking Selenium call against the game's tab (holds the shared driver)."""
+    def call():
+        with tabs.tab(game_code) as driver:
+            return fn(driver)
+    return call
 
-        await asyncio.sleep(30) # wait for next result
+async def log_writer_metrics(interval=300):
+    """Periodic queue depth / flush latency / pool usage line for the persistence layer."""
+    while True:
+        await asyncio.sleep(interval)
+        log("db_metrics", writer=writer.metrics_summary(), pool=pool_stats())
+
+async def fetch_loop(game_code):
+    """Run one game's staged capture -> OCR/parse -> model/persist pipeline, aligned to its round boundaries."""
+    pipeline = StagedPipeline(
+        capture=_in_tab(game_code, capture_frame),
+        parse=parse_frame,
+        process=lambda result: process_result(result, game_code),
+        is_running=lambda: is_running,
+        scheduler=RoundScheduler(round_seconds=GAMES[game_code]),
+        probe=_in_tab(game_code, read_page_period),
+    )
+    await pipeline.run()
 
 # -------------------- Start --------------------
 if __name__ == "__main__":
     print("[INFO] Make sure you are logged in and Chrome is closed before running.")
-    open_game_page()
+    ocr_self_test()
+    open_game_pages()
     
     # 1. DEFINE a main asynchronous function (main_async)
     async def main_async():
-        # 2. RUN the two coroutines concurrently using asyncio.gather
-        await asyncio.gather(fetch_loop(), input_listener())
+        global collection, writer, gaps
+
+        # One MongoDB client for this process, bound to this event loop
+        open_client(INGEST_CLIENT_OPTIONS)
+        collection = get_collection()
+        gaps = get_collection(name=GAPS_COLLECTION_NAME)
+        # Tag rounds stored before multi-game ingestion, then make sure the indexes exist
+        # (unique game_code + period rejects duplicate rounds)
+        await backfill_game_code(collection)
+        await ensure_indexes()
+        stats = get_collection(name=STATS_COLLECTION_NAME)
+        await ensure_stats_indexes(stats)
+        await ensure_gaps_indexes(gaps)
+
+        # Start the OCR workers before the first round
+        ocr_service.warm_up()
+        if METRICS_PORT:
+            serve_metrics(METRICS_PORT)
+
+        # Background batch writer (replays rounds spilled to disk by a previous run first);
+        # every round it stores is also folded into the accuracy rollups
+        writer = WriteBehindWriter(collection, on_written=stats_recorder(stats))
+        writer.start()
+
+        for game_code in GAME_CODES:
+            # Restore each game's latest model checkpoint and catch up on its newer rounds
+            await warm_start(collection, game_code=game_code)
+
+            # Load each game's round history cache once at startup
+            await history_for(game_code).load(collection)
+
+        # 2. RUN one pipeline per game plus the input listener concurrently using asyncio.gather
+        await asyncio.gather(*(fetch_loop(code) for code in GAME_CODES), input_listener(), log_writer_metrics())
 
     # 3. RUN the main asynchronous function
     try:
         asyncio.run(main_async())
     except KeyboardInterrupt:
         print("\n[INFO] Application shut down by user.")
-        driver.quit()
+        save_shutdown_checkpoint()
+        if writer is not None:
+            writer.spill_queued()  # Replayed into MongoDB on the next start
+        close_client()
+        tabs.quit()
 
 # HI 
\ No newline at end of file
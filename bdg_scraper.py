@@ -1,53 +1,105 @@
 import asyncio
 import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from database import collection  # your MongoDB connection
+import os
+from database import INGEST_CLIENT_OPTIONS, close_client, get_collection, open_client
 from model_updater import update_model
+from history_cache import history_for
+from scheduler import RoundScheduler
+from staged_pipeline import read_page_period
+from games import GAMES, game_url, parse_game_codes
+from tab_pool import TabPool
+from write_behind import WriteBehindWriter
+from dom_history import parse_history_rows, read_history_rows
+from jsonlog import log
+
+# Games tracked by this process (comma separated codes or "all", default: DEFAULT_GAME only)
+GAME_CODES = parse_game_codes(os.environ.get("BDG_GAMES"))
 
 # -------------------- Selenium setup --------------------
-options = Options()
-options.headless = True  # run in background
-driver = webdriver.Chrome(options=options)
+def make_driver(index=0):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    options.headless = True  # run in background
+    return webdriver.Chrome(options=options)
+
+# One headless browser, one tab per game
+tabs = TabPool(make_driver, int(os.environ.get("BDG_BROWSERS", "1")))
 
-URL = "https://bdgwink.me/#/saasLottery/WinGo?gameCode=WinGo_30S&lottery=WinGo"
+# MongoDB collection and background round writer (batched, spilled to disk while MongoDB is down), opened in main
+collection = None
+writer = None
+
+# -------------------- Open game pages (once; the pages update themselves) --------------------
+def open_pages():
+    for game_code in GAME_CODES:
+        tabs.open(game_code, game_url(game_code))
 
 # -------------------- Fetch results from page --------------------
-def get_latest_result():
-    driver.get(URL)
-    
-    # Wait a few seconds for JS to load
-    driver.implicitly_wait(5)
-
-    # Find the element(s) containing number, color, size
-    # ⚠ You need to adjust the selectors based on actual DOM
+def get_latest_result(driver):
+    # Newest row of the Game history list, read from the DOM in one scripted call
     try:
-        number = int(driver.find_element(By.CSS_SELECTOR, ".number-class").text)
-        color = driver.find_element(By.CSS_SELECTOR, ".color-class").text
-        size = driver.find_element(By.CSS_SELECTOR, ".size-class").text
+        latest = parse_history_rows(read_history_rows(driver))[0]
     except Exception as e:
-        print("Error fetching data:", e)
+        log("history_read_failed", "error", error=str(e))
         return None
 
+    # The row's own period: the page header already shows the next round in progress
     return {
-        "number": number,
-        "color": color,
-        "size": size,
+        "period": latest["period"],
+        "number": int(latest["number"]),
+        "color": latest["color"],
+        "size": latest["size"],
         "timestamp": datetime.datetime.utcnow()
     }
 
 # -------------------- Async loop to update model --------------------
-async def fetch_loop():
+def in_tab(game_code, fn):
+    """Blocking call against the game's tab (the shared browser is locked meanwhile)."""
+    with tabs.tab(game_code) as driver:
+        return fn(driver)
+
+async def fetch_loop(game_code):
+    scheduler = RoundScheduler(round_seconds=GAMES[game_code])
+    history = history_for(game_code)
     while True:
-        result = get_latest_result()
-        if result:
-            next_red_prob = await update_model(result, collection)
+        # Wait for the next round boundary instead of a flat sleep (probe runs off the event loop).
+        # The probe only signals that a new round started; the stored period comes from the history row.
+        try:
+            period = await scheduler.async_wait_for_new_round(
+                lambda: asyncio.to_thread(in_tab, game_code, read_page_period))
+        except Exception as e:
+            log("probe_failed", "error", game_code=game_code, error=str(e))
+            await asyncio.sleep(scheduler.burst_interval)
+            continue
+        if period is None:
+            continue
+
+        # Selenium calls are blocking: keep them off the event loop
+        result = await asyncio.to_thread(in_tab, game_code, get_latest_result)
+        if result and not history.has_period(result["period"]):
+            result["game_code"] = game_code
+            next_red_prob = await update_model(result, collection, game_code)
             result["next_red_probability"] = next_red_prob
-            await collection.insert_one(result)
-            print(f"[{datetime.datetime.utcnow()}] Fetched: {result}")
-        await asyncio.sleep(30)  # wait for next round
+            await writer.submit(result)
+            history.append(result)
+            scheduler.record_stored()
+            log("round_stored", game_code=game_code, period=result["period"], number=result["number"],
+                color=result["color"], size=result["size"])
 
 # -------------------- Start --------------------
+async def main():
+    global collection, writer
+    open_client(INGEST_CLIENT_OPTIONS)
+    collection = get_collection()
+    writer = WriteBehindWriter(collection)
+    writer.start()
+    try:
+        await asyncio.gather(*(fetch_loop(code) for code in GAME_CODES))
+    finally:
+        await writer.close()
+        close_client()
+
 if __name__ == "__main__":
-    asyncio.run(fetch_loop())
+    open_pages()
+    asyncio.run(main())
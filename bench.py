@@ -0,0 +1,1357 @@
+# bench.py (OFFLINE BENCHMARKS)
+#
+# Synthetic, fully offline benchmarks for the prediction hot path.
+#
+#      python bench.py checkpoint --rounds 2000 --repeat 20
+#      python bench.py features --sizes 10000 100000 1000000
+#      python bench.py stream --clients 50 100 200 --rounds 5
+#      python bench.py export --docs 1000000 --mongo-uri mongodb://localhost:27017
+#      python bench.py capture --dir recorded_screenshots/ [--no-ocr]
+#      python bench.py ocr --dir saved_crops/
+#      python bench.py dom --dir recordings/ [--no-ocr]     (frames with .png + .html)
+#      python bench.py ingest --streams 1 2 4 --browsers 1 --duration 20
+#      python bench.py writebehind --rounds 300 --latency 0.05
+#      python bench.py pool --mongo-uri mongodb://localhost:27017 --concurrency 16 64 256
+#      python bench.py importtime --repeat 3     (exits 1 when over budget)
+#      python bench.py records --cached 100000 --ticks 20000
+#      python bench.py metrics --spans 200000     (exits 1 when a span costs more than 5 µs)
+#      python bench.py regress [--only features api] [--update]   (exits 1 on a regression vs the committed bench_baseline.json)
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import partial
+
+
+def synthetic_rounds(n, seed=42):
+    """Generate n stored-round documents shaped like the fetch loop's inserts."""
+    rng = random.Random(seed)
+    for i in range(n):
+        num = rng.randrange(10)
+        yield {
+            "period": str(20250101100010000 + i),
+            "number": str(num),
+            "color": "Red" if num % 2 == 0 else "Green",
+            "size": "Small" if num <= 4 else "Big",
+        }
+
+
+def _timings_summary(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+# -------------------- Checkpoint load time --------------------
+def bench_checkpoint(rounds=2000, repeat=20):
+    """Train the live pipelines on synthetic rounds, then time checkpoint save/load."""
+    import checkpoint
+    import model_updater
+    from utils import RollingFeatureState
+
+    state = RollingFeatureState(100)
+    for doc in synthetic_rounds(rounds):
+        current = dict(doc, number=int(doc["number"]))
+        if state.length >= model_updater.MIN_HISTORY:
+            model_updater.predict_and_learn(state.features(current), current)
+        state.append(current)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint.CHECKPOINT_DIR = tmp
+        save_ms, load_ms = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            path = checkpoint.save_checkpoint_sync("bench", None)
+            save_ms.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            checkpoint.load_latest_checkpoint()
+            load_ms.append((time.perf_counter() - start) * 1000)
+        size_kb = os.path.getsize(path) / 1024
+
+    return {"rounds_trained": rounds, "size_kb": round(size_kb, 1),
+            "save": _timings_summary(save_ms), "load": _timings_summary(load_ms)}
+
+
+# -------------------- Per-round vs batch features --------------------
+def bench_features(sizes=(10_000, 100_000, 1_000_000), per_round_limit=100_000):
+    """
+    Time utils.extract_features (one dict per round over a sliding 100-round
+    history) against batch_features.extract_features_batch on the same rounds.
+    The per-round path is skipped above `per_round_limit` rounds unless raised.
+    """
+    from batch_features import extract_features_batch, rounds_to_arrays
+    from utils import extract_features
+
+    results = []
+    for n in sizes:
+        docs = list(synthetic_rounds(n))
+        numbers, colors, sizes_arr = rounds_to_arrays(docs)
+
+        start = time.perf_counter()
+        extract_features_batch(numbers, colors, sizes_arr)
+        batch_s = time.perf_counter() - start
+
+        row = {"rounds": n, "batch_s": round(batch_s, 4), "per_round_s": None, "speedup": None}
+        if n <= per_round_limit:
+            history = [{"number": int(d["number"]), "color": d["color"].lower(), "size": d["size"].lower()} for d in docs]
+            start = time.perf_counter()
+            for i, d in enumerate(docs):
+                extract_features(history[max(0, i - 100):i], dict(d, number=int(d["number"])))
+            per_round_s = time.perf_counter() - start
+            row["per_round_s"] = round(per_round_s, 4)
+            row["speedup"] = round(per_round_s / batch_s, 1)
+        results.append(row)
+        print(row)
+    return results
+
+
+# -------------------- In-memory collection --------------------
+class CountingCollection:
+    """Wraps a Motor-style collection and counts find() calls (DB query load)."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.finds = 0
+
+    def find(self, *args, **kwargs):
+        self.finds += 1
+        return self.inner.find(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def memory_collection():
+    """Local in-memory Motor stand-in (requires mongomock-motor)."""
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()["betting_db"]["game_results"]
+
+
+def _stored_round(doc, ts):
+    from utils import derive_prediction_fields
+    record = dict(doc, timestamp=ts, prob_red=0.45, prob_green=0.45, prob_violet=0.1,
+                  prob_size_big=0.5, prob_size_small=0.5, prob_numbers={str(i): 0.1 for i in range(10)})
+    record.update(derive_prediction_fields(record))
+    return record
+
+
+# -------------------- SSE stream load test --------------------
+async def _stream_load(clients, rounds, round_interval, port):
+    import asyncio
+    import datetime
+    import httpx
+    import uvicorn
+    import main
+    from broadcast import RoundBroadcaster
+
+    col = CountingCollection(memory_collection())
+    start_ts = datetime.datetime(2025, 1, 1)
+    docs = list(synthetic_rounds(50 + rounds))
+    await col.insert_many([_stored_round(d, start_ts + datetime.timedelta(seconds=30 * i)) for i, d in enumerate(docs[:50])])
+
+    main.collection = main.read_collection = col
+    main.broadcaster = RoundBroadcaster(col, main.LATEST_DATA_PROJECTION, poll_interval=0.2,
+                                        on_round=lambda r: main.invalidate_latest_data_cache(), change_stream=False)
+    server = uvicorn.Server(uvicorn.Config(main.app, port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    received = [0] * clients
+
+    async def client(i, http):
+        async with http.stream("GET", f"http://127.0.0.1:{port}/stream?limit=50") as resp:
+            async for line in resp.aiter_lines():
+                if line.startswith("event: round"):
+                    received[i] += 1
+                    if received[i] >= rounds:
+                        return
+
+    limits = httpx.Limits(max_connections=clients + 10)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as http:
+        tasks = [asyncio.create_task(client(i, http)) for i in range(clients)]
+        await asyncio.sleep(1.0)
+        finds_before = col.finds
+        started = time.perf_counter()
+        for i, d in enumerate(docs[50:]):
+            await col.insert_one(_stored_round(d, start_ts + datetime.timedelta(seconds=30 * (50 + i))))
+            await asyncio.sleep(round_interval)
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=30)
+        elapsed = time.perf_counter() - started
+
+    server.should_exit = True
+    await server_task
+    return {"clients": clients, "rounds_pushed": rounds, "delivered": sum(received),
+            "db_finds_during_push": col.finds - finds_before,
+            "db_finds_per_s": round((col.finds - finds_before) / elapsed, 2)}
+
+
+def bench_stream(client_counts=(50, 100, 200), rounds=5, round_interval=0.5, port=8765):
+    """
+    Load-test /stream with many local SSE clients against the in-memory collection.
+    DB finds per second should stay flat as the client count grows.
+    """
+    import asyncio
+
+    results = []
+    for clients in client_counts:
+        row = asyncio.run(_stream_load(clients, rounds, round_interval, port))
+        results.append(row)
+        print(row)
+    return results
+
+
+# -------------------- NDJSON export: TTFB + peak RSS --------------------
+def _peak_rss_mb():
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KiB
+
+
+async def _export_run(docs, mongo_uri, port):
+    import asyncio
+    import datetime
+    import httpx
+    import uvicorn
+    import main
+
+    if mongo_uri:
+        from database import make_client
+        col = make_client(uri=mongo_uri)["bench_db"]["game_results"]
+        existing = await col.estimated_document_count()
+    else:
+        col = memory_collection()
+        existing = 0
+
+    if existing < docs:
+        start_ts = datetime.datetime(2025, 1, 1)
+        batch = []
+        for i, d in enumerate(synthetic_rounds(docs - existing, seed=existing)):
+            batch.append(_stored_round(dict(d, period=str(int(d["period"]) + existing)),
+                                       start_ts + datetime.timedelta(seconds=30 * (existing + i))))
+            if len(batch) == 10_000:
+                await col.insert_many(batch)
+                batch = []
+        if batch:
+            await col.insert_many(batch)
+    if mongo_uri:
+        from database import ensure_indexes
+        await ensure_indexes(col)
+
+    main.collection = main.read_collection = col
+    server = uvicorn.Server(uvicorn.Config(main.app, port=port, log_level="warning", lifespan="off"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    rss_before = _peak_rss_mb()
+    lines = 0
+    ttfb = None
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=None) as http:
+        async with http.stream("GET", f"http://127.0.0.1:{port}/raw_logs/export", params={"limit": docs}) as resp:
+            async for chunk in resp.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+                lines += chunk.count(b"\n")
+    total = time.perf_counter() - started
+    rss_after = _peak_rss_mb()
+
+    server.should_exit = True
+    await server_task
+    return {"docs": lines, "ttfb_ms": round(ttfb * 1000, 1), "total_s": round(total, 2),
+            "peak_rss_mb": round(rss_after, 1), "peak_rss_growth_mb": round(rss_after - rss_before, 1)}
+
+
+def bench_export(docs=1_000_000, mongo_uri=None, port=8766):
+    """
+    Time-to-first-byte and peak RSS for a full NDJSON export of `docs` rounds.
+    Use --mongo-uri for a local mongod (the in-memory stand-in keeps every
+    document in process memory, so its RSS numbers are not representative).
+    """
+    import asyncio
+    row = asyncio.run(_export_run(docs, mongo_uri, port))
+    print(row)
+    return row
+
+
+# -------------------- Screenshot capture + OCR --------------------
+class RecordedDriver:
+    """Minimal driver stand-in replaying recorded full-page PNG screenshots."""
+
+    def __init__(self, pngs):
+        self.pngs = pngs
+        self.i = 0
+
+    def _next(self):
+        png = self.pngs[self.i % len(self.pngs)]
+        self.i += 1
+        return png
+
+    def get_screenshot_as_png(self):
+        return self._next()
+
+    def save_screenshot(self, path):
+        with open(path, "wb") as f:
+            f.write(self._next())
+        return True
+
+
+def _load_pngs(directory):
+    import glob
+    paths = sorted(glob.glob(os.path.join(directory, "*.png")))
+    if not paths:
+        raise SystemExit(f"No .png screenshots found in {directory}")
+    pngs = []
+    for p in paths:
+        with open(p, "rb") as f:
+            pngs.append(f.read())
+    return pngs
+
+
+def bench_capture(directory, rounds=50, with_ocr=True):
+    """
+    Per-round capture(+OCR) latency: the old disk path (save_screenshot ->
+    Image.open -> crop -> save crop) versus the in-memory crop in ocr.py.
+    """
+    from PIL import Image
+    import ocr
+
+    pngs = _load_pngs(directory)
+
+    def disk_path(driver):
+        driver.save_screenshot("full_page.png")
+        img = Image.open("full_page.png")
+        x, y, w, h = ocr.RESULT_BOX
+        cropped = img.crop((x, y, x + w, y + h))
+        cropped.save("cropped_number.png")
+        return cropped
+
+    def memory_path(driver):
+        return ocr.capture_result_box(driver)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            for name, capture in (("disk", disk_path), ("memory", memory_path)):
+                driver = RecordedDriver(pngs)
+                samples = []
+                for _ in range(rounds):
+                    start = time.perf_counter()
+                    cropped = capture(driver)
+                    if with_ocr:
+                        ocr.ocr_result_box(cropped)
+                    else:
+                        cropped.load()
+                    samples.append((time.perf_counter() - start) * 1000)
+                results[name] = _timings_summary(samples)
+        finally:
+            os.chdir(cwd)
+
+    print(results)
+    return results
+
+
+# -------------------- OCR service over saved crops --------------------
+def bench_ocr(directory, passes=2):
+    """
+    Per-crop OCR latency over a directory of saved result-box crops:
+    sequential ocr_result_box vs OCRService (first pass cold, later passes cached).
+    """
+    import asyncio
+    import io
+    from PIL import Image
+    import ocr
+
+    crops = [Image.open(io.BytesIO(png)) for png in _load_pngs(directory)]
+    for c in crops:
+        c.load()
+
+    samples = []
+    for c in crops:
+        start = time.perf_counter()
+        ocr.ocr_result_box(c)
+        samples.append((time.perf_counter() - start) * 1000)
+    results = {"sequential": _timings_summary(samples)}
+
+    async def run_service():
+        service = ocr.OCRService()
+        service.warm_up()
+        for p in range(passes):
+            samples = []
+            for c in crops:
+                start = time.perf_counter()
+                await service.read(c)
+                samples.append((time.perf_counter() - start) * 1000)
+            results[f"service_pass_{p + 1}"] = _timings_summary(samples)
+        results["cache_hits"] = service.cache_hits
+        results["cache_misses"] = service.cache_misses
+        service.shutdown()
+
+    asyncio.run(run_service())
+    print(results)
+    return results
+
+
+# -------------------- DOM fast path vs OCR --------------------
+def bench_dom(directory, rounds=50, with_ocr=True):
+    """
+    Per-round capture+parse latency over recorded frames (png + html, see
+    fake_driver.py): the DOM row reader versus the screenshot + OCR path, and
+    how often the two agree on period and number.
+    """
+    import asyncio
+    import contextlib
+    import staged_pipeline
+    from fake_driver import FakeDriver
+    from ocr import capture_result_box
+
+    def ocr_capture(driver):
+        from selenium.webdriver.common.by import By
+        return {"captured_at": time.monotonic(), "timestamp": None,
+                "page_text": driver.find_element(By.TAG_NAME, "body").text,
+                "crop": capture_result_box(driver)}
+
+    paths = [("dom", staged_pipeline.capture_frame)] + ([("ocr", ocr_capture)] if with_ocr else [])
+
+    async def run():
+        results, parsed = {}, {}
+        for name, capture in paths:
+            driver = FakeDriver(directory)
+            samples, parsed[name], fallbacks = [], [], 0
+            for _ in range(rounds):
+                start = time.perf_counter()
+                frame = capture(driver)
+                result = await staged_pipeline.parse_frame(frame)
+                samples.append((time.perf_counter() - start) * 1000)
+                fallbacks += name == "dom" and "rows" not in frame
+                parsed[name].append((result["period"], str(result["number"])))
+                driver.advance()
+            results[name] = dict(_timings_summary(samples), ocr_fallbacks=fallbacks) if name == "dom" \
+                else _timings_summary(samples)
+        if with_ocr:
+            results["agreement"] = round(sum(a == b for a, b in zip(parsed["dom"], parsed["ocr"])) / rounds, 3)
+        return results
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = asyncio.run(run())
+    if with_ocr:
+        staged_pipeline.ocr_service.shutdown()
+    print(results)
+    return results
+
+
+# -------------------- Multi-game ingestion throughput --------------------
+async def parse_history_text(frame):
+    """Parse stage for the fake pages: newest '<period> <digit>' row of the history text."""
+    import re
+    match = re.search(r"\b(20\d{11,})\s+(\d)\b", frame["page_text"])
+    if not match:
+        return None
+    num = int(match.group(2))
+    return {"period": match.group(1), "number": match.group(2),
+            "size": "Small" if num <= 4 else "Big", "color": "Red" if num % 2 == 0 else "Green",
+            "timestamp": frame["timestamp"]}
+
+
+def _page_text_frame(driver):
+    import datetime
+    from selenium.webdriver.common.by import By
+    return {"captured_at": time.monotonic(), "timestamp": datetime.datetime.utcnow(),
+            "page_text": driver.find_element(By.TAG_NAME, "body").text}
+
+
+async def _ingest_run(round_seconds, browsers, duration, speedup, first_period):
+    import asyncio
+    import contextlib
+    import bdg_ocr_pipeline
+    from fake_driver import FakePageServer, PageServerDriver
+    from scheduler import RoundScheduler
+    from staged_pipeline import StagedPipeline, read_page_period
+    from tab_pool import TabPool
+
+    from write_behind import WriteBehindWriter
+
+    col = memory_collection()
+    bdg_ocr_pipeline.collection = col
+    spill_dir = tempfile.TemporaryDirectory()
+    bdg_ocr_pipeline.writer = WriteBehindWriter(col, spill_path=os.path.join(spill_dir.name, "spill.ndjson"))
+    bdg_ocr_pipeline.writer.start()
+    server = FakePageServer(round_seconds, speedup=speedup, first_period=first_period)
+    server.start()
+    tabs = TabPool(lambda index: PageServerDriver(), browsers)
+    for code in round_seconds:
+        tabs.open(code, server.url(code))
+
+    def in_tab(code, fn):
+        def call():
+            with tabs.tab(code) as driver:
+                return fn(driver)
+        return call
+
+    pipelines = {
+        code: StagedPipeline(
+            capture=in_tab(code, _page_text_frame),
+            parse=parse_history_text,
+            process=lambda result, code=code: bdg_ocr_pipeline.process_result(result, code),
+            scheduler=RoundScheduler(round_seconds=seconds / speedup, burst_interval=1.0 / speedup,
+                                     lead=1.0 / speedup),
+            probe=in_tab(code, read_page_period),
+        )
+        for code, seconds in round_seconds.items()
+    }
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        tasks = [asyncio.create_task(p.run()) for p in pipelines.values()]
+        await asyncio.sleep(duration)
+        for p in pipelines.values():
+            p.stop()
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for p in pipelines.values():
+            await asyncio.to_thread(p.join, 5.0)
+        await bdg_ocr_pipeline.writer.close()
+    server.stop()
+    tabs.quit()
+    spill_dir.cleanup()
+
+    per_game = {}
+    for code, seconds in round_seconds.items():
+        stored = await col.count_documents({"game_code": code})
+        per_game[code] = {"stored": stored, "expected": int(duration * speedup // seconds) + 1,
+                          "close_to_stored": pipelines[code].metrics["close_to_stored"].summary()}
+    total = sum(g["stored"] for g in per_game.values())
+    return {"streams": len(round_seconds), "browsers": browsers, "rounds_stored": total,
+            "rounds_per_s": round(total / duration, 2), "page_requests": server.requests,
+            "tab_lock_wait": tabs.lock_wait.summary(), "per_game": per_game}
+
+
+def bench_ingest(stream_counts=(1, 2, 4), browsers=1, duration=20.0, speedup=30.0):
+    """
+    Multi-game ingestion against a local fake page server: N game streams share
+    `browsers` fake browser instances (one tab each) with the real scheduler,
+    staged pipeline and process_result (per-game models + history), storing into
+    the in-memory collection. Parsing reads the page text (no OCR). Game clocks
+    run `speedup` times faster than real time; streams beyond the four known
+    games are extra 30-second streams.
+    """
+    import asyncio
+    from games import GAMES
+
+    results = []
+    for run, n in enumerate(stream_counts):
+        codes = list(GAMES.items())[:n]
+        codes += [(f"WinGo_30S_{i}", 30) for i in range(2, n - len(codes) + 2)]
+        row = asyncio.run(_ingest_run(dict(codes), browsers, duration, speedup,
+                                      first_period=20250101100010000 + run * 100_000))
+        results.append(row)
+        print(row)
+    return results
+
+
+# -------------------- Write-behind persistence under injected failures --------------------
+class FlakyCollection:
+    """Motor-style collection wrapper adding write latency and an injectable outage."""
+
+    def __init__(self, inner, latency=0.0, outage_stall=0.2):
+        self.inner = inner
+        self.latency = latency
+        self.outage_stall = outage_stall   # How long a write hangs before failing while "down"
+        self.down = False
+
+    async def _write(self, method, *args, **kwargs):
+        import asyncio
+        from pymongo.errors import AutoReconnect
+        await asyncio.sleep(self.latency)
+        if self.down:
+            await asyncio.sleep(self.outage_stall)
+            raise AutoReconnect("injected outage")
+        return await getattr(self.inner, method)(*args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs):
+        return await self._write("insert_one", *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        return await self._write("insert_many", *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+async def _writebehind_run(rounds, interval, latency, outage):
+    import asyncio
+    import datetime
+    from pymongo.errors import PyMongoError
+    from database import ensure_indexes
+    from write_behind import WriteBehindWriter
+
+    start_ts = datetime.datetime(2025, 1, 1)
+    docs = [_stored_round(dict(d, game_code="WinGo_30S"), start_ts + datetime.timedelta(seconds=30 * i))
+            for i, d in enumerate(synthetic_rounds(rounds))]
+    down_from, down_to = int(rounds * outage[0]), int(rounds * outage[1])
+    results = {}
+
+    # Inline insert_one per round (previous behaviour): the loop waits on every write
+    col = FlakyCollection(memory_collection(), latency)
+    await ensure_indexes(col.inner)
+    samples, lost = [], 0
+    for i, doc in enumerate(docs):
+        col.down = down_from <= i < down_to
+        started = time.perf_counter()
+        try:
+            await col.insert_one(dict(doc))
+        except PyMongoError:
+            lost += 1
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    results["inline"] = {"loop_wait": _timings_summary(samples), "lost": lost,
+                         "stored": await col.inner.count_documents({})}
+
+    # Write-behind queue with spill file
+    col = FlakyCollection(memory_collection(), latency)
+    await ensure_indexes(col.inner)
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = WriteBehindWriter(col, flush_interval=0.05, retry_interval=0.1,
+                                   spill_path=os.path.join(tmp, "spill.ndjson"))
+        writer.start()
+        samples = []
+        for i, doc in enumerate(docs):
+            col.down = down_from <= i < down_to
+            started = time.perf_counter()
+            await writer.submit(dict(doc))
+            samples.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(interval)
+        col.down = False
+        await writer.close()
+        while writer.degraded and not await writer.try_recover(force=True):
+            await asyncio.sleep(0.1)
+        stored = await col.inner.count_documents({})
+        results["write_behind"] = {"loop_wait": _timings_summary(samples), "lost": rounds - stored,
+                                   "stored": stored, **writer.metrics_summary()}
+    return results
+
+
+def bench_writebehind(rounds=300, interval=0.01, latency=0.05, outage=(0.3, 0.6)):
+    """
+    Inline insert_one vs the write-behind queue against an in-memory collection
+    with injected write latency and an outage covering the `outage` fraction of
+    the run. Reports how long the ingestion loop waits per round and whether any
+    round is lost.
+    """
+    import asyncio
+    row = asyncio.run(_writebehind_run(rounds, interval, latency, outage))
+    print(row)
+    return row
+
+
+# -------------------- API latency: default vs tuned client pool --------------------
+async def _seed_bench_db(col, docs):
+    import datetime
+    from database import ensure_indexes
+    existing = await col.estimated_document_count()
+    if existing < docs:
+        start_ts = datetime.datetime(2025, 1, 1)
+        batch = []
+        for i, d in enumerate(synthetic_rounds(docs - existing, seed=existing)):
+            batch.append(_stored_round(dict(d, period=str(int(d["period"]) + existing), game_code="WinGo_30S"),
+                                       start_ts + datetime.timedelta(seconds=30 * (existing + i))))
+            if len(batch) == 10_000:
+                await col.insert_many(batch)
+                batch = []
+        if batch:
+            await col.insert_many(batch)
+    await ensure_indexes(col)
+
+
+async def _pool_run(options, mongo_uri, concurrency, requests, port):
+    import asyncio
+    import httpx
+    import uvicorn
+    import database
+    import main
+
+    database.open_client(options, mongo_uri)
+    client = database.get_client()
+    col = client["bench_db"]["game_results"]
+    main.collection = col
+    main.read_collection = col.with_options(read_preference=database.READ_PREFERENCES["secondaryPreferred"])
+    main.broadcaster = None
+    server = uvicorn.Server(uvicorn.Config(main.app, port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    # Read-heavy mix that bypasses the /latest_data response cache
+    paths = ["/history?limit=50", "/raw_logs?limit=100", "/history?limit=20&game=WinGo_30S"]
+    samples, errors = [], 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i, http):
+        nonlocal errors
+        async with sem:
+            started = time.perf_counter()
+            resp = await http.get(f"http://127.0.0.1:{port}{paths[i % len(paths)]}")
+            samples.append((time.perf_counter() - started) * 1000)
+            if resp.status_code != 200:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency + 10)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i, http) for i in range(requests)))
+        wall = time.perf_counter() - started
+
+    stats = database.pool_stats()
+    server.should_exit = True
+    await server_task
+    main.collection = main.read_collection = None
+    database.close_client()
+
+    ordered = sorted(samples)
+    return {"concurrency": concurrency, "requests": requests, "errors": errors,
+            "req_per_s": round(requests / wall, 1),
+            "p50_ms": round(ordered[len(ordered) // 2], 1),
+            "p99_ms": round(ordered[int(0.99 * (len(ordered) - 1))], 1),
+            "max_ms": round(ordered[-1], 1),
+            "pool": {k: stats[k] for k in ("open", "max_checked_out", "checkout_failures", "checkout_wait")}}
+
+
+def bench_pool(mongo_uri, concurrency=(16, 64, 256), requests=2000, docs=10_000, port=8767):
+    """
+    API latency (p50/p99) under concurrent load against a local mongod, with the
+    driver-default client options versus database.API_CLIENT_OPTIONS.
+    """
+    import asyncio
+    from database import API_CLIENT_OPTIONS, DEFAULT_CLIENT_OPTIONS, make_client
+
+    async def seed():
+        client = make_client(uri=mongo_uri)
+        await _seed_bench_db(client["bench_db"]["game_results"], docs)
+        client.close()
+
+    asyncio.run(seed())
+    results = []
+    for name, options in (("default", DEFAULT_CLIENT_OPTIONS), ("tuned", API_CLIENT_OPTIONS)):
+        for c in concurrency:
+            row = dict(pool=name, **asyncio.run(_pool_run(options, mongo_uri, c, requests, port)))
+            results.append(row)
+            print(row)
+    return results
+
+
+# -------------------- Round records vs raw documents --------------------
+def _traced_kb(build):
+    """(result, KiB still allocated by build()) measured with tracemalloc."""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, (after - before) / 1024
+
+
+def bench_records(cached=100_000, ticks=20_000, history=100):
+    """
+    Memory of `cached` history rounds and per-tick CPU of the feature step:
+    full Mongo documents (normalized like get_last_n_rounds, features
+    rescanned with extract_features) versus projected round_record.Round
+    records feeding the incremental RollingFeatureState.
+    """
+    import datetime
+    from collections import deque
+
+    from bson import ObjectId
+
+    from round_record import ROUND_PROJECTION, Round
+    from utils import RollingFeatureState, extract_features
+
+    base = datetime.datetime(2025, 1, 1)
+    stored = [_stored_round(doc, base + datetime.timedelta(seconds=30 * i))
+              for i, doc in enumerate(synthetic_rounds(max(cached, ticks)))]
+    for doc in stored:
+        doc["_id"] = ObjectId()
+    projected = [{k: doc[k] for k in ROUND_PROJECTION if k in doc} for doc in stored]
+
+    def normalize(doc):
+        r = dict(doc)
+        r["number"] = int(r["number"])
+        r["color"] = r["color"].lower()
+        r["size"] = r["size"].lower()
+        return r
+
+    # --- Memory per `cached` rounds ---
+    _, dict_kb = _traced_kb(lambda: [normalize(doc) for doc in stored[:cached]])
+    _, record_kb = _traced_kb(lambda: [Round.from_doc(doc) for doc in projected[:cached]])
+
+    # --- Decode cost of the DB read ---
+    start = time.perf_counter()
+    [normalize(doc) for doc in stored[:cached]]
+    dict_decode_s = time.perf_counter() - start
+    start = time.perf_counter()
+    [Round.from_doc(doc) for doc in projected[:cached]]
+    record_decode_s = time.perf_counter() - start
+
+    # --- Per tick: features for the new round, then add it to the history ---
+    window = deque(maxlen=history)
+    start = time.perf_counter()
+    for doc in stored[:ticks]:
+        current = normalize(doc)
+        extract_features(list(window), current)
+        window.append(current)
+    dict_tick_us = (time.perf_counter() - start) / ticks * 1e6
+
+    state = RollingFeatureState(history)
+    window = deque(maxlen=history)
+    start = time.perf_counter()
+    for doc in projected[:ticks]:
+        record = Round.from_doc(doc)
+        state.features(record)
+        state.append(record)
+        window.append(record)
+    record_tick_us = (time.perf_counter() - start) / ticks * 1e6
+
+    result = {
+        "cached_rounds": cached,
+        "dict_mb": round(dict_kb / 1024, 1),
+        "record_mb": round(record_kb / 1024, 1),
+        "bytes_per_round": {"dict": round(dict_kb * 1024 / cached), "record": round(record_kb * 1024 / cached)},
+        "decode_s": {"dict": round(dict_decode_s, 3), "record": round(record_decode_s, 3)},
+        "tick_us": {"dict": round(dict_tick_us, 1), "record": round(record_tick_us, 1)},
+    }
+    print(result)
+    return result
+
+
+# -------------------- Import time --------------------
+# Cold-start budget per entry module (best of --repeat runs) and the heavy
+# packages it must not pull in at import time (they load on first use).
+IMPORT_BUDGETS = {
+    "main": (1.5, ("river", "scipy", "selenium", "pytesseract", "tesserocr", "PIL", "model_updater")),
+    "bdg_ocr_pipeline": (1.0, ("river", "scipy", "selenium", "pytesseract", "tesserocr", "PIL")),
+}
+
+
+def _import_once(module, forbidden):
+    """(cumulative import seconds, forbidden modules loaded) for `import module` in a fresh interpreter."""
+    import subprocess
+    import sys
+
+    code = f"import sys, {module}; print(','.join(m for m in {list(forbidden)!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    cumulative_us = None
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return cumulative_us / 1e6, loaded
+
+
+def bench_importtime(repeat=3, budgets=IMPORT_BUDGETS):
+    """
+    `python -X importtime` for each entry module. Fails (returns False) when a
+    module is over its budget or imports one of its forbidden heavy packages.
+    """
+    ok = True
+    for module, (budget, forbidden) in budgets.items():
+        runs = [_import_once(module, forbidden) for _ in range(repeat)]
+        best = min(seconds for seconds, _ in runs)
+        loaded = sorted({m for _, mods in runs for m in mods})
+        passed = best <= budget and not loaded
+        ok = ok and passed
+        print({"module": module, "import_s": round(best, 3), "budget_s": budget,
+               "heavy_imports": loaded, "ok": passed})
+    return ok
+
+
+# -------------------- Instrumentation overhead --------------------
+SPAN_BUDGET_US = 5.0  # Per timed span, on top of the timed code
+
+
+def bench_metrics(spans=200_000, budget_us=SPAN_BUDGET_US):
+    """
+    Cost of the metrics.py instrumentation: a bare observe(), a timed span on
+    a pre-bound series (model calls), a span with a label lookup (OCR per
+    PSM), a debug log call dropped by the level filter, and rendering /metrics.
+    Fails (returns False) when a span costs more than `budget_us`.
+    """
+    from jsonlog import log
+    from metrics import Histogram
+
+    hist = Histogram("bench_seconds", "Overhead benchmark.", ("op",))
+    series = hist.labels("predict")
+
+    def per_call_us(body):
+        start = time.perf_counter()
+        body()
+        return (time.perf_counter() - start) / spans * 1e6
+
+    def empty():
+        for _ in range(spans):
+            pass
+
+    def observe():
+        for _ in range(spans):
+            series.observe(0.0001)
+
+    def span():
+        for _ in range(spans):
+            with series.time():
+                pass
+
+    def labelled_span():
+        for _ in range(spans):
+            with hist.time("learn"):
+                pass
+
+    def dropped_log():
+        for _ in range(spans):
+            log("bench", "debug", value=1)
+
+    baseline = min(per_call_us(empty) for _ in range(3))
+    result = {name: round(min(per_call_us(body) for _ in range(3)) - baseline, 3)
+              for name, body in (("observe_us", observe), ("span_us", span),
+                                 ("labelled_span_us", labelled_span), ("dropped_debug_log_us", dropped_log))}
+
+    # Scrape cost with a realistic number of series (models x ops, PSMs, stages, routes)
+    for i in range(60):
+        hist.observe(0.001 * i, f"series_{i}")
+    start = time.perf_counter()
+    text = "\n".join(hist.render())
+    result["render_ms_60_series"] = round((time.perf_counter() - start) * 1000, 2)
+    result["render_bytes"] = len(text)
+    result["budget_us"] = budget_us
+    result["ok"] = max(result["span_us"], result["labelled_span_us"]) <= budget_us
+    print(result)
+    return result["ok"]
+
+
+# -------------------- Regression suite (JSON baseline) --------------------
+# Synthetic, seeded, fully in-process cases (mongomock collections, ASGI
+# transport instead of sockets). Each case reports ops/s and p50/p99 per
+# call and is run --repeat times, keeping the best numbers so a burst of
+# noise on a shared box does not count as a regression.
+#
+# Right before and after every run a fixed pure-Python reference workload is
+# timed, and the case is also stored relative to it (rel_ops: case ops per
+# reference op, rel_p99: p99 in reference ops). A loaded or slower machine
+# slows both alike, so `regress` compares these ratios with the committed
+# bench_baseline.json and fails when rel_ops drops or rel_p99 grows by more
+# than the threshold. Absolute numbers are kept in the file for reference.
+#
+# Re-record after an intentional performance change (or a new suite case):
+#      python bench.py regress --update [--only api]
+# and commit bench_baseline.json with the change.
+BASELINE_PATH = os.environ.get("BDG_BENCH_BASELINE",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json"))
+REGRESSION_THRESHOLD = 0.25     # Allowed rel_ops drop
+P99_THRESHOLD = 0.5             # Allowed rel_p99 growth (tails of µs-scale calls are scheduler noise)
+FEATURE_HISTORIES = (10, 50, 100)
+SUITE_GAME = "WinGo_30S"
+
+# Every JSON endpoint of main.py (/stream never completes; see `bench.py stream`)
+API_PATHS = (
+    "/games", "/latest_prediction", "/latest_data?limit=50", "/history?limit=50",
+    "/history/export?limit=200", "/raw_logs?limit=50", "/raw_logs/export?limit=200",
+    "/stats?window=1d", "/gaps?scan=500", "/db_stats", "/metrics",
+)
+
+
+def _case_result(samples_s, wall_s):
+    """ops/s over the whole run plus per-call latency percentiles (µs)."""
+    ordered = sorted(samples_s)
+    return {
+        "ops_per_s": round(len(ordered) / wall_s, 1),
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 1),
+        "p99_us": round(ordered[int(0.99 * (len(ordered) - 1))] * 1e6, 1),
+    }
+
+
+def _timed_calls(fn, args_list):
+    samples = []
+    started = time.perf_counter()
+    for args in args_list:
+        t = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t)
+    return _case_result(samples, time.perf_counter() - started)
+
+
+@contextmanager
+def suite_features(calls=5000):
+    """utils.extract_features at each history length."""
+    from utils import extract_features
+
+    docs = [dict(d, number=int(d["number"]), color=d["color"].lower(), size=d["size"].lower())
+            for d in synthetic_rounds(calls + max(FEATURE_HISTORIES))]
+    cases = {}
+    for h in FEATURE_HISTORIES:
+        args = [(docs[i - h:i], docs[i]) for i in range(h, h + calls)]
+        cases[f"features_h{h}"] = partial(_timed_calls, extract_features, args)
+    yield cases
+
+
+@contextmanager
+def suite_format(calls=50_000):
+    """Probability normalization + dict formatting of one prediction."""
+    from model_updater import format_predictions
+
+    rng = random.Random(7)
+    args = []
+    for _ in range(calls):
+        numbers = [rng.random() for _ in range(10)]
+        total = sum(numbers)
+        args.append((rng.random(), rng.random() * 0.2, rng.random(), {i: v / total for i, v in enumerate(numbers)}))
+    yield {"format_predictions": partial(_timed_calls, format_predictions, args)}
+
+
+async def _update_model_run(col, docs):
+    import history_cache
+    import model_updater
+
+    # Fresh models and history for the suite's game on every run (loaded from the in-memory collection)
+    model_updater._game_models.pop(SUITE_GAME, None)
+    history_cache._histories.pop(SUITE_GAME, None)
+    history = history_cache.history_for(SUITE_GAME)
+    await history.load(col)
+
+    samples = []
+    started = time.perf_counter()
+    for d in docs:
+        t = time.perf_counter()
+        await model_updater.update_model(dict(d, number=int(d["number"])), col, SUITE_GAME)
+        samples.append(time.perf_counter() - t)
+        history.append(d)
+    return _case_result(samples, time.perf_counter() - started)
+
+
+@contextmanager
+def suite_update_model(rounds=1000):
+    """model_updater.update_model end to end (cache, features, 4x predict + learn) against an in-memory collection."""
+    import asyncio
+    import datetime
+
+    col = memory_collection()
+    base = datetime.datetime(2025, 1, 1)
+    docs = [dict(d, game_code=SUITE_GAME, timestamp=base + datetime.timedelta(seconds=30 * i))
+            for i, d in enumerate(synthetic_rounds(100 + rounds, seed=11))]
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(col.insert_many([dict(d) for d in docs[:100]]))
+        yield {"update_model": lambda: loop.run_until_complete(_update_model_run(col, docs[100:]))}
+    finally:
+        loop.close()
+
+
+async def _api_setup(docs):
+    import datetime
+
+    import httpx
+    from mongomock_motor import AsyncMongoMockClient
+
+    import main
+    from accuracy_stats import record_rounds
+
+    db = AsyncMongoMockClient()["bench_db"]
+    col = db["game_results"]
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    stored = [dict(_stored_round(d, now - datetime.timedelta(seconds=30 * (docs - i))), game_code=SUITE_GAME)
+              for i, d in enumerate(synthetic_rounds(docs, seed=5))]
+    await col.insert_many(stored)
+    await record_rounds(db["accuracy_stats"], stored)
+
+    main.collection = main.read_collection = col
+    main.stats_collection = db["accuracy_stats"]
+    main.gaps_collection = db["round_gaps"]
+    main.invalidate_latest_data_cache()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+
+
+async def _api_run(http, path, requests, concurrency):
+    import asyncio
+
+    import main
+
+    # Each run starts cold and (TTL pinned in suite_api) does exactly one uncached /latest_data read
+    main.invalidate_latest_data_cache()
+    sem = asyncio.Semaphore(concurrency)
+    samples, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with sem:
+            t = time.perf_counter()
+            resp = await http.get(path)
+            samples.append(time.perf_counter() - t)
+            errors += resp.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(f"{path}: {errors}/{requests} requests failed")
+    return _case_result(samples, wall)
+
+
+@contextmanager
+def suite_api(requests=100, concurrency=16, docs=500):
+    """Every main.py JSON endpoint under `concurrency` concurrent local requests (in-process ASGI, in-memory DB)."""
+    import asyncio
+
+    import main
+
+    loop = asyncio.new_event_loop()
+    http = loop.run_until_complete(_api_setup(docs))
+    ttl, main.LATEST_DATA_TTL = main.LATEST_DATA_TTL, float("inf")  # Wall-clock expiry would make the case timing-dependent
+    try:
+        yield {"api " + path.split("?")[0]: partial(
+            lambda p: loop.run_until_complete(_api_run(http, p, requests, concurrency)), path)
+            for path in API_PATHS}
+    finally:
+        loop.run_until_complete(http.aclose())
+        loop.close()
+        main.LATEST_DATA_TTL = ttl
+        main.collection = main.read_collection = main.stats_collection = main.gaps_collection = None
+
+
+# Case groups: context managers yielding {case name: callable returning one run's numbers}
+SUITE = {
+    "features": suite_features,
+    "format": suite_format,
+    "update_model": suite_update_model,
+    "api": suite_api,
+}
+
+
+def _reference_work(n=2000):
+    """Fixed interpreter-bound workload (dicts, string keys, float math) the cases are measured against."""
+    total = 0.0
+    for i in range(n):
+        d = {"a": i, "b": i * 0.5, "c": str(i)}
+        total += d["b"] / (1 + len(d["c"])) + (d["a"] % 7)
+    return total
+
+
+def reference_ops_per_s(calls=200):
+    """Best of three short timings of _reference_work (reference ops per second right now)."""
+    best = 0.0
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(calls):
+            _reference_work()
+        best = max(best, calls / (time.perf_counter() - started))
+    return best
+
+
+def _relative(row, reference):
+    """Add the machine-independent ratios to one run's numbers."""
+    return dict(row, rel_ops=row["ops_per_s"] / reference, rel_p99=row["p99_us"] * 1e-6 * reference)
+
+
+def run_suite(groups=None, repeat=5):
+    """
+    Best of `repeat` runs per case (highest ops/s and rel_ops, lowest p50/p99
+    and rel_p99), keyed by case name. Each run sits between two reference
+    timings; their mean is the machine's speed during the run.
+    """
+    best = {}
+    for group in groups or SUITE:
+        with SUITE[group]() as cases:
+            for name, run in cases.items():
+                rows = []
+                for _ in range(repeat):
+                    before = reference_ops_per_s()
+                    row = run()
+                    rows.append(_relative(row, (before + reference_ops_per_s()) / 2))
+                best[name] = {
+                    "ops_per_s": max(r["ops_per_s"] for r in rows),
+                    "p50_us": min(r["p50_us"] for r in rows),
+                    "p99_us": min(r["p99_us"] for r in rows),
+                    "rel_ops": round(max(r["rel_ops"] for r in rows), 4),
+                    "rel_p99": round(min(r["rel_p99"] for r in rows), 4),
+                }
+    return best
+
+
+def _environment():
+    import platform
+    return {"python": platform.python_version(), "machine": platform.machine(), "node": platform.node()}
+
+
+def compare_to_baseline(results, baseline, threshold=REGRESSION_THRESHOLD, p99_threshold=P99_THRESHOLD):
+    """
+    Regressions as (case, metric, baseline, current) tuples, on the reference
+    ratios (absolute numbers for baseline entries recorded without them).
+    Cases missing on either side are skipped.
+    """
+    regressions = []
+    for name, row in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ops, p99 = ("rel_ops", "rel_p99") if "rel_ops" in base else ("ops_per_s", "p99_us")
+        if row[ops] < base[ops] * (1 - threshold):
+            regressions.append((name, ops, base[ops], row[ops]))
+        if row[p99] > base[p99] * (1 + p99_threshold):
+            regressions.append((name, p99, base[p99], row[p99]))
+    return regressions
+
+
+def bench_regress(groups=None, repeat=5, baseline_path=BASELINE_PATH, threshold=REGRESSION_THRESHOLD,
+                  p99_threshold=P99_THRESHOLD, update=False):
+    """
+    Run the suite and compare with `baseline_path`. Writes the baseline when
+    it does not exist yet (or with update=True). Returns False on a regression.
+    """
+    import json
+
+    results = run_suite(groups, repeat)
+    for name, row in results.items():
+        print({"case": name, **row})
+
+    if update or not os.path.exists(baseline_path):
+        previous = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path, encoding="utf-8") as f:
+                previous = json.load(f).get("cases", {})
+        payload = {"environment": _environment(), "threshold": threshold, "p99_threshold": p99_threshold,
+                   "cases": dict(previous, **results)}
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+        print(f"[BENCH] Baseline written to {baseline_path} ({len(payload['cases'])} cases).")
+        return True
+
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("environment", {}).get("python") != _environment()["python"]:
+        print(f"[BENCH WARN] Baseline was recorded on {baseline.get('environment')}, this is {_environment()}.")
+    regressions = compare_to_baseline(results, baseline.get("cases", {}), threshold, p99_threshold)
+    for name, metric, base, current in regressions:
+        limit = p99_threshold if "p99" in metric else threshold
+        print(f"[BENCH FAIL] {name}: {metric} {base} -> {current} (threshold {limit:.0%})")
+    print(f"[BENCH] {len(results) - len({r[0] for r in regressions})}/{len(results)} cases within "
+          f"{threshold:.0%} (p99 {p99_threshold:.0%}) of {baseline_path}.")
+    return not regressions
+
+
+# -------------------- Start --------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks.")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("checkpoint", help="Checkpoint save/load time")
+    p.add_argument("--rounds", type=int, default=2000)
+    p.add_argument("--repeat", type=int, default=20)
+
+    p = sub.add_parser("features", help="Per-round vs vectorized feature extraction")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--per-round-limit", type=int, default=1_000_000)
+
+    p = sub.add_parser("stream", help="SSE /stream load test with many local clients")
+    p.add_argument("--clients", type=int, nargs="+", default=[50, 100, 200])
+    p.add_argument("--rounds", type=int, default=5)
+
+    p = sub.add_parser("export", help="NDJSON export time-to-first-byte and peak RSS")
+    p.add_argument("--docs", type=int, default=1_000_000)
+    p.add_argument("--mongo-uri", default=None, help="Local mongod URI (default: in-memory stand-in)")
+
+    p = sub.add_parser("capture", help="Disk vs in-memory screenshot capture (+OCR) latency")
+    p.add_argument("--dir", required=True, help="Directory of recorded full-page .png screenshots")
+    p.add_argument("--rounds", type=int, default=50)
+    p.add_argument("--no-ocr", action="store_true", help="Measure capture/crop only")
+
+    p = sub.add_parser("ocr", help="Sequential OCR vs concurrent OCR service with crop cache")
+    p.add_argument("--dir", required=True, help="Directory of saved result-box .png crops")
+    p.add_argument("--passes", type=int, default=2)
+
+    p = sub.add_parser("dom", help="DOM history-row parser vs screenshot + OCR latency per round")
+    p.add_argument("--dir", required=True, help="Recording directory (NNNN.png + NNNN.html frames)")
+    p.add_argument("--rounds", type=int, default=50)
+    p.add_argument("--no-ocr", action="store_true", help="Measure the DOM path only")
+
+    p = sub.add_parser("ingest", help="Multi-game ingestion throughput against a local fake page server")
+    p.add_argument("--streams", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--browsers", type=int, default=1, help="Browser instances shared by the game tabs")
+    p.add_argument("--duration", type=float, default=20.0, help="Seconds per run")
+    p.add_argument("--speedup", type=float, default=30.0, help="Game clock speed-up factor")
+
+    p = sub.add_parser("writebehind", help="Inline insert_one vs write-behind queue with an injected outage")
+    p.add_argument("--rounds", type=int, default=300)
+    p.add_argument("--interval", type=float, default=0.01, help="Seconds between rounds")
+    p.add_argument("--latency", type=float, default=0.05, help="Injected write latency (s)")
+
+    p = sub.add_parser("pool", help="API p50/p99 latency with default vs tuned MongoDB client pools")
+    p.add_argument("--mongo-uri", required=True, help="Local mongod URI")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256])
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--docs", type=int, default=10_000)
+
+    p = sub.add_parser("importtime", help="Cold import time of the entry modules against a budget")
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("records", help="Round records vs raw documents: memory per cached round and per-tick CPU")
+    p.add_argument("--cached", type=int, default=100_000)
+    p.add_argument("--ticks", type=int, default=20_000)
+
+    p = sub.add_parser("metrics", help="Per-span cost of the latency histograms and structured logging")
+    p.add_argument("--spans", type=int, default=200_000)
+
+    p = sub.add_parser("regress", help="Hot-path regression suite against a JSON baseline")
+    p.add_argument("--only", nargs="+", choices=sorted(SUITE), help="Case groups to run (default: all)")
+    p.add_argument("--repeat", type=int, default=5, help="Runs per case (best is kept)")
+    p.add_argument("--baseline", default=BASELINE_PATH)
+    p.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                   help="Allowed relative throughput drop (fraction)")
+    p.add_argument("--p99-threshold", type=float, default=P99_THRESHOLD, help="Allowed relative p99 growth (fraction)")
+    p.add_argument("--update", action="store_true", help="Record the results as the new baseline")
+
+    args = parser.parse_args()
+
+    if args.bench == "checkpoint":
+        print(bench_checkpoint(args.rounds, args.repeat))
+    elif args.bench == "features":
+        bench_features(args.sizes, args.per_round_limit)
+    elif args.bench == "stream":
+        bench_stream(args.clients, args.rounds)
+    elif args.bench == "export":
+        bench_export(args.docs, args.mongo_uri)
+    elif args.bench == "capture":
+        bench_capture(args.dir, args.rounds, not args.no_ocr)
+    elif args.bench == "ocr":
+        bench_ocr(args.dir, args.passes)
+    elif args.bench == "dom":
+        bench_dom(args.dir, args.rounds, not args.no_ocr)
+    elif args.bench == "ingest":
+        bench_ingest(args.streams, args.browsers, args.duration, args.speedup)
+    elif args.bench == "writebehind":
+        bench_writebehind(args.rounds, args.interval, args.latency)
+    elif args.bench == "pool":
+        bench_pool(args.mongo_uri, args.concurrency, args.requests, args.docs)
+    elif args.bench == "importtime":
+        if not bench_importtime(args.repeat):
+            raise SystemExit(1)
+    elif args.bench == "records":
+        bench_records(args.cached, args.ticks)
+    elif args.bench == "metrics":
+        if not bench_metrics(args.spans):
+            raise SystemExit(1)
+    elif args.bench == "regress":
+        if not bench_regress(args.only, args.repeat, args.baseline, args.threshold, args.p99_threshold,
+                             update=args.update):
+            raise SystemExit(1)
@@ -0,0 +1,184 @@
+# broadcast.py (PUSH-BASED LIVE ROUND UPDATES)
+#
+# One watcher task per API process follows game_results and fans each new round
+# out to every connected dashboard, so DB load does not grow with the number of
+# clients. A MongoDB change stream is used when the server supports it (replica
+# set); otherwise the watcher tails the collection by _id (insertion order).
+# Timestamps are no use for tailing: backfilled rounds are back-dated and
+# write-behind batches of several games are not inserted in timestamp order.
+
+import asyncio
+import datetime
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+from jsonlog import log
+from utils import derive_prediction_fields
+
+POLL_INTERVAL = 1.0        # seconds between tailing queries (fallback mode)
+SUBSCRIBER_QUEUE_SIZE = 16  # rounds buffered per client before it is dropped
+# ObjectIds of different writers only sort by their creation second, so each
+# tailing query re-reads this window behind the newest _id (seen ids are skipped)
+TAIL_OVERLAP = datetime.timedelta(seconds=5)
+MAX_RETRY_DELAY = 30.0     # Cap of the change stream reconnect backoff (seconds)
+
+
+class RoundBroadcaster:
+    """Fan-out of newly stored rounds to any number of subscriber queues."""
+
+    def __init__(self, collection, projection, poll_interval=POLL_INTERVAL, on_round=None, change_stream=True):
+        self.collection = collection
+        self.projection = projection
+        self.poll_interval = poll_interval
+        self.change_stream = change_stream
+        self.on_round = on_round    # Optional hook (e.g. cache invalidation)
+        self._subscribers = set()
+        self._task = None
+        self.last_id = None         # Newest _id seen by the tailing watcher
+        self._seen = {}             # _id -> creation time, for ids inside the TAIL_OVERLAP window
+        self.queries = 0            # DB queries issued by the watcher
+
+    def subscribe(self):
+        """Register a client; starts the watcher on first use."""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, record):
+        """Push a stored round to every subscriber (also usable from an in-process insert path)."""
+        if "predicted_color" not in record:
+            record.update(derive_prediction_fields(record))
+        if self.on_round:
+            self.on_round(record)
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(record)
+            except asyncio.QueueFull:
+                # Slow client: drop it; it reconnects with a fresh window
+                self._drop(queue)
+
+    def _drop(self, queue):
+        """Unsubscribe a client and end its stream (None sentinel)."""
+        self._subscribers.discard(queue)
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def close_subscribers(self):
+        """End every open stream, e.g. when rounds may have been missed; clients reconnect with a fresh snapshot."""
+        for queue in list(self._subscribers):
+            self._drop(queue)
+
+    def _tail_query(self):
+        if self.last_id is None:
+            return {}
+        return {"_id": {"$gt": ObjectId.from_datetime(self.last_id.generation_time - TAIL_OVERLAP)}}
+
+    def _mark_seen(self, _id):
+        """Record a tailed _id; False if it was already published."""
+        if _id in self._seen:
+            return False
+        self._seen[_id] = _id.generation_time
+        if self.last_id is None or _id > self.last_id:
+            self.last_id = _id
+        return True
+
+    def _prune_seen(self):
+        cutoff = self.last_id.generation_time - TAIL_OVERLAP
+        for _id in [i for i, created in self._seen.items() if created < cutoff]:
+            del self._seen[_id]
+
+    async def _initial_tail(self):
+        """Start after the rounds already stored (including the overlap window's)."""
+        self.queries += 1
+        latest = await self.collection.find({}, {"_id": 1}).sort("_id", -1).limit(1).to_list(1)
+        if not latest:
+            return
+        self.last_id = latest[0]["_id"]
+        self.queries += 1
+        for doc in await self.collection.find(self._tail_query(), {"_id": 1}).to_list(None):
+            self._mark_seen(doc["_id"])
+
+    async def _watch(self):
+        try:
+            if self.change_stream and await self._watch_change_stream():
+                return
+            await self._watch_polling()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Never leave clients waiting on a dead watcher; the next subscribe() starts a new one
+            log("stream_watcher_failed", "error", error_type=e.__class__.__name__, error=str(e))
+            self.close_subscribers()
+
+    async def _watch_change_stream(self):
+        """
+        Follow inserts through a change stream until cancelled. After an error
+        the stream is reopened (with backoff) from the last resume token, so no
+        round is skipped. If it cannot resume (invalidate event, token no longer
+        in the oplog) it starts fresh and ends the open streams, since rounds
+        may have been missed. Returns False right away if the server has no
+        change streams (standalone mongod), so the caller falls back to polling.
+        """
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        resume_token, opened, failures = None, False, 0
+        while True:
+            try:
+                async with self.collection.watch(pipeline, resume_after=resume_token) as stream:
+                    log("stream_watching", mode="change_stream", resumed=resume_token is not None)
+                    opened, failures = True, 0
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change["fullDocument"]
+                        self.publish({k: doc.get(k) for k, keep in self.projection.items() if keep and k in doc})
+                # The stream ended on its own: invalidated (collection dropped or renamed)
+                log("stream_invalidated", "warning")
+                resume_token = None
+                self.close_subscribers()
+            except OperationFailure as e:
+                if not opened:
+                    log("stream_unsupported", "warning", error=str(e))
+                    return False
+                failures += 1
+                log("stream_failed", "error", error_type=e.__class__.__name__, error=str(e), resumable=False)
+                resume_token = None
+                self.close_subscribers()
+            except PyMongoError as e:
+                # Network error / primary stepdown: resume where the stream left off
+                failures += 1
+                log("stream_failed", "warning", error_type=e.__class__.__name__, error=str(e),
+                    resumable=resume_token is not None)
+                if resume_token is None:
+                    self.close_subscribers()
+            await asyncio.sleep(min(self.poll_interval * 2 ** failures, MAX_RETRY_DELAY))
+
+    async def _watch_polling(self):
+        log("stream_watching", mode="polling", interval_s=self.poll_interval)
+        if self.last_id is None:
+            await self._initial_tail()
+        projection = dict(self.projection, _id=1)
+
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self.queries += 1
+                new_rounds = await self.collection.find(self._tail_query(), projection).sort("_id", 1).to_list(None)
+            except Exception as e:
+                log("stream_poll_failed", "error", error_type=e.__class__.__name__, error=str(e))
+                continue
+            for record in new_rounds:
+                if self._mark_seen(record.pop("_id")):
+                    self.publish(record)
+            if self.last_id is not None:
+                self._prune_seen()
@@ -0,0 +1,96 @@
+# check_query_plans.py (QUERY-PLAN VERIFICATION)
+#
+# Runs explain() on every game_results (and round_gaps) read path and fails if
+# any of them falls back to a collection scan or an in-memory sort.
+#
+#      python check_query_plans.py            (exit code 1 on a bad plan)
+
+import asyncio
+import datetime
+import sys
+
+from bson import ObjectId
+
+from database import close_client, ensure_indexes, get_collection, open_client
+from main import LATEST_DATA_PROJECTION
+from pagination import PAGE_SORT, encode_cursor, keyset_query
+from games import DEFAULT_GAME
+from gaps import GAPS_COLLECTION_NAME, ensure_gaps_indexes
+from round_record import ROUND_PROJECTION
+
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+_ts = datetime.datetime(2025, 1, 1)
+_game = {"game_code": DEFAULT_GAME}
+_cursor = encode_cursor({"timestamp": _ts, "period": "20250101100010000"})
+
+# (name, filter, projection, sort, limit) for each read path
+ENDPOINT_QUERIES = [
+    ("main.latest_prediction", {}, {"_id": 0}, [("timestamp", -1)], 1),
+    ("main.history", {}, None, PAGE_SORT, 20),
+    ("main.latest_data", {}, LATEST_DATA_PROJECTION, [("timestamp", -1)], 50),
+    ("main.raw_logs", {}, {"_id": 0}, PAGE_SORT, 20),
+    ("pagination.next_page", keyset_query(_cursor), None, PAGE_SORT, 20),
+    ("main.latest_prediction?game", _game, {"_id": 0}, [("timestamp", -1)], 1),
+    ("main.latest_data?game", _game, LATEST_DATA_PROJECTION, [("timestamp", -1)], 50),
+    ("pagination.next_page?game", keyset_query(_cursor, _game), None, PAGE_SORT, 20),
+    ("round_record.get_last_n_records", _game, ROUND_PROJECTION, [("timestamp", -1)], 100),
+    ("broadcast.tail", {"_id": {"$gt": ObjectId.from_datetime(_ts)}}, LATEST_DATA_PROJECTION, [("_id", 1)], 0),
+    ("replay.replay", _game, None, [("timestamp", 1)], 0),
+    ("gaps.gap_report", _game, {"_id": 0, "period": 1}, [("timestamp", -1), ("period", -1)], 2000),
+    ("period lookup", {**_game, "period": "20250101100010000"}, None, None, 1),
+]
+
+# Same for round_gaps
+GAPS_QUERIES = [
+    ("gaps.gap_report events", _game, {"_id": 0}, [("detected_at", -1)], 20),
+]
+
+
+def plan_stages(plan):
+    """All stage names in an explain() plan tree."""
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return [s for s in stages if s]
+
+
+async def check_query_plans(coll=None, queries=ENDPOINT_QUERIES):
+    """Return {query name: bad stages}; empty dict means every plan uses an index."""
+    coll = get_collection() if coll is None else coll
+    failures = {}
+    for name, query, projection, sort, limit in queries:
+        cursor = coll.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        explain = await cursor.explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        bad = sorted(BAD_STAGES.intersection(stages))
+        print(f"[PLAN] {name}: {' <- '.join(stages)}{'  <-- FAIL' if bad else ''}")
+        if bad:
+            failures[name] = bad
+    return failures
+
+
+async def main():
+    open_client()
+    try:
+        await ensure_indexes()
+        gaps = get_collection(name=GAPS_COLLECTION_NAME)
+        await ensure_gaps_indexes(gaps)
+        failures = await check_query_plans()
+        failures.update(await check_query_plans(gaps, GAPS_QUERIES))
+        return failures
+    finally:
+        close_client()
+
+
+# -------------------- Start --------------------
+if __name__ == "__main__":
+    failures = asyncio.run(main())
+    sys.exit(1 if failures else 0)
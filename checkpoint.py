@@ -0,0 +1,169 @@
+# checkpoint.py (MODEL STATE CHECKPOINTING / WARM START)
+
+import asyncio
+import datetime
+import glob
+import os
+import pickle
+import time
+
+import model_updater
+from games import DEFAULT_GAME, game_filter
+from jsonlog import log
+from utils import RollingFeatureState
+
+# Bump when the checkpoint payload layout changes; older files are ignored
+CHECKPOINT_VERSION = 1
+
+CHECKPOINT_DIR = os.environ.get("BDG_CHECKPOINT_DIR", "checkpoints")   # One subdirectory per game code
+CHECKPOINT_EVERY = 100   # Rounds between periodic snapshots
+CHECKPOINT_KEEP = 3      # Number of checkpoint files to keep on disk
+
+# In-flight background write per game code (at most one at a time each)
+_write_tasks = {}
+
+
+def _checkpoint_dir(game_code):
+    return os.path.join(CHECKPOINT_DIR, game_code)
+
+
+def _checkpoint_path(created_at, game_code=DEFAULT_GAME):
+    return os.path.join(_checkpoint_dir(game_code), f"models_{created_at:%Y%m%dT%H%M%S%f}.pkl")
+
+
+def serialize_checkpoint(period=None, timestamp=None, game_code=DEFAULT_GAME):
+    """
+    Snapshot one game's four pipelines plus the round they were trained through.
+    Runs on the caller's thread so the snapshot is consistent with the models.
+    """
+    created_at = datetime.datetime.now(datetime.UTC)
+    payload = {
+        "version": CHECKPOINT_VERSION,
+        "created_at": created_at,
+        "game_code": game_code,
+        "period": period,
+        "timestamp": timestamp,
+        "rounds_trained": model_updater.models_for(game_code).rounds_trained,
+        "models": model_updater.get_models(game_code),
+    }
+    return created_at, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _write_checkpoint(created_at, data, game_code=DEFAULT_GAME):
+    """Atomically write a checkpoint file and prune old ones."""
+    directory = _checkpoint_dir(game_code)
+    os.makedirs(directory, exist_ok=True)
+    path = _checkpoint_path(created_at, game_code)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+    for old in sorted(glob.glob(os.path.join(directory, "models_*.pkl")))[:-CHECKPOINT_KEEP]:
+        os.remove(old)
+    return path
+
+
+def save_checkpoint_sync(period=None, timestamp=None, game_code=DEFAULT_GAME):
+    """Blocking save, used on shutdown."""
+    created_at, data = serialize_checkpoint(period, timestamp, game_code)
+    path = _write_checkpoint(created_at, data, game_code)
+    log("checkpoint_saved", game_code=game_code, path=path, period=period)
+    return path
+
+
+async def _write_in_background(created_at, data, period=None, game_code=DEFAULT_GAME):
+    """Write an already serialized snapshot in a worker thread."""
+    path = await asyncio.to_thread(_write_checkpoint, created_at, data, game_code)
+    log("checkpoint_saved", game_code=game_code, path=path, period=period)
+    return path
+
+
+async def save_checkpoint(period=None, timestamp=None, game_code=DEFAULT_GAME):
+    """Snapshot on the event loop, write the file in a worker thread."""
+    created_at, data = serialize_checkpoint(period, timestamp, game_code)
+    return await _write_in_background(created_at, data, period, game_code)
+
+
+def schedule_checkpoint(period=None, timestamp=None, game_code=DEFAULT_GAME):
+    """
+    Fire-and-forget periodic checkpoint. Never blocks the fetch loop on disk IO
+    and skips the snapshot if the game's previous write is still in flight.
+
+    The models are pickled right here, before returning: call it after the
+    round's update_model has completed (its model lane steps are done and the
+    next round's have not been submitted), so the snapshot holds exactly the
+    rounds up to `period`. Only the bytes go to the background write.
+    """
+    task = _write_tasks.get(game_code)
+    if task is not None and not task.done():
+        return None
+    created_at, data = serialize_checkpoint(period, timestamp, game_code)
+    task = _write_tasks[game_code] = asyncio.create_task(_write_in_background(created_at, data, period, game_code))
+    return task
+
+
+async def flush_checkpoint():
+    """Wait for in-flight background writes (call before shutdown)."""
+    pending = [t for t in _write_tasks.values() if not t.done()]
+    if pending:
+        await asyncio.gather(*pending)
+
+
+def latest_checkpoint_path(game_code=DEFAULT_GAME):
+    paths = sorted(glob.glob(os.path.join(_checkpoint_dir(game_code), "models_*.pkl")))
+    return paths[-1] if paths else None
+
+
+def load_latest_checkpoint(game_code=DEFAULT_GAME):
+    """
+    Restore the newest compatible checkpoint of one game into model_updater.
+    Returns its metadata (without the models), or None if there is none.
+    """
+    path = latest_checkpoint_path(game_code)
+    if path is None:
+        return None
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        payload = pickle.load(f)
+
+    if payload.get("version") != CHECKPOINT_VERSION:
+        log("checkpoint_ignored", "warning", path=path, version=payload.get("version"), expected=CHECKPOINT_VERSION)
+        return None
+
+    model_updater.load_models(payload["models"], payload.get("rounds_trained", 0), game_code)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    meta = {k: v for k, v in payload.items() if k != "models"}
+    meta["path"] = path
+    meta["load_ms"] = round(elapsed_ms, 2)
+    log("checkpoint_loaded", game_code=game_code, path=path, period=meta["period"],
+        rounds_trained=meta["rounds_trained"], load_ms=meta["load_ms"])
+    return meta
+
+
+async def warm_start(collection, history=100, game_code=DEFAULT_GAME):
+    """
+    Load one game's latest checkpoint and catch up only on its rounds stored after it.
+    Without a checkpoint the models simply start cold, as before.
+    """
+    from replay import replay
+
+    meta = load_latest_checkpoint(game_code)
+    if meta is None or meta.get("timestamp") is None:
+        log("checkpoint_missing", game_code=game_code)
+        return None
+
+    # Rebuild the feature window as it was at the checkpoint, then replay newer rounds
+    prior = await collection.find(
+        {**game_filter(game_code), "timestamp": {"$lte": meta["timestamp"]}},
+        {"_id": 0, "number": 1, "color": 1, "size": 1}
+    ).sort("timestamp", -1).limit(history).to_list(history)
+    prior.reverse()
+    state = RollingFeatureState(history).warm_up(prior)
+
+    report = await replay(collection, {"timestamp": {"$gt": meta["timestamp"]}}, history=history, state=state,
+                          report_every=0, game_code=game_code)
+    log("checkpoint_caught_up", game_code=game_code, trained=report["trained"])
+    return meta
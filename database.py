@@ -1,5 +1,243 @@
+# database.py (MONGODB CLIENT LIFECYCLE + game_results INDEXES)
+#
+# No client exists at import time. Each entry point opens one shared client
+# with its own pool/timeout profile inside its event loop (FastAPI lifespan,
+# ingestion main) and closes it on shutdown:
+#
+#      open_client(API_CLIENT_OPTIONS)
+#      collection = get_collection()
+#      ...
+#      close_client()
+
+import os
+import threading
+import time
+
 import motor.motor_asyncio
+from pymongo import ASCENDING, DESCENDING, ReadPreference
+from pymongo.errors import OperationFailure
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
+
+from jsonlog import log
+from metrics import StageMetrics, histogram
+
+MONGO_URI = os.environ.get("BDG_MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("BDG_DB_NAME", "betting_db")
+COLLECTION_NAME = "game_results"
+
+# --- Client profiles (PyMongo keyword options; they override options given in the URI) ---
+# Driver defaults (maxPoolSize=100, 30s server selection, no socket timeout), kept for comparison
+DEFAULT_CLIENT_OPTIONS = {}
+
+# API: many short concurrent reads. Bounded pool with a short checkout wait so a
+# stalled mongod fails requests fast instead of piling them up.
+API_CLIENT_OPTIONS = {
+    "maxPoolSize": 50,
+    "minPoolSize": 10,              # Warm connections for bursts of dashboard requests
+    "maxIdleTimeMS": 300_000,
+    "waitQueueTimeoutMS": 2_000,
+    "connectTimeoutMS": 3_000,
+    "serverSelectionTimeoutMS": 3_000,
+    "socketTimeoutMS": 10_000,
+    "appname": "bdg-api",
+}
+
+# Ingestion: a handful of concurrent writers (one batch writer + per-game reads);
+# writes are acknowledged by the journal so a stored round survives a mongod crash.
+INGEST_CLIENT_OPTIONS = {
+    "maxPoolSize": 10,
+    "minPoolSize": 1,
+    "connectTimeoutMS": 5_000,
+    "serverSelectionTimeoutMS": 5_000,  # The write-behind queue spills to disk meanwhile
+    "socketTimeoutMS": 30_000,
+    "w": 1,
+    "journal": True,
+    "appname": "bdg-ingest",
+}
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+MONGO_COMMAND_SECONDS = histogram("bdg_mongo_command_seconds", "MongoDB command round trip (driver-measured).",
+                                  ("command", "outcome"))
+
+
+class CommandTimer(CommandListener):
+    """Feeds bdg_mongo_command_seconds from PyMongo command events (find, getMore, insert, aggregate, ...)."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name, "ok")
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name, "error")
+
+
+class PoolStats(ConnectionPoolListener):
+    """Connection pool usage, fed by PyMongo pool events (called from driver threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0               # Connections currently open
+        self.checked_out = 0        # Connections currently in use
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0  # Pool wait timeouts / connection errors
+        self.cleared = 0            # Pool resets (e.g. after a network error)
+        self.checkout_wait = StageMetrics("checkout_wait")
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.checkout_wait.observe(getattr(event, "duration", 0.0) or 0.0)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.cleared += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def summary(self):
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "cleared": self.cleared,
+                "checkout_wait": self.checkout_wait.summary(),
+            }
+
+
+def make_client(options=None, uri=None, stats=None):
+    """New Motor client with the given PyMongo options (pool, timeouts, readPreference, w, ...)."""
+    options = dict(options or {})
+    listeners = list(options.get("event_listeners", [])) + [CommandTimer()]
+    if stats is not None:
+        listeners.append(stats)
+    options["event_listeners"] = listeners
+    return motor.motor_asyncio.AsyncIOMotorClient(uri or MONGO_URI, **options)
+
+
+# --- Process-wide client (opened by the entry point) ---
+_client = None
+_stats = None
+_opened_at = None
+
+
+def open_client(options=None, uri=None):
+    """Open the shared client (no-op if already open). Call from inside the running event loop."""
+    global _client, _stats, _opened_at
+    if _client is None:
+        _stats = PoolStats()
+        _client = make_client(options, uri, _stats)
+        _opened_at = time.monotonic()
+        log("db_client_opened", appname=(options or {}).get("appname", "default"),
+            max_pool_size=(options or {}).get("maxPoolSize", 100))
+    return _client
+
+
+def close_client():
+    global _client, _stats, _opened_at
+    if _client is not None:
+        _client.close()
+        log("db_client_closed")
+    _client = None
+    _stats = None
+    _opened_at = None
+
+
+def get_client():
+    if _client is None:
+        raise RuntimeError("MongoDB client is not open; call database.open_client() at startup.")
+    return _client
+
+
+def get_collection(read_preference=None, name=COLLECTION_NAME):
+    """game_results (or another collection of DB_NAME) on the shared client, optionally with another read preference (e.g. "secondaryPreferred")."""
+    coll = get_client()[DB_NAME][name]
+    if read_preference:
+        coll = coll.with_options(read_preference=READ_PREFERENCES[read_preference])
+    return coll
+
+
+def pool_stats():
+    """Pool usage of the shared client ({} when it is not open)."""
+    if _stats is None:
+        return {}
+    summary = _stats.summary()
+    summary["uptime_s"] = round(time.monotonic() - _opened_at, 1)
+    return summary
+
+# --- Indexes for game_results ---
+# Every read path sorts on timestamp (optionally within one game_code);
+# (game_code, period) identifies a round and must be unique.
+INDEXES = [
+    ([("timestamp", DESCENDING)], {"name": "timestamp_desc"}),
+    ([("timestamp", DESCENDING), ("period", DESCENDING)], {"name": "timestamp_period_desc"}),  # Keyset pagination
+    ([("game_code", ASCENDING), ("timestamp", DESCENDING), ("period", DESCENDING)],
+     {"name": "game_timestamp_period_desc"}),  # Per-game reads and pagination
+    ([("game_code", ASCENDING), ("period", ASCENDING)], {"name": "game_period_unique", "unique": True}),
+]
+
+# Superseded indexes, dropped by ensure_indexes if present
+LEGACY_INDEXES = ["period_unique"]  # Period ids are only unique within one game
+
+
+async def ensure_indexes(coll=None):
+    """Create the game_results indexes (idempotent; called at startup)."""
+    coll = get_collection() if coll is None else coll
+    for keys, options in INDEXES:
+        try:
+            await coll.create_index(keys, **options)
+        except OperationFailure as e:
+            # Usually duplicate periods already stored: the unique index cannot be built until they are removed
+            log("index_create_failed", "error", collection=coll.name, index=options["name"], error=str(e))
 
-client = motor.motor_asyncio.AsyncIOMotorClient("mongodb://localhost:27017")
-db = client["betting_db"]
-collection = db["game_results"]
+    # Only drop the old unique index once its replacement exists
+    existing = await coll.index_information()
+    if "game_period_unique" in existing:
+        for name in LEGACY_INDEXES:
+            if name in existing:
+                await coll.drop_index(name)
+                log("legacy_index_dropped", collection=coll.name, index=name)
@@ -0,0 +1,229 @@
+# dom_history.py (DOM FAST PATH FOR THE "GAME HISTORY" ROWS)
+#
+# One execute_script call returns the visible rows of the "Game history" list
+# (row text plus the class names inside the row, which carry the color dots).
+# parse_history_rows turns them into result dicts (same shape as the OCR path)
+# and validates them; the capture stage only falls back to screenshot + OCR
+# when that validation fails.
+#
+# extract_rows_from_html is the offline equivalent of the script for saved
+# page_dump.html snapshots and the fake drivers.
+#
+#      python dom_history.py snapshots/       (every *.html; a sibling .json holds the expected rows)
+#      python dom_history.py tests/fixtures/dom_history    (committed snapshots; tests/test_dom_history.py)
+
+import glob
+import json
+import os
+import re
+import sys
+from html.parser import HTMLParser
+
+PERIOD_RE = re.compile(r"\b(20\d{11,})\b")
+NUMBER_RE = re.compile(r"(?<![\d.])(\d)(?![\d.])")
+SIZE_RE = re.compile(r"\b(big|small)\b", re.IGNORECASE)
+COLOR_RE = re.compile(r"\b(red|green|violet)\b", re.IGNORECASE)
+
+MAX_ROWS = 10
+
+# Rows are the nearest ancestors of each period cell that also hold the size
+# ("Big"/"Small"), so the script does not depend on the site's class names.
+HISTORY_ROWS_SCRIPT = r"""
+const limit = arguments[0];
+const label = document.evaluate("//*[contains(text(), 'Game history')]", document, null,
+                                XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!label) return null;
+const periodRe = /^\s*20\d{11,}\s*$/;
+const sizeRe = /\b(Big|Small)\b/i;
+const rows = [];
+const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+while (rows.length < limit && walker.nextNode()) {
+    const node = walker.currentNode;
+    if (!(label.compareDocumentPosition(node) & Node.DOCUMENT_POSITION_FOLLOWING)) continue;
+    if (!periodRe.test(node.nodeValue)) continue;
+    let row = node.parentElement;
+    while (row && row !== document.body && !sizeRe.test(row.innerText || "")) row = row.parentElement;
+    if (!row || row === document.body || rows.some(r => r.el === row)) continue;
+    const classes = [row, ...row.querySelectorAll("*")]
+        .map(el => (typeof el.className === "string" ? el.className : (el.className && el.className.baseVal) || ""))
+        .join(" ");
+    rows.push({el: row, text: row.innerText, classes: classes});
+}
+return rows.map(r => ({text: r.text, classes: r.classes}));
+"""
+
+
+def read_history_rows(driver, limit=MAX_ROWS):
+    """Raw {text, classes} rows of the Game history list (newest first), or None if it is not on the page."""
+    return driver.execute_script(HISTORY_ROWS_SCRIPT, limit)
+
+
+# -------------------- Parsing + validation --------------------
+
+def parse_history_row(raw):
+    """
+    One raw row -> {"period", "number", "size", "color"}. Raises ValueError
+    when the row is incomplete or its size/color disagree with the number.
+    """
+    text = raw.get("text") or ""
+    period_match = PERIOD_RE.search(text)
+    if not period_match:
+        raise ValueError(f"no period id in row {text!r}")
+    rest = text[period_match.end():]
+    number_match = NUMBER_RE.search(rest)
+    if not number_match:
+        raise ValueError(f"no result digit in row {text!r}")
+    num = int(number_match.group(1))
+
+    size = "Small" if num <= 4 else "Big"
+    size_match = SIZE_RE.search(rest)
+    if size_match and size_match.group(1).capitalize() != size:
+        raise ValueError(f"size {size_match.group(1)!r} does not match number {num} in row {text!r}")
+
+    # Color dots are usually only visible as class names (red / green / violet)
+    color = "Red" if num % 2 == 0 else "Green"
+    shown = {c.lower() for c in COLOR_RE.findall(f"{raw.get('classes') or ''} {rest}")}
+    if shown and color.lower() not in shown:
+        raise ValueError(f"colors {sorted(shown)} do not match number {num} in row {text!r}")
+
+    return {"period": period_match.group(1), "number": str(num), "size": size, "color": color}
+
+
+def parse_history_rows(raw_rows):
+    """
+    Validated result dicts for all visible rows, newest first. Raises
+    ValueError if the list is missing or empty, a row does not parse, or the
+    periods are not strictly descending.
+    """
+    if not raw_rows:
+        raise ValueError("Game history rows not found")
+    rows = [parse_history_row(raw) for raw in raw_rows]
+    for newer, older in zip(rows, rows[1:]):
+        if int(newer["period"]) <= int(older["period"]):
+            raise ValueError(f"periods out of order: {newer['period']} before {older['period']}")
+    return rows
+
+
+# -------------------- Offline extraction (saved pages / fake drivers) --------------------
+
+class _Node:
+    __slots__ = ("tag", "classes", "children", "parent")
+
+    def __init__(self, tag, classes, parent):
+        self.tag = tag
+        self.classes = classes
+        self.children = []      # _Node or str, in document order
+        self.parent = parent
+
+    def text(self):
+        parts = []
+        for child in self.children:
+            parts.append(child if isinstance(child, str) else child.text())
+        return " ".join(p.strip() for p in parts if p.strip())
+
+    def all_classes(self):
+        names = [self.classes]
+        for child in self.children:
+            if not isinstance(child, str):
+                names.append(child.all_classes())
+        return " ".join(n for n in names if n)
+
+
+class _TreeBuilder(HTMLParser):
+    VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+    SKIP = {"script", "style"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("document", "", None)
+        self.current = self.root
+        self.text_nodes = []    # (text, parent) in document order
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+            return
+        node = _Node(tag, dict(attrs).get("class") or "", self.current)
+        self.current.children.append(node)
+        if tag not in self.VOID:
+            self.current = node
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skipping = max(0, self._skipping - 1)
+            return
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        if self._skipping or not data.strip():
+            return
+        self.current.children.append(data)
+        self.text_nodes.append((data, self.current))
+
+
+def extract_rows_from_html(html, limit=MAX_ROWS):
+    """Same rows HISTORY_ROWS_SCRIPT returns, from page source (None without a Game history label)."""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+
+    texts = builder.text_nodes
+    start = next((i for i, (text, _) in enumerate(texts) if "Game history" in text), None)
+    if start is None:
+        return None
+    rows, seen = [], set()
+    for text, parent in texts[start + 1:]:
+        if len(rows) >= limit:
+            break
+        if not re.fullmatch(r"\s*20\d{11,}\s*", text):
+            continue
+        row = parent
+        while row is not None and row.tag not in ("body", "document") and not SIZE_RE.search(row.text()):
+            row = row.parent
+        if row is None or row.tag in ("body", "document") or id(row) in seen:
+            continue
+        seen.add(id(row))
+        rows.append({"text": row.text(), "classes": row.all_classes()})
+    return rows
+
+
+def check_snapshot(path):
+    """
+    Parse one saved page. If `<path minus .html>.json` exists it must hold the
+    expected rows (list of result dicts, newest first). Returns an error or None.
+    """
+    with open(path, encoding="utf-8") as f:
+        raw = extract_rows_from_html(f.read())
+    try:
+        rows = parse_history_rows(raw)
+    except ValueError as e:
+        return str(e)
+    expected_path = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(expected_path):
+        with open(expected_path, encoding="utf-8") as f:
+            expected = json.load(f)
+        if rows != expected:
+            return f"rows differ from {expected_path}: got {rows[:3]}..."
+    print(f"[DOM] {path}: {len(rows)} rows, newest {rows[0]}")
+    return None
+
+
+if __name__ == "__main__":
+    # Parser regression check over saved snapshots (exit 1 if any fails)
+    paths = [p for arg in sys.argv[1:] for p in (sorted(glob.glob(os.path.join(arg, "*.html")))
+                                                 if os.path.isdir(arg) else [arg])]
+    if not paths:
+        sys.exit("usage: python dom_history.py <page_dump.html | snapshot dir> ...")
+    failed = 0
+    for path in paths:
+        error = check_snapshot(path)
+        if error:
+            failed += 1
+            print(f"[DOM FAIL] {path}: {error}")
+    print(f"[DOM] {len(paths) - failed}/{len(paths)} snapshots parsed.")
+    sys.exit(1 if failed else 0)
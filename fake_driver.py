@@ -0,0 +1,236 @@
+# fake_driver.py (RECORDED-PAGE SELENIUM STAND-IN)
+#
+# Serves recorded pages so the capture/parse pipeline can run locally without
+# Chrome. A recording directory holds numbered frames sharing a stem:
+#
+#      0001.png   full-page screenshot
+#      0001.txt   body text (optional)
+#      0001.html  page source, e.g. a saved page_dump.html (optional)
+#
+# Each full-page screenshot advances to the next frame (looping at the end).
+#
+# FakePageServer / PageServerDriver serve live-updating pages for several game
+# codes over local HTTP, for multi-game ingestion throughput runs (bench.py ingest).
+
+import glob
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from urllib.request import urlopen
+
+
+class FakeElement:
+    def __init__(self, text="", png=b""):
+        self.text = text
+        self.screenshot_as_png = png
+
+    def find_element(self, by, value):
+        return self
+
+
+class FakeDriver:
+    """Minimal subset of the selenium WebDriver API used by the ingestion code."""
+
+    def __init__(self, directory, loop=True):
+        self.frames = []
+        for png_path in sorted(glob.glob(os.path.join(directory, "*.png"))):
+            stem = os.path.splitext(png_path)[0]
+            self.frames.append({
+                "png": _read(png_path, "rb"),
+                "text": _read(stem + ".txt", "r") or "",
+                "html": _read(stem + ".html", "r") or "",
+            })
+        if not self.frames:
+            raise ValueError(f"No recorded frames (*.png) in {directory}")
+        self.loop = loop
+        self.index = 0
+        self.current_url = None
+
+    @property
+    def frame(self):
+        return self.frames[self.index]
+
+    def advance(self):
+        if self.index + 1 < len(self.frames):
+            self.index += 1
+        elif self.loop:
+            self.index = 0
+
+    # --- WebDriver API subset ---
+    def get(self, url):
+        self.current_url = url
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def quit(self):
+        pass
+
+    @property
+    def page_source(self):
+        return self.frame["html"]
+
+    def find_element(self, by, value):
+        text = self.frame["text"] or re.sub(r"<[^>]+>", " ", self.frame["html"])
+        return FakeElement(text, self.frame["png"])
+
+    def find_elements(self, by, value):
+        return [self.find_element(by, value)]
+
+    def execute_script(self, script, *args):
+        return _run_script(script, self.frame["html"], args)
+
+    def get_screenshot_as_png(self):
+        png = self.frame["png"]
+        self.advance()
+        return png
+
+    def save_screenshot(self, path):
+        with open(path, "wb") as f:
+            f.write(self.get_screenshot_as_png())
+        return True
+
+
+def _run_script(script, html, args):
+    """The only script the ingestion code runs is the Game history row reader."""
+    from dom_history import HISTORY_ROWS_SCRIPT, extract_rows_from_html
+    if script != HISTORY_ROWS_SCRIPT:
+        raise NotImplementedError("fake drivers only run dom_history.HISTORY_ROWS_SCRIPT")
+    return extract_rows_from_html(html, *args) if html else None
+
+
+def _read(path, mode):
+    if not os.path.exists(path):
+        return None
+    kwargs = {} if "b" in mode else {"encoding": "utf-8"}
+    with open(path, mode, **kwargs) as f:
+        return f.read()
+
+
+# -------------------- Local fake page server (multi-game throughput runs) --------------------
+class FakePageServer:
+    """
+    Local HTTP stand-in for the game pages. `/?gameCode=<code>` serves a
+    "Game history" list (newest first) whose latest period advances every
+    round of that game, on a clock sped up `speedup` times.
+    """
+
+    def __init__(self, round_seconds, speedup=30.0, rows=10, first_period=20250101100010000, port=0):
+        self.round_seconds = dict(round_seconds)   # game_code -> real round length (s)
+        self.speedup = speedup
+        self.rows = rows
+        self.first_period = first_period
+        self.port = port
+        self.requests = 0
+        self._server = None
+        self._started = None
+
+    def current_index(self, game_code):
+        elapsed = (time.monotonic() - self._started) * self.speedup
+        return int(elapsed // self.round_seconds[game_code])
+
+    def page_html(self, game_code):
+        offset = list(self.round_seconds).index(game_code) * 1_000_000
+        newest = self.current_index(game_code)
+        rows = []
+        for i in range(newest, max(-1, newest - self.rows), -1):
+            period = self.first_period + offset + i
+            number = random.Random(f"{game_code}:{period}").randrange(10)
+            size = "Big" if number >= 5 else "Small"
+            dots = ["red" if number % 2 == 0 else "green"] + (["violet"] if number in (0, 5) else [])
+            rows.append(f"<div class='row'><span>{period}</span> <span>{number}</span> <span>{size}</span> "
+                        + "".join(f"<span class='dot {dot}'></span>" for dot in dots) + "</div>")
+        return ("<html><body><div>Game history</div><div class='history'>"
+                + "\n".join(rows) + "</div></body></html>")
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                game_code = parse_qs(urlparse(self.path).query).get("gameCode", [None])[0]
+                if game_code not in server.round_seconds:
+                    self.send_error(404)
+                    return
+                body = server.page_html(game_code).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._started = time.monotonic()
+        threading.Thread(target=self._server.serve_forever, name="fake-pages", daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def url(self, game_code):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/?gameCode={game_code}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        if handle not in self.driver.windows:
+            raise KeyError(handle)
+        self.driver.current_window_handle = handle
+
+    def new_window(self, type_hint="tab"):
+        handle = f"tab-{len(self.driver.windows)}"
+        self.driver.windows[handle] = None
+        self.driver.current_window_handle = handle
+
+
+class PageServerDriver:
+    """
+    WebDriver stand-in with tabs that reads live pages from FakePageServer
+    over HTTP (every element lookup re-fetches the page, like a live DOM).
+    """
+
+    def __init__(self):
+        self.windows = {"tab-0": None}     # handle -> url
+        self.current_window_handle = "tab-0"
+        self.switch_to = _SwitchTo(self)
+
+    @property
+    def window_handles(self):
+        return list(self.windows)
+
+    def get(self, url):
+        self.windows[self.current_window_handle] = url
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def quit(self):
+        pass
+
+    @property
+    def page_source(self):
+        with urlopen(self.windows[self.current_window_handle], timeout=5) as resp:
+            return resp.read().decode("utf-8")
+
+    def find_element(self, by, value):
+        return FakeElement(re.sub(r"<[^>]+>", " ", self.page_source))
+
+    def find_elements(self, by, value):
+        return [self.find_element(by, value)]
+
+    def execute_script(self, script, *args):
+        return _run_script(script, self.page_source, args)
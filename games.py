@@ -0,0 +1,43 @@
+# games.py (WINGO GAME VARIANTS)
+#
+# Every stored round carries the `game_code` of the stream it came from. Rounds
+# stored before multi-game ingestion are backfilled as DEFAULT_GAME
+# (see migrate_game_code.py).
+
+GAME_URL = "https://bdgwink.me/#/saasLottery/WinGo?gameCode={game_code}&lottery=WinGo"
+
+# game_code -> round length in seconds
+GAMES = {
+    "WinGo_30S": 30,
+    "WinGo_1M": 60,
+    "WinGo_3M": 180,
+    "WinGo_5M": 300,
+}
+
+DEFAULT_GAME = "WinGo_30S"
+
+
+def game_url(game_code):
+    return GAME_URL.format(game_code=game_code)
+
+
+def parse_game_codes(value=None):
+    """
+    Game codes from a comma separated list (e.g. the BDG_GAMES env var).
+    Empty selects DEFAULT_GAME only (the single stream tracked before
+    multi-game ingestion), "all" every known game; unknown codes raise ValueError.
+    """
+    if not value or not value.strip():
+        return [DEFAULT_GAME]
+    if value.strip().lower() == "all":
+        return list(GAMES)
+    codes = [c.strip() for c in value.split(",") if c.strip()]
+    unknown = [c for c in codes if c not in GAMES]
+    if unknown:
+        raise ValueError(f"Unknown game code(s): {', '.join(unknown)} (known: {', '.join(GAMES)})")
+    return codes
+
+
+def game_filter(game_code=None):
+    """Mongo filter for one game's rounds ({} = all games)."""
+    return {"game_code": game_code} if game_code else {}
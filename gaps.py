@@ -0,0 +1,123 @@
+# gaps.py (MISSED-ROUND DETECTION + BACKFILL FROM THE VISIBLE HISTORY ROWS)
+#
+# A slow tick or a failed OCR read used to lose that round for good. Every DOM
+# capture carries the visible Game history rows (newest first), so the rounds
+# between the last stored period and the current one can be recovered from the
+# same capture: missing_rows picks them out (oldest first) and the ingestion
+# loop stores and trains on them in order before the current round. Rounds that
+# already scrolled out of the visible rows are reported as lost.
+#
+# Each detected gap is logged to round_gaps; /gaps also scans the stored
+# periods for holes.
+
+import datetime
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+from games import game_filter
+from jsonlog import log
+
+GAPS_COLLECTION_NAME = "round_gaps"
+
+# /gaps reads the latest logged gaps of one game
+GAPS_INDEXES = [
+    ([("game_code", ASCENDING), ("detected_at", DESCENDING)], {"name": "game_detected_at_desc"}),
+]
+
+# Period ids count rounds within a day; a larger jump is a day rollover (or a
+# long downtime) and is not counted as missing rounds
+MAX_GAP_ROUNDS = 2880
+
+
+def period_number(period):
+    return int(period) if isinstance(period, str) and period.isdigit() else None
+
+
+def missing_count(last_period, period):
+    """Rounds between two stored periods (0 if consecutive or not comparable)."""
+    a, b = period_number(last_period), period_number(period)
+    if a is None or b is None or not 1 < b - a <= MAX_GAP_ROUNDS + 1:
+        return 0
+    return b - a - 1
+
+
+def missing_rows(last_period, rows, current_period):
+    """
+    Visible rows (newest first) newer than `last_period` and older than
+    `current_period`, returned oldest first. Empty whenever missing_count is 0
+    (same day-rollover rule), so a gap never backfills more than it counts.
+    """
+    if not missing_count(last_period, current_period):
+        return []
+    last, current = period_number(last_period), period_number(current_period)
+    older = [r for r in rows if last < period_number(r["period"]) < current]
+    return sorted(older, key=lambda r: period_number(r["period"]))
+
+
+def estimated_timestamp(current, current_period, period, round_seconds):
+    """Close time of an earlier round, counted back from the current one (keeps timestamp order)."""
+    back = period_number(current_period) - period_number(period)
+    return current - datetime.timedelta(seconds=back * round_seconds)
+
+
+def gap_event(game_code, last_period, current_period, backfilled):
+    """round_gaps document for one detected gap."""
+    missing = missing_count(last_period, current_period)
+    return {
+        "game_code": game_code,
+        "after": last_period,
+        "before": current_period,
+        "missing": missing,
+        "backfilled": backfilled,
+        "lost": max(0, missing - backfilled),
+        "detected_at": datetime.datetime.now(datetime.UTC),
+    }
+
+
+async def ensure_gaps_indexes(gaps):
+    for keys, options in GAPS_INDEXES:
+        await gaps.create_index(keys, **options)
+
+
+async def record_gap(gaps, event):
+    """Log a gap (rare; a failed write is only printed)."""
+    try:
+        await gaps.insert_one(dict(event))
+    except PyMongoError as e:
+        log("gap_log_failed", "error", after=event["after"], before=event["before"], error=str(e))
+
+
+# -------------------- Reporting --------------------
+
+def find_holes(periods):
+    """Holes in a list of stored period ids: [{"after", "before", "missing"}], newest first."""
+    numbers = sorted({period_number(p) for p in periods} - {None})
+    holes = []
+    for a, b in zip(numbers, numbers[1:]):
+        missing = missing_count(str(a), str(b))
+        if missing:
+            holes.append({"after": str(a), "before": str(b), "missing": missing})
+    holes.reverse()
+    return holes
+
+
+async def gap_report(results, gaps, game_codes, scan=2000, events=20):
+    """
+    Per game: holes among its last `scan` stored rounds, plus the latest
+    logged gaps (with how many rounds were backfilled / lost).
+    """
+    report = {}
+    for game_code in game_codes:
+        docs = await results.find(game_filter(game_code), {"_id": 0, "period": 1}).sort(
+            [("timestamp", DESCENDING), ("period", DESCENDING)]).limit(scan).to_list(scan)
+        holes = find_holes(d.get("period") for d in docs)
+        logged = await gaps.find(game_filter(game_code), {"_id": 0}).sort(
+            "detected_at", DESCENDING).limit(events).to_list(events)
+        report[game_code] = {
+            "scanned_rounds": len(docs),
+            "holes": holes,
+            "missing_rounds": sum(h["missing"] for h in holes),
+            "recent_gaps": logged,
+        }
+    return report
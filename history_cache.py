@@ -0,0 +1,107 @@
+# history_cache.py
+
+from collections import deque
+from games import DEFAULT_GAME
+from round_record import Round, get_last_n_records
+from utils import RollingFeatureState
+from jsonlog import log
+from metrics import histogram
+
+HISTORY_FETCH_SECONDS = histogram("bdg_history_fetch_seconds", "Round history (re)load from MongoDB.")
+
+
+def _period_key(period):
+    """Sortable key for a period id (None if the id is missing or unparsable)."""
+    if isinstance(period, str) and period.isdigit():
+        return int(period)
+    if isinstance(period, int):
+        return period
+    return None
+
+
+class RoundHistoryCache:
+    """
+    Bounded in-memory copy of the last N stored rounds of one game, held as
+    compact round_record.Round records.
+
+    Loaded once from MongoDB, then appended to by the fetch loop right after
+    each insert_one, so update_model never has to re-query game_results.
+    If an appended round does not follow the cached history (restart, manual
+    insert, out-of-order period) the cache marks itself stale and the next
+    ensure_loaded() call resyncs it from the database.
+    """
+
+    def __init__(self, maxlen=100, game_code=DEFAULT_GAME):
+        self.maxlen = maxlen
+        self.game_code = game_code
+        self._rounds = deque(maxlen=maxlen)
+        self.state = RollingFeatureState(maxlen)
+        self.loaded = False
+        self.stale = False
+
+    def __len__(self):
+        return len(self._rounds)
+
+    async def load(self, collection):
+        """(Re)load the cache from the last N rounds stored in MongoDB."""
+        with HISTORY_FETCH_SECONDS.time():
+            rounds = await get_last_n_records(self.maxlen, collection, self.game_code)
+        self._rounds = deque(rounds, maxlen=self.maxlen)
+        self.state.warm_up(self._rounds)
+        self.loaded = True
+        self.stale = False
+        return self
+
+    async def resync(self, collection):
+        """Explicitly discard the cache and rebuild it from the database."""
+        await self.load(collection)
+        log("history_resynced", game_code=self.game_code, rounds=len(self._rounds))
+        return self
+
+    async def ensure_loaded(self, collection):
+        """Load on first use, and resync if the cache was marked stale."""
+        if not self.loaded or self.stale:
+            await self.load(collection)
+
+    def append(self, r):
+        """Record a round (document or Round) that was just stored in MongoDB."""
+        record = r if isinstance(r, Round) else Round.from_doc(r)
+
+        # Detect disagreement with the DB ordering (e.g. a round inserted elsewhere)
+        if self._rounds:
+            last_key = _period_key(self._rounds[-1].period)
+            new_key = _period_key(record.period)
+            if last_key is not None and new_key is not None and new_key <= last_key:
+                self.stale = True
+
+        self._rounds.append(record)
+        self.state.append(record)
+
+    def has_period(self, period):
+        """True if `period` is one of the cached (already stored) rounds."""
+        return any(r.period == period for r in self._rounds)
+
+    def last(self):
+        """Most recently cached round, or None if the cache is empty."""
+        return self._rounds[-1] if self._rounds else None
+
+    def rounds(self):
+        """Cached Round records, oldest first."""
+        return list(self._rounds)
+
+    def features(self, current_round):
+        """Feature dict for `current_round` against the cached history."""
+        return self.state.features(current_round)
+
+
+# Shared history cache used by update_model and the fetch loops (one per game code)
+round_history = RoundHistoryCache(100, DEFAULT_GAME)
+_histories = {DEFAULT_GAME: round_history}
+
+
+def history_for(game_code=DEFAULT_GAME):
+    """History cache for one game code (created on first use)."""
+    history = _histories.get(game_code)
+    if history is None:
+        history = _histories[game_code] = RoundHistoryCache(round_history.maxlen, game_code)
+    return history
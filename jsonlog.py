@@ -0,0 +1,30 @@
+# jsonlog.py (STRUCTURED LOG LINES)
+#
+# One JSON object per line on stdout ({"ts", "level", "event", ...fields}) for
+# the ingestion and persistence paths, so log shippers can filter on event
+# names and fields instead of parsing "[TAG] ..." text. Per-round detail
+# (OCR attempts, feature inputs) is logged at debug level.
+#
+#      BDG_LOG_LEVEL=debug python bdg_ocr_pipeline.py
+
+import datetime
+import json
+import os
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+LOG_LEVEL = LEVELS.get(os.environ.get("BDG_LOG_LEVEL", "info").lower(), LEVELS["info"])
+
+
+def enabled(level):
+    return LEVELS[level] >= LOG_LEVEL
+
+
+def log(event, level="info", **fields):
+    """Write one structured log line (dropped below BDG_LOG_LEVEL)."""
+    if LEVELS[level] < LOG_LEVEL:
+        return
+    record = {"ts": datetime.datetime.now(datetime.UTC).isoformat(timespec="milliseconds"),
+              "level": level, "event": event}
+    record.update(fields)
+    print(json.dumps(record, default=str, ensure_ascii=False), flush=True)
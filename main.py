@@ -1,79 +1,233 @@
-from fastapi import FastAPI
-from database import collection
-import asyncio, datetime, aiohttp, time 
-from model_updater import update_model # Keep this if model_updater is needed for API processing
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from database import API_CLIENT_OPTIONS, close_client, ensure_indexes, get_collection, open_client, pool_stats
+from contextlib import asynccontextmanager
+from broadcast import RoundBroadcaster
+from pagination import fetch_page, ndjson_lines
+import json
+import datetime, time
+# No model_updater import here: the API only reads stored rounds (river stays out of the worker)
+from utils import derive_prediction_fields
+from games import GAMES, game_filter
+from accuracy_stats import STATS_COLLECTION_NAME, ensure_stats_indexes, parse_window, window_stats
+from gaps import GAPS_COLLECTION_NAME, ensure_gaps_indexes, gap_report
+from metrics import PROMETHEUS_CONTENT_TYPE, histogram, render_prometheus
 
 # --- Helper to use the stable UTC time ---
 def get_utc_now():
     return datetime.datetime.now(datetime.UTC)
 
-# --- FastAPI Initialization (Crucially, without the lifespan handler) ---
-app = FastAPI(title="Live Betting Predictor") 
+# --- MongoDB handles (opened in lifespan; tests/benchmarks may assign them beforehand) ---
+collection = None        # Primary reads: latest round, live data, stream
+read_collection = None   # Secondary-preferred reads: paged history and exports (staleness-tolerant)
+broadcaster = None       # Live round fan-out (created in lifespan)
+stats_collection = None  # Pre-aggregated accuracy rollups (accuracy_stats.py)
+gaps_collection = None   # Missed-round log written by the ingestion loop (gaps.py)
+
+# --- Lifespan: open/close the shared client (no background ingestion tasks here) ---
+@asynccontextmanager
+async def lifespan(app):
+    global collection, read_collection, broadcaster, stats_collection, gaps_collection
+    opened = collection is None
+    if opened:
+        open_client(API_CLIENT_OPTIONS)
+        collection = get_collection()
+        read_collection = get_collection(read_preference="secondaryPreferred")
+        stats_collection = get_collection(name=STATS_COLLECTION_NAME)
+        gaps_collection = get_collection(name=GAPS_COLLECTION_NAME)
+    elif read_collection is None:
+        read_collection = collection
+    if broadcaster is None:
+        broadcaster = RoundBroadcaster(
+            collection, LATEST_DATA_PROJECTION,
+            on_round=lambda record: invalidate_latest_data_cache(),
+        )
+
+    # Provision game_results indexes so every read path is an index scan
+    await ensure_indexes(collection)
+    if stats_collection is not None:
+        await ensure_stats_indexes(stats_collection)
+    if gaps_collection is not None:
+        await ensure_gaps_indexes(gaps_collection)
+    try:
+        yield
+    finally:
+        if opened:
+            broadcaster = None
+            collection = read_collection = stats_collection = gaps_collection = None
+            close_client()
+
+# --- FastAPI Initialization ---
+app = FastAPI(title="Live Betting Predictor", lifespan=lifespan) 
 
 # --- NOTE: All unstable background task definitions (fetch_bdg_round, fetch_loop) must be removed. ---
 
+# --- Request latency (MongoDB command times come from database.CommandTimer) ---
+API_REQUEST_SECONDS = histogram("bdg_api_request_seconds", "API latency until the response starts (streams: time to headers).",
+                                ("method", "route", "status"))
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template (e.g. /history/export), not the raw URL, keeps the label set small
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        API_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route, status)
+
 # -------------------- API Endpoints (Final Structure) --------------------
 
+def _game_query(game):
+    """Filter for the optional `game` query parameter (all games when omitted)."""
+    if game is not None and game not in GAMES:
+        raise HTTPException(status_code=400, detail=f"Unknown game. Known games: {', '.join(GAMES)}")
+    return game_filter(game)
+
+@app.get("/games")
+async def games():
+    """Known game codes and their round length in seconds."""
+    return GAMES
+
 @app.get("/latest_prediction")
-async def latest_prediction():
-    """Fetches the latest prediction round."""
-    latest = await collection.find().sort("timestamp", -1).limit(1).to_list(1)
+async def latest_prediction(game: str = None):
+    """Fetches the latest prediction round (optionally for one game)."""
+    latest = await collection.find(_game_query(game), {"_id": 0}).sort("timestamp", -1).limit(1).to_list(1)
     if latest:
         return latest[0]
     return {"message": "No data yet."}
 
 @app.get("/history")
-async def history(limit: int = 20):
-    """Fetches the N most recent raw rounds."""
-    data = await collection.find().sort("timestamp", -1).limit(limit).to_list(limit)
+async def history(response: Response, limit: int = 20, cursor: str = None, game: str = None):
+    """Fetches the N most recent raw rounds (page size capped; next page cursor in X-Next-Cursor)."""
+    data, next_cursor = await fetch_page(read_collection, None, limit, cursor, _game_query(game))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return data
 
+@app.get("/history/export")
+async def history_export(limit: int = 0, cursor: str = None, game: str = None):
+    """Streams raw rounds (newest first) as NDJSON; limit=0 exports the full history."""
+    return StreamingResponse(ndjson_lines(read_collection, None, limit, cursor, _game_query(game)),
+                             media_type="application/x-ndjson")
+
+# --- /latest_data response cache (data only changes once per round) ---
+LATEST_DATA_TTL = 2.0  # seconds
+LATEST_DATA_CACHE_MAX = 16  # distinct (limit, game) values kept at once
+_latest_data_cache = {}  # (limit, game) -> (expires_at, data)
+
+
+def invalidate_latest_data_cache():
+    """Drop cached /latest_data responses (call when a new round is stored)."""
+    _latest_data_cache.clear()
+
+
+LATEST_DATA_PROJECTION = {
+    "_id": 0, "game_code": 1, "period": 1, "color": 1, "size": 1, "number": 1,
+    "prob_red": 1, "prob_green": 1, "prob_violet": 1,
+    "prob_size_big": 1, "prob_size_small": 1, "prob_numbers": 1, "timestamp": 1,
+    "predicted_color": 1, "predicted_size": 1, "color_match": 1, "size_match": 1,
+}
+
 @app.get("/latest_data")
-async def latest_data(limit: int = 50):
+async def latest_data(limit: int = 50, game: str = None):
     """Fetches the N most recent rounds with predictions and calculated accuracy."""
     
-    # 1. Fetch latest data from MongoDB
+    query = _game_query(game)
+    cached = _latest_data_cache.get((limit, game))
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    # 1. Fetch latest data from MongoDB (derived fields are stored with each round)
     data = await collection.find(
-        {}, 
-        {"_id": 0, "period": 1, "color": 1, "size": 1, "number": 1, 
-         "prob_red": 1, "prob_green": 1, "prob_violet": 1,
-         "prob_size_big": 1, "prob_size_small": 1, "prob_numbers": 1, "timestamp": 1} 
+        query, LATEST_DATA_PROJECTION
     ).sort("timestamp", -1).limit(limit).to_list(limit)
 
-    # 2. Process and add accuracy flag (for visualization)
+    # 2. Fallback for rounds stored before the backfill migration ran
     for record in data:
-        # Determine the model's color guess
-        max_color_prob = max(record.get('prob_red', 0), record.get('prob_green', 0), record.get('prob_violet', 0))
-        predicted_color = None
-        if max_color_prob == record.get('prob_red'):
-            predicted_color = 'Red'
-        elif max_color_prob == record.get('prob_green'):
-            predicted_color = 'Green'
-        elif max_color_prob == record.get('prob_violet'):
-            predicted_color = 'Violet'
-        else:
-            predicted_color = 'Unknown'
-
-        # Determine the model's size guess
-        predicted_size = 'Big' if record.get('prob_size_big', 0.5) > 0.5 else 'Small'
-        
-        # Calculate Match
-        record['color_match'] = (predicted_color.lower() == record['color'].lower())
-        record['predicted_color'] = predicted_color
-        
-        record['size_match'] = (predicted_size.lower() == record['size'].lower())
-        record['predicted_size'] = predicted_size
+        if "predicted_color" not in record:
+            record.update(derive_prediction_fields(record))
 
+    if len(_latest_data_cache) >= LATEST_DATA_CACHE_MAX:
+        _latest_data_cache.clear()
+    _latest_data_cache[(limit, game)] = (time.monotonic() + LATEST_DATA_TTL, data)
     return data
 
-@app.get("/raw_logs")
-async def raw_logs(limit: int = 20):
-    """Fetches the N most recent raw log/prediction records."""
-    data = await collection.find(
-        {},
-        {"_id": 0} 
-    ).sort("timestamp", -1).limit(limit).to_list(limit)
+# --- Live push updates (Server-Sent Events) ---
+def _sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(payload))}\n\n"
+
+
+@app.get("/stream")
+async def stream(limit: int = 50, game: str = None):
+    """Sends the latest N rounds once, then pushes each new round (of `game`, if given) as it is stored."""
+    _game_query(game)  # Reject unknown games before subscribing
+    # Subscribe first so no round stored while the snapshot is read is missed
+    queue = broadcaster.subscribe()
+    try:
+        initial = await latest_data(limit, game)
+    except BaseException:
+        broadcaster.unsubscribe(queue)
+        raise
+
+    async def events():
+        try:
+            yield _sse_event("snapshot", initial)
+            while True:
+                record = await queue.get()
+                if record is None:
+                    break  # Dropped (slow client or watcher failure); EventSource will reconnect
+                if game and record.get("game_code") != game:
+                    continue
+                yield _sse_event("round", record)
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
 
+@app.get("/stats")
+async def stats(window: str = "1d", game: str = None):
+    """Accuracy, Brier score, log loss and calibration per target over the last `window` (e.g. 15m, 6h, 7d)."""
+    query = _game_query(game)
+    try:
+        seconds = parse_window(window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await window_stats(stats_collection, seconds, query.get("game_code"))
+
+@app.get("/gaps")
+async def gaps(game: str = None, scan: int = 2000):
+    """Missing periods among the last `scan` stored rounds per game, plus recently detected (and backfilled) gaps."""
+    _game_query(game)
+    return await gap_report(read_collection, gaps_collection, [game] if game else list(GAMES), min(scan, 20000))
+
+@app.get("/raw_logs")
+async def raw_logs(response: Response, limit: int = 20, cursor: str = None, game: str = None):
+    """Fetches the N most recent raw log/prediction records (paged like /history)."""
+    data, next_cursor = await fetch_page(read_collection, {"_id": 0}, limit, cursor, _game_query(game))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return data
 
+@app.get("/raw_logs/export")
+async def raw_logs_export(limit: int = 0, cursor: str = None, game: str = None):
+    """Streams raw log/prediction records as NDJSON; limit=0 exports everything."""
+    return StreamingResponse(ndjson_lines(read_collection, {"_id": 0}, limit, cursor, _game_query(game)),
+                             media_type="application/x-ndjson")
+
+@app.get("/db_stats")
+async def db_stats():
+    """Connection pool usage of this API process."""
+    return pool_stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request and MongoDB command latency histograms in the Prometheus text format."""
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 #      uvicorn main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
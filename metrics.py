@@ -0,0 +1,186 @@
+# metrics.py (LATENCY METRICS)
+#
+# Lightweight, dependency-free latency tracking shared by the pipeline stages,
+# the round scheduler, the tab pool, the write-behind queue and the DB pool stats,
+# plus the Prometheus histograms behind the /metrics routes.
+
+import statistics
+import threading
+from bisect import bisect_left
+from collections import deque
+from time import perf_counter
+
+
+class StageMetrics:
+    """Latency samples for one pipeline stage (recent window + totals)."""
+
+    def __init__(self, name, window=200):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def summary(self):
+        if not self._recent:
+            return {"count": 0}
+        ordered = sorted(self._recent)
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 1),
+            "p50_ms": round(statistics.median(ordered) * 1000, 1),
+            "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+        }
+
+
+# -------------------- Prometheus histograms --------------------
+#
+# Fixed-bucket histograms scraped in the Prometheus text format (/metrics).
+# A timed span is two perf_counter calls, a bisect and one locked update, so
+# instrumenting a hot path costs a couple of microseconds (bench.py metrics).
+
+# Latency buckets in seconds (10 µs for model calls .. 30 s for a slow capture)
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name -> Histogram, in registration order
+REGISTRY = {}
+
+
+class _Series:
+    """Bucket counts, sum and count of one label combination (updated from any thread)."""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot: above every bound (+Inf only)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def time(self):
+        return Span(self)
+
+
+class Span:
+    """`with series.time():` observes the block's wall time."""
+
+    __slots__ = ("series", "started")
+
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.series.observe(perf_counter() - self.started)
+        return False
+
+
+class Histogram:
+    """One Prometheus histogram; `labels(*values)` returns the series of a label combination."""
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(values, _Series(self.buckets))
+        return series
+
+    def observe(self, seconds, *values):
+        self.labels(*values).observe(seconds)
+
+    def time(self, *values):
+        return Span(self.labels(*values))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items(), key=lambda item: tuple(map(str, item[0])))
+        bounds = [repr(b) for b in self.buckets] + ["+Inf"]
+        for values, series in items:
+            with series._lock:
+                counts, total, count = list(series.counts), series.sum, series.count
+            labels = [f'{n}="{_escape(str(v))}"' for n, v in zip(self.labelnames, values)]
+            cumulative = 0
+            for le, n in zip(bounds, counts):
+                cumulative += n
+                bucket_labels = ",".join(labels + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total!r}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    """Registered histogram `name` (created on first use, so modules can declare it at import)."""
+    hist = REGISTRY.get(name)
+    if hist is None:
+        hist = REGISTRY[name] = Histogram(name, help, labelnames, buckets)
+    return hist
+
+
+def render_prometheus(registry=None):
+    """All registered histograms in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for hist in (registry or REGISTRY).values():
+        lines.extend(hist.render())
+    return "\n".join(lines) + "\n"
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def serve_metrics(port, host="0.0.0.0"):
+    """Expose /metrics from a daemon thread (for processes without a web app, e.g. the ingestion loop)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Scrapes are not worth a log line
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
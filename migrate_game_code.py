@@ -0,0 +1,31 @@
+# migrate_game_code.py (ONE-OFF BACKFILL MIGRATION)
+#
+# Tags rounds stored before multi-game ingestion with the game they came from
+# (the ingestion loop was hard-wired to DEFAULT_GAME). Safe to re-run: only
+# documents without a game_code are touched.
+#
+#      python migrate_game_code.py
+
+import asyncio
+from games import DEFAULT_GAME
+
+
+async def backfill_game_code(collection, game_code=DEFAULT_GAME):
+    result = await collection.update_many({"game_code": {"$exists": False}}, {"$set": {"game_code": game_code}})
+    if result.modified_count:
+        print(f"[MIGRATION] Tagged {result.modified_count} rounds with game_code={game_code}.")
+    return result.modified_count
+
+
+# -------------------- Start --------------------
+if __name__ == "__main__":
+    from database import close_client, get_collection, open_client
+
+    async def main():
+        open_client()
+        try:
+            await backfill_game_code(get_collection())
+        finally:
+            close_client()
+
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+# migrate_prediction_fields.py (ONE-OFF BACKFILL MIGRATION)
+#
+# Stores predicted_color / predicted_size / color_match / size_match on rounds
+# inserted before these fields were computed at write time.
+#
+#      python migrate_prediction_fields.py
+
+import asyncio
+from pymongo import UpdateOne
+from utils import derive_prediction_fields
+
+BACKFILL_PROJECTION = {
+    "_id": 1, "color": 1, "size": 1,
+    "prob_red": 1, "prob_green": 1, "prob_violet": 1, "prob_size_big": 1,
+}
+
+
+async def backfill_prediction_fields(collection, batch_size=500):
+    """Stream rounds missing the derived fields and update them in bulk batches."""
+    cursor = collection.find({"predicted_color": {"$exists": False}}, BACKFILL_PROJECTION).batch_size(batch_size)
+
+    updated = 0
+    ops = []
+    async for doc in cursor:
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": derive_prediction_fields(doc)}))
+        if len(ops) >= batch_size:
+            await collection.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+        updated += len(ops)
+
+    print(f"[MIGRATION] Backfilled prediction fields on {updated} rounds.")
+    return updated
+
+
+# -------------------- Start --------------------
+if __name__ == "__main__":
+    from database import close_client, get_collection, open_client
+
+    async def main():
+        open_client()
+        try:
+            await backfill_prediction_fields(get_collection())
+        finally:
+            close_client()
+
+    asyncio.run(main())
@@ -1,86 +1,216 @@
 # model_updater.py (UPGRADE MODEL ARCHITECTURE - FINAL STABLE VERSION)
 
-from river import linear_model, preprocessing, optim
-from river.multiclass import OneVsRestClassifier
-# --- CRITICAL NEW IMPORT: Use the robust Passive Aggressive Classifier ---
-from river.linear_model import PAClassifier
-# -----------------------------------------------------------------------
-from utils import extract_features, get_last_n_rounds
 import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from games import DEFAULT_GAME
+from history_cache import history_for
+from jsonlog import enabled, log
+from metrics import histogram
 
 # --- INITIALIZE ALL FOUR PRIMARY MODEL PIPELINES with PAClassifier ---
 
-# 1. COLOR MODEL: Predicts Red vs. Non-Red
-color_model_red = preprocessing.StandardScaler() | PAClassifier(
-    C=0.01, # Regularization term
-    
-)
+# Hyperparameters of the live pipelines (sweep.py evaluates alternatives)
+PA_C = 0.01        # PAClassifier regularization of the color/violet/size models
+NUMBER_LR = 0.05   # AdaGrad learning rate of the number model
 
-# 2. VIOLET MODEL: Predicts Violet vs. Non-Violet
-color_model_violet = preprocessing.StandardScaler() | PAClassifier(
-    C=0.01,
-    
-)
+def build_models(pa_c=PA_C, number_lr=NUMBER_LR):
+    """Fresh set of the four pipelines (each game code gets its own set)."""
+    # river is heavy (pulls in scipy): import it only when models are actually built
+    from river import linear_model, preprocessing, optim
+    from river.multiclass import OneVsRestClassifier
+    # --- CRITICAL NEW IMPORT: Use the robust Passive Aggressive Classifier ---
+    from river.linear_model import PAClassifier
+    # -----------------------------------------------------------------------
+    return {
+        # 1. COLOR MODEL: Predicts Red vs. Non-Red
+        "color_model_red": preprocessing.StandardScaler() | PAClassifier(
+            C=pa_c, # Regularization term
+        ),
+        # 2. VIOLET MODEL: Predicts Violet vs. Non-Violet
+        "color_model_violet": preprocessing.StandardScaler() | PAClassifier(
+            C=pa_c,
+        ),
+        # 3. SIZE MODEL: Predicts Big vs. Small
+        "size_model_big": preprocessing.StandardScaler() | PAClassifier(
+            C=pa_c,
+        ),
+        # 4. NUMBER MODEL (Multi-Class: Use Logistic Regression, which is stable)
+        "number_model": preprocessing.StandardScaler() | OneVsRestClassifier(
+            classifier=linear_model.LogisticRegression(
+                optimizer=optim.AdaGrad(number_lr)
+            )
+        ),
+    }
+
+# Minimum stored history before the models are trained/queried
+MIN_HISTORY = 5
+
+# Names of the four pipelines (used by checkpointing)
+MODEL_NAMES = ("color_model_red", "color_model_violet", "size_model_big", "number_model")
+
+FEATURES_SECONDS = histogram("bdg_features_seconds", "Feature extraction from the rolling round history.")
+MODEL_SECONDS = histogram("bdg_model_seconds", "predict_proba_one / learn_one per model.", ("model", "op"))
+_PREDICT = {name: MODEL_SECONDS.labels(name, "predict") for name in MODEL_NAMES}
+_LEARN = {name: MODEL_SECONDS.labels(name, "learn") for name in MODEL_NAMES}
+
+# -------------------- Model lanes --------------------
+# One single-thread executor per pipeline, shared by every game. A lane runs
+# its jobs in submission order, so each pipeline still sees round N's
+# predict-then-learn before round N+1's, while the four pipelines of a round
+# run side by side off the event loop. BDG_MODEL_LANES=0 keeps the whole
+# step on the event loop.
+MODEL_LANES = os.environ.get("BDG_MODEL_LANES", "1") != "0"
+_lanes = {}
+
+
+def _lane(name):
+    lane = _lanes.get(name)
+    if lane is None:
+        lane = _lanes[name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"lane-{name}")
+    return lane
 
-# 3. SIZE MODEL: Predicts Big vs. Small
-size_model_big = preprocessing.StandardScaler() | PAClassifier(
-    C=0.01,
 
-)
+def shutdown_lanes(wait=True):
+    """Finish (or drop) queued model steps, e.g. before the shutdown checkpoint pickles the models."""
+    for lane in _lanes.values():
+        lane.shutdown(wait=wait, cancel_futures=not wait)
+    _lanes.clear()
 
-# 4. NUMBER MODEL (Multi-Class: Use Logistic Regression, which is stable)
-number_model = preprocessing.StandardScaler() | OneVsRestClassifier(
-    classifier=linear_model.LogisticRegression(
-        optimizer=optim.AdaGrad(0.05)
-    )
-)
 
-# ... (the rest of the update_model function remains the same)
+class GameModels:
+    """The four pipelines of one game code plus the number of rounds they learned from."""
 
-# ... (the rest of the update_model function remains the same)
+    def __init__(self, game_code, models=None, rounds_trained=0):
+        self.game_code = game_code
+        self.models = models if models is not None else build_models()
+        self.rounds_trained = rounds_trained
+
+
+# game_code -> GameModels (created on first use)
+_game_models = {}
+
+
+def models_for(game_code=DEFAULT_GAME):
+    game_models = _game_models.get(game_code)
+    if game_models is None:
+        game_models = _game_models[game_code] = GameModels(game_code)
+    return game_models
+
+
+def get_models(game_code=DEFAULT_GAME):
+    """Current pipelines of one game keyed by name."""
+    return dict(models_for(game_code).models)
+
+
+def load_models(models, trained=0, game_code=DEFAULT_GAME):
+    """Replace one game's pipelines (e.g. with ones restored from a checkpoint)."""
+    _game_models[game_code] = GameModels(game_code, {name: models[name] for name in MODEL_NAMES}, trained)
+
+
+def default_predictions():
+    """Neutral probabilities returned until enough history exists."""
+    return {
+        "prob_red": 0.5, "prob_green": 0.5, "prob_violet": 0.0,
+        "prob_big": 0.5, "prob_small": 0.5,
+        "prob_numbers": {str(i): 0.1 for i in range(10)}
+    }
 
 # model_updater.py (Inside async def update_model)
 
-async def update_model(current_round, collection):
-    # NOTE: Assuming get_last_n_rounds is set to n=100 in utils.py
-    last_rounds = await get_last_n_rounds(100, collection) 
+async def update_model(current_round, collection, game_code=DEFAULT_GAME):
+    # History comes from the game's in-process cache (loaded from MongoDB only on first use / resync)
+    history = history_for(game_code)
+    await history.ensure_loaded(collection)
     
     # CRASH PREVENTION: 
-    if len(last_rounds) < 5: 
-        return {
-            "prob_red": 0.5, "prob_green": 0.5, "prob_violet": 0.0,
-            "prob_big": 0.5, "prob_small": 0.5,
-            "prob_numbers": {str(i): 0.1 for i in range(10)}
-        }
+    if len(history) < MIN_HISTORY: 
+        return default_predictions()
     
-    x = extract_features(last_rounds, current_round)
+    with FEATURES_SECONDS.time():
+        x = history.features(current_round)
+
+    if enabled("debug"):
+        log("model_input", "debug", game_code=game_code, period=current_round.get("period"), features=x)
+
+    if MODEL_LANES:
+        return await predict_and_learn_async(x, current_round, game_code)
+    return predict_and_learn(x, current_round, game_code)
 
-    print(f"[ARFC INPUT] Zig-Zag Feature: {x.get('is_alternating_3')}")
 
-    # --- 1. DEFINE OUTCOMES (y) FOR TRAINING ---
+def outcomes(current_round):
+    """Training label of each pipeline for one round (the Round N outcome)."""
     current_color = current_round.get("color", "").lower()
     current_size = current_round.get("size", "").lower()
     current_number = int(current_round.get("number"))
     is_violet = current_round.get("number") in ('0', '5')
-    
-    y_red = 1 if current_color == "red" else 0
-    y_violet = 1 if is_violet else 0
-    y_big = 1 if current_size == "big" else 0
-    
-    # --- 2. PREDICT FOR NEXT ROUND (Round N+1) ---
-    pred_red = color_model_red.predict_proba_one(x).get(1, 0.5)
-    pred_violet = color_model_violet.predict_proba_one(x).get(1, 0.0)
-    pred_big = size_model_big.predict_proba_one(x).get(1, 0.5)
-    pred_numbers_raw = number_model.predict_proba_one(x)
-    
-    # --- 3. TRAIN ALL MODELS with Round N outcome ---
-    color_model_red.learn_one(x, y_red)
-    color_model_violet.learn_one(x, y_violet)
-    size_model_big.learn_one(x, y_big)
-    number_model.learn_one(x, current_number)
-    
-    
-    # --- 4. ASSEMBLE FINAL RESULTS (FIXED COLOR NORMALIZATION) ---
+    return {
+        "color_model_red": 1 if current_color == "red" else 0,
+        "color_model_violet": 1 if is_violet else 0,
+        "size_model_big": 1 if current_size == "big" else 0,
+        "number_model": current_number,
+    }
+
+
+def learn_step(name, model, x, y):
+    """
+    Predict-then-learn for one pipeline: its prediction for the next round is
+    taken before it learns this round's outcome. Pipelines share no state, so
+    the four steps of a round may run in any order (or concurrently).
+    """
+    with _PREDICT[name].time():
+        proba = model.predict_proba_one(x)
+    with _LEARN[name].time():
+        model.learn_one(x, y)
+    return proba
+
+
+def combine_predictions(probas):
+    """Formatted probability dict from each pipeline's predict_proba_one output."""
+    return format_predictions(probas["color_model_red"].get(1, 0.5), probas["color_model_violet"].get(1, 0.0),
+                              probas["size_model_big"].get(1, 0.5), probas["number_model"])
+
+
+def predict_and_learn(x, current_round, game_code=DEFAULT_GAME):
+    """
+    Predict-then-learn step shared by the live update_model and offline replay.
+    Uses (and trains) the pipelines of `game_code` only.
+    Returns the formatted probability dict stored with each round.
+    """
+    game_models = models_for(game_code)
+    ys = outcomes(current_round)
+    probas = {name: learn_step(name, game_models.models[name], x, ys[name]) for name in MODEL_NAMES}
+    game_models.rounds_trained += 1
+    return combine_predictions(probas)
+
+
+async def predict_and_learn_async(x, current_round, game_code=DEFAULT_GAME):
+    """
+    predict_and_learn with the four learn_steps dispatched to the model lanes
+    and gathered concurrently (same result as the sequential version).
+    """
+    game_models = models_for(game_code)
+    ys = outcomes(current_round)
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(_lane(name), learn_step, name, game_models.models[name], x, ys[name])
+        for name in MODEL_NAMES))
+    game_models.rounds_trained += 1
+    return combine_predictions(dict(zip(MODEL_NAMES, results)))
+
+
+def train_chunk(name, model, xs, ys):
+    """
+    learn_step over a chunk of consecutive rounds, in order, for one pipeline.
+    Runs in a worker process during parallel replay: the pipeline travels
+    there and back pickled. Returns (trained model, per-round predict_proba_one outputs).
+    """
+    return model, [learn_step(name, model, x, y) for x, y in zip(xs, ys)]
+
+
+def format_predictions(pred_red, pred_violet, pred_big, pred_numbers_raw):
+    """Normalize the raw model outputs into the probability dict stored with each round (FIXED COLOR NORMALIZATION)."""
     
     # Step 1: Establish raw scores (Green is the inverse of Red's prediction)
     raw_red = pred_red
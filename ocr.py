@@ -0,0 +1,291 @@
+# ocr.py (RESULT BOX CAPTURE + OCR, NO FILESYSTEM ROUND-TRIPS)
+#
+# PIL / pytesseract / tesserocr are imported on first use, so importing this
+# module (e.g. via staged_pipeline) stays cheap and side-effect free.
+
+import asyncio
+import io
+import multiprocessing
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from jsonlog import log
+from metrics import histogram
+
+# point pytesseract to exe if needed
+TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+_tesserocr = None  # Module once probed; False if not installed
+
+# Fixed result box on the full-page screenshot: (x, y, w, h)
+RESULT_BOX = (655, 175, 460, 54)
+
+# Optional XPath of the result box element; when set, only that element is captured
+RESULT_BOX_XPATH = os.environ.get("BDG_RESULT_BOX_XPATH")
+
+# Debug dumps (full_page.png / cropped_number.png) are opt-in
+SAVE_DEBUG_IMAGES = os.environ.get("BDG_DEBUG_IMAGES") == "1"
+
+OCR_CONFIGS = [
+    "--psm 7 -c tessedit_char_whitelist=0123456789 ",
+    "--psm 6 -c tessedit_char_whitelist=0123456789 ",
+    "--psm 8 -c tessedit_char_whitelist=0123456789 ",
+]
+OCR_PSM = {cfg: re.search(r"--psm (\d+)", cfg).group(1) for cfg in OCR_CONFIGS}
+
+SCREENSHOT_SECONDS = histogram("bdg_screenshot_seconds", "Result box screenshot and crop.")
+OCR_SECONDS = histogram("bdg_ocr_seconds", "One Tesseract pass over the result box, per PSM config.", ("psm",))
+
+
+def _pytesseract():
+    import pytesseract
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return pytesseract
+
+
+def _tesserocr_module():
+    """Optional: keeps a loaded Tesseract engine per worker instead of spawning tesseract per call."""
+    global _tesserocr
+    if _tesserocr is None:
+        try:
+            import tesserocr
+            _tesserocr = tesserocr
+        except ImportError:
+            _tesserocr = False
+    return _tesserocr or None
+
+
+def crop_result_box(png_bytes, box=RESULT_BOX):
+    """Decode an in-memory full-page PNG and crop the result box."""
+    from PIL import Image
+    x, y, w, h = box
+    img = Image.open(io.BytesIO(png_bytes))
+    return img.crop((x, y, x + w, y + h))
+
+
+def capture_result_box(driver):
+    """
+    Capture the result box as an in-memory image.
+    Uses an element-scoped screenshot when RESULT_BOX_XPATH is configured,
+    otherwise crops the fixed box out of an in-memory full-page screenshot.
+    """
+    with SCREENSHOT_SECONDS.time():
+        if RESULT_BOX_XPATH:
+            from PIL import Image
+            from selenium.webdriver.common.by import By
+            element = driver.find_element(By.XPATH, RESULT_BOX_XPATH)
+            cropped = Image.open(io.BytesIO(element.screenshot_as_png))
+            cropped.load()
+        else:
+            png_bytes = driver.get_screenshot_as_png()
+            cropped = crop_result_box(png_bytes)
+            if SAVE_DEBUG_IMAGES:
+                with open("full_page.png", "wb") as f:
+                    f.write(png_bytes)
+
+    if SAVE_DEBUG_IMAGES:
+        cropped.save("cropped_number.png")
+        log("debug_image_saved", "debug", path="cropped_number.png")
+    return cropped
+
+
+def is_complete_ocr_text(raw_ocr_text):
+    """The OCR output looks like '<period> <digit>' (same stop rule as the original loop)."""
+    return ' ' in raw_ocr_text and len(raw_ocr_text) > 5
+
+
+def ocr_result_box(cropped):
+    """Run the PSM variants in order until one yields a complete result line."""
+    pytesseract = _pytesseract()
+    raw_ocr_text = ""
+    for cfg in OCR_CONFIGS:
+        with OCR_SECONDS.time(OCR_PSM[cfg]):
+            raw_ocr_text = pytesseract.image_to_string(cropped, config=cfg).strip()
+        log("ocr_try", "debug", psm=OCR_PSM[cfg], text=raw_ocr_text)
+        if is_complete_ocr_text(raw_ocr_text):
+            break
+    return raw_ocr_text
+
+
+def parse_ocr_text(raw_ocr_text):
+    """
+    Parse '<period> ... <digit>' OCR output.
+    Returns (period_id, number_text, size, color); unknown parts are "Unknown"/None.
+    """
+    period_id = "Unknown"
+    number_text = None
+    size_from_number = None
+    color_from_number = None
+
+    if raw_ocr_text:
+        parts = [p for p in raw_ocr_text.split() if p]
+
+        if len(parts) >= 2:
+            period_id = parts[0]
+            result_number_str = parts[-1]
+
+            if result_number_str.isdigit() and len(result_number_str) == 1:
+                number_text = result_number_str
+                num = int(number_text)
+                size_from_number = "Small" if num <= 4 else "Big"
+                color_from_number = "Red" if num % 2 == 0 else "Green"
+            else:
+                log("ocr_unparsed", "debug", text=raw_ocr_text)
+        elif len(parts) == 1 and len(parts[0]) > 10:
+            period_id = parts[0]
+
+    return period_id, number_text, size_from_number, color_from_number
+
+
+# -------------------- OCR Service (concurrent PSM variants + exact-match crop cache) --------------------
+
+_apis = {}  # config -> loaded tesserocr engine (one set per worker process)
+
+
+def crop_key(img):
+    """
+    Cache key of a crop: its size and the CRC32 of its raw pixels. The cache
+    is exact-match only: a hit means the very same pixels, never a look-alike
+    (a near-duplicate crop may show a different period digit).
+    """
+    return img.size, zlib.crc32(img.tobytes())
+
+
+def _tesserocr_api(cfg):
+    """Per-worker warm Tesseract engine for one config string."""
+    api = _apis.get(cfg)
+    if api is None:
+        psm = int(re.search(r"--psm (\d+)", cfg).group(1))
+        api = _tesserocr_module().PyTessBaseAPI(psm=psm)
+        whitelist = re.search(r"tessedit_char_whitelist=(\S+)", cfg)
+        if whitelist:
+            api.SetVariable("tessedit_char_whitelist", whitelist.group(1))
+        _apis[cfg] = api
+    return api
+
+
+def _init_worker():
+    """Pool initializer: load the OCR libraries and one engine per config before the first crop."""
+    _pytesseract()
+    if _tesserocr_module() is not None:
+        for cfg in OCR_CONFIGS:
+            _tesserocr_api(cfg)
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def _ocr_one(cropped, cfg):
+    """
+    OCR one PSM variant (runs in a pool worker process). Returns the text and
+    the seconds spent, which the parent records in OCR_SECONDS.
+    """
+    started = time.perf_counter()
+    try:
+        if _tesserocr_module() is not None:
+            api = _tesserocr_api(cfg)
+            api.SetImage(cropped)
+            text = api.GetUTF8Text().strip()
+        else:
+            text = _pytesseract().image_to_string(cropped, config=cfg).strip()
+    except Exception as e:
+        # pytesseract's exceptions do not unpickle in the parent (that would break the whole pool)
+        raise RuntimeError(f"{e.__class__.__name__}: {e}") from None
+    return text, time.perf_counter() - started
+
+
+def is_valid_ocr_text(raw_ocr_text):
+    """A complete line that also parses to a result digit."""
+    return is_complete_ocr_text(raw_ocr_text) and parse_ocr_text(raw_ocr_text)[1] is not None
+
+
+class OCRService:
+    """
+    Runs the PSM variants concurrently on a pool of warm worker processes and
+    returns the first valid parse. Each worker loads pytesseract and (when
+    installed) one tesserocr engine per config in its initializer, so
+    Tesseract's CPU-bound recognition never runs under the ingestion
+    process's GIL. Recently seen crops (see crop_key) are answered from a
+    small LRU cache, so an unchanged result box is never OCR'd twice.
+    """
+
+    def __init__(self, workers=len(OCR_CONFIGS), cache_size=64, executor=None):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._executor = executor
+        self._cache = OrderedDict()   # crop_key -> raw OCR text
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # spawn: the ingestion process already runs threads (asyncio, driver pool), which fork would copy mid-lock
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker)
+        return self._executor
+
+    def _cache_get(self, key):
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+        return text
+
+    def _cache_put(self, key, text):
+        self._cache[key] = text
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def read(self, cropped):
+        """OCR the result box crop; returns the raw text like ocr_result_box."""
+        key = crop_key(cropped)
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+
+        futures = {asyncio.wrap_future(self.executor.submit(_ocr_one, cropped, cfg)): cfg for cfg in OCR_CONFIGS}
+        results = {}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    cfg = futures[fut]
+                    try:
+                        results[cfg], seconds = fut.result()
+                        OCR_SECONDS.observe(seconds, OCR_PSM[cfg])
+                    except Exception as e:
+                        log("ocr_error", "error", psm=OCR_PSM[cfg], error=str(e))
+                        results[cfg] = ""
+                    log("ocr_try", "debug", psm=OCR_PSM[cfg], text=results[cfg])
+                    if is_valid_ocr_text(results[cfg]):
+                        self._cache_put(key, results[cfg])
+                        return results[cfg]
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+        # No valid parse: same fallback as the sequential loop (last config's output)
+        return results.get(OCR_CONFIGS[-1], "")
+
+    def warm_up(self):
+        """Start the worker processes (and load the OCR libraries in them) ahead of the first round."""
+        for fut in [self.executor.submit(_worker_ready) for _ in range(self.workers)]:
+            fut.result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Shared OCR service for the ingestion loop
+ocr_service = OCRService()
@@ -0,0 +1,73 @@
+# pagination.py (KEYSET PAGINATION + NDJSON STREAMING HELPERS)
+
+import base64
+import datetime
+import json
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+MAX_PAGE_SIZE = 500          # Hard cap for a single page
+EXPORT_BATCH_SIZE = 1000     # Motor cursor batch size for NDJSON exports
+
+# Newest first, ties on timestamp broken by period
+PAGE_SORT = [("timestamp", -1), ("period", -1)]
+
+
+def clamp_limit(limit):
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(doc):
+    """Opaque cursor pointing just past `doc` in PAGE_SORT order."""
+    ts = doc.get("timestamp")
+    payload = {"t": ts.isoformat() if isinstance(ts, datetime.datetime) else ts, "p": doc.get("period")}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        ts = datetime.datetime.fromisoformat(payload["t"])
+        return ts, payload["p"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def keyset_query(cursor, query=None):
+    """Mongo filter selecting the rounds matching `query` after `cursor` (or all of them without one)."""
+    query = dict(query or {})
+    if not cursor:
+        return query
+    ts, period = decode_cursor(cursor)
+    return {**query, "$or": [
+        {"timestamp": {"$lt": ts}},
+        {"timestamp": ts, "period": {"$lt": period}},
+    ]}
+
+
+def _json_safe(doc):
+    if "_id" in doc:
+        doc["_id"] = str(doc["_id"])
+    return doc
+
+
+async def fetch_page(collection, projection, limit, cursor=None, query=None):
+    """
+    One page of rounds (optionally filtered by `query`) in PAGE_SORT order.
+    Returns (docs, next_cursor); next_cursor is None on the last page.
+    """
+    limit = clamp_limit(limit)
+    docs = await collection.find(keyset_query(cursor, query), projection).sort(PAGE_SORT).limit(limit).to_list(limit)
+    next_cursor = encode_cursor(docs[-1]) if len(docs) == limit else None
+    return [_json_safe(d) for d in docs], next_cursor
+
+
+async def ndjson_lines(collection, projection, limit=0, cursor=None, query=None):
+    """Yield rounds as NDJSON lines straight from the Motor cursor (constant memory)."""
+    db_cursor = collection.find(keyset_query(cursor, query), projection).sort(PAGE_SORT).batch_size(EXPORT_BATCH_SIZE)
+    if limit:
+        db_cursor = db_cursor.limit(limit)
+    async for doc in db_cursor:
+        yield json.dumps(jsonable_encoder(_json_safe(doc))) + "\n"
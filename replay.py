@@ -0,0 +1,242 @@
+# replay.py (OFFLINE BULK BACKTEST / REPLAY ENGINE)
+#
+# Streams one game's rounds from game_results in timestamp order and drives the
+# same predict-then-learn step as the live update_model, so model changes can be
+# evaluated (and the live models pre-trained) without waiting for live rounds.
+#
+# With --processes, the four pipelines train in separate worker processes on
+# chunks of rounds (see ParallelTrainer), so a long backtest uses more cores.
+#
+#      python replay.py --batch-size 2000 --window 1000 [--game WinGo_1M] [--processes 4]
+
+import argparse
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import model_updater
+from games import DEFAULT_GAME, GAMES
+from round_record import Round
+from utils import RollingFeatureState
+
+# Only the fields the feature engine and the scorer need
+REPLAY_PROJECTION = {"_id": 0, "period": 1, "number": 1, "color": 1, "size": 1, "timestamp": 1}
+
+TARGETS = ("color", "size", "number")
+
+# Rounds per chunk handed to the worker processes in parallel replay
+CHUNK_SIZE = 2000
+
+
+def _to_model_round(doc):
+    """Convert a stored document into the shape fetch_loop passes to update_model."""
+    number = doc.get("number")
+    if isinstance(number, str):
+        if not number.isdigit():
+            return None
+        number = int(number)
+    if number is None or not doc.get("color") or not doc.get("size"):
+        return None
+    model_round = dict(doc)
+    model_round["number"] = number
+    return model_round
+
+
+def _score(probs, current_round):
+    """Per-target hit flags for one prediction (same argmax rules as the dashboard)."""
+    color_probs = {"red": probs["prob_red"], "green": probs["prob_green"], "violet": probs["prob_violet"]}
+    predicted_color = max(color_probs, key=color_probs.get)
+    predicted_size = "big" if probs["prob_big"] > 0.5 else "small"
+    prob_numbers = probs["prob_numbers"]
+    predicted_number = int(max(prob_numbers, key=prob_numbers.get)) if prob_numbers else None
+
+    return {
+        "color": predicted_color == current_round["color"].lower(),
+        "size": predicted_size == current_round["size"].lower(),
+        "number": predicted_number == current_round["number"],
+    }
+
+
+class ReplayStats:
+    """Constant-memory counters: totals plus a rolling window of hits per target."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.rounds = 0     # Documents streamed
+        self.trained = 0    # Rounds that went through predict-then-learn
+        self.skipped = 0    # Documents without a usable result
+        self.hits = {t: 0 for t in TARGETS}
+        self._recent = {t: deque(maxlen=window) for t in TARGETS}
+        self._rolling_hits = {t: 0 for t in TARGETS}
+        self.started = time.perf_counter()
+
+    def record(self, hits):
+        self.trained += 1
+        for t in TARGETS:
+            hit = int(hits[t])
+            recent = self._recent[t]
+            if len(recent) == self.window:
+                self._rolling_hits[t] -= recent[0]
+            recent.append(hit)
+            self._rolling_hits[t] += hit
+            self.hits[t] += hit
+
+    def rolling_accuracy(self):
+        return {t: (self._rolling_hits[t] / len(self._recent[t]) if self._recent[t] else 0.0) for t in TARGETS}
+
+    def total_accuracy(self):
+        return {t: (self.hits[t] / self.trained if self.trained else 0.0) for t in TARGETS}
+
+    def report(self):
+        wall = time.perf_counter() - self.started
+        return {
+            "rounds": self.rounds,
+            "trained": self.trained,
+            "skipped": self.skipped,
+            "wall_time_s": round(wall, 3),
+            "rounds_per_s": round(self.rounds / wall, 1) if wall > 0 else 0.0,
+            "rolling_accuracy": {t: round(v, 4) for t, v in self.rolling_accuracy().items()},
+            "total_accuracy": {t: round(v, 4) for t, v in self.total_accuracy().items()},
+        }
+
+
+class ParallelTrainer:
+    """
+    Process mode of replay: rounds (features + outcome) are buffered into
+    chunks, and each of the four pipelines runs model_updater.train_chunk on
+    a chunk in its own worker process. A pipeline's next chunk is only sent
+    once its trained copy of the previous chunk is back, so every pipeline
+    still sees the rounds strictly in order (predict-then-learn per round);
+    the next chunk's features are computed while the current one trains.
+    """
+
+    def __init__(self, stats, game_code=DEFAULT_GAME, processes=len(model_updater.MODEL_NAMES),
+                 chunk_size=CHUNK_SIZE):
+        self.stats = stats
+        self.game_code = game_code
+        self.chunk_size = chunk_size
+        self.pool = ProcessPoolExecutor(max_workers=min(processes, len(model_updater.MODEL_NAMES)))
+        self._buffer = []       # (x, current_round) not yet dispatched
+        self._inflight = None   # Task training the previous chunk
+
+    async def add(self, x, current_round):
+        self._buffer.append((x, current_round))
+        if len(self._buffer) >= self.chunk_size:
+            await self._dispatch()
+
+    async def _dispatch(self):
+        chunk, self._buffer = self._buffer, []
+        if self._inflight is not None:
+            await self._inflight
+        self._inflight = asyncio.create_task(self._train(chunk))
+
+    async def _train(self, chunk):
+        game_models = model_updater.models_for(self.game_code)
+        xs = [x for x, _ in chunk]
+        ys = [model_updater.outcomes(current_round) for _, current_round in chunk]
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self.pool, model_updater.train_chunk, name, game_models.models[name], xs,
+                                 [y[name] for y in ys])
+            for name in model_updater.MODEL_NAMES))
+
+        probas = {}
+        for name, (model, outputs) in zip(model_updater.MODEL_NAMES, results):
+            game_models.models[name] = model
+            probas[name] = outputs
+        game_models.rounds_trained += len(chunk)
+        for i, (_, current_round) in enumerate(chunk):
+            probs = model_updater.combine_predictions({name: outputs[i] for name, outputs in probas.items()})
+            self.stats.record(_score(probs, current_round))
+
+    async def close(self):
+        """Train the remaining rounds and stop the workers."""
+        try:
+            if self._buffer:
+                await self._dispatch()
+            if self._inflight is not None:
+                await self._inflight
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+
+async def replay(collection, query=None, batch_size=1000, window=1000, report_every=10000, history=100, state=None,
+                 game_code=DEFAULT_GAME, processes=0, chunk_size=CHUNK_SIZE):
+    """
+    Replay one game's rounds in `collection` (optionally filtered by `query`)
+    through that game's live models.
+
+    Documents are pulled with cursor batches, so memory stays constant no
+    matter how many rounds are stored. `state` may be a pre-warmed
+    RollingFeatureState (e.g. when catching up after a checkpoint).
+    With `processes`, the pipelines train in worker processes (ParallelTrainer);
+    the trained models and the report are the same as sequential replay.
+    Returns the final ReplayStats report.
+    """
+    if state is None:
+        state = RollingFeatureState(history)
+    stats = ReplayStats(window)
+    trainer = ParallelTrainer(stats, game_code, processes, chunk_size) if processes else None
+
+    query = dict(query or {}, game_code=game_code)
+    cursor = collection.find(query, REPLAY_PROJECTION).sort("timestamp", 1).batch_size(batch_size)
+
+    try:
+        async for doc in cursor:
+            stats.rounds += 1
+            current_round = _to_model_round(doc)
+            if current_round is None:
+                stats.skipped += 1
+                continue
+
+            # Decode once for both the feature step and the history append
+            record = Round.from_doc(current_round)
+
+            # Same gating as update_model: only predict/learn once enough history exists
+            if state.length >= model_updater.MIN_HISTORY:
+                x = state.features(record)
+                if trainer is not None:
+                    await trainer.add(x, current_round)
+                else:
+                    probs = model_updater.predict_and_learn(x, current_round, game_code)
+                    stats.record(_score(probs, current_round))
+
+            state.append(record)
+
+            if report_every and stats.rounds % report_every == 0:
+                r = stats.report()
+                print(f"[REPLAY] {game_code} {r['rounds']} rounds | {r['rounds_per_s']} rounds/s | rolling acc: {r['rolling_accuracy']}")
+    finally:
+        if trainer is not None:
+            await trainer.close()
+
+    report = stats.report()
+    print(f"[REPLAY] {game_code} done: {report}")
+    return report
+
+
+# -------------------- Start --------------------
+if __name__ == "__main__":
+    from database import close_client, get_collection, open_client
+
+    parser = argparse.ArgumentParser(description="Replay game_results through the river models.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Cursor batch size")
+    parser.add_argument("--window", type=int, default=1000, help="Rolling accuracy window (rounds)")
+    parser.add_argument("--report-every", type=int, default=10000, help="Progress line interval (rounds)")
+    parser.add_argument("--game", default=DEFAULT_GAME, choices=list(GAMES), help="Game code to replay")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Train the pipelines in up to 4 worker processes (0: in this process)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rounds per worker chunk")
+    args = parser.parse_args()
+
+    async def main():
+        open_client()
+        try:
+            await replay(get_collection(), batch_size=args.batch_size, window=args.window,
+                         report_every=args.report_every, game_code=args.game,
+                         processes=args.processes, chunk_size=args.chunk_size)
+        finally:
+            close_client()
+
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+# round_record.py (COMPACT ROUND RECORD)
+#
+# Rounds kept in memory (history caches, feature state) are decoded once from
+# the stored document into a slotted Round: number as an int, color and size
+# as small int codes. Feature code compares codes instead of re-casting and
+# re-lowercasing Mongo dicts on every tick, and the DB read projects only the
+# fields a Round holds.
+
+from games import game_filter
+
+COLORS = ("red", "green", "violet")
+SIZES = ("small", "big")
+RED, GREEN, VIOLET = range(len(COLORS))
+SMALL, BIG = range(len(SIZES))
+UNKNOWN = -1
+
+COLOR_CODES = {name: code for code, name in enumerate(COLORS)}
+SIZE_CODES = {name: code for code, name in enumerate(SIZES)}
+
+# Only the fields a Round holds
+ROUND_PROJECTION = {"_id": 0, "period": 1, "number": 1, "color": 1, "size": 1, "timestamp": 1}
+
+
+def color_code(value):
+    return COLOR_CODES.get((value or "").lower(), UNKNOWN)
+
+
+def size_code(value):
+    return SIZE_CODES.get((value or "").lower(), UNKNOWN)
+
+
+def parse_number(value):
+    """Stored numbers are OCR strings ("7") or ints; anything else becomes None."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+class Round:
+    """One stored round: period id, result number, color/size codes and timestamp."""
+
+    __slots__ = ("period", "number", "color", "size", "timestamp")
+
+    def __init__(self, period, number, color, size, timestamp=None):
+        self.period = period
+        self.number = number
+        self.color = color
+        self.size = size
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_doc(cls, doc):
+        """Decode a stored (or freshly parsed) round document."""
+        return cls(doc.get("period"), parse_number(doc.get("number")), color_code(doc.get("color")),
+                   size_code(doc.get("size")), doc.get("timestamp"))
+
+    @property
+    def color_name(self):
+        return COLORS[self.color] if self.color != UNKNOWN else "n/a"
+
+    @property
+    def size_name(self):
+        return SIZES[self.size] if self.size != UNKNOWN else "n/a"
+
+    def as_doc(self):
+        """Dict shape of get_last_n_rounds (lowercase color/size, int number)."""
+        return {"period": self.period, "number": self.number, "color": self.color_name,
+                "size": self.size_name, "timestamp": self.timestamp}
+
+    def __repr__(self):
+        return f"Round({self.period!r}, {self.number!r}, {self.color_name}, {self.size_name})"
+
+
+def as_round(r):
+    """Round for either a Round or a round document."""
+    return r if isinstance(r, Round) else Round.from_doc(r)
+
+
+async def get_last_n_records(n=100, collection=None, game_code=None):
+    """Last n stored rounds of `game_code` (all games if None) as Round records, oldest first."""
+    docs = await collection.find(game_filter(game_code), ROUND_PROJECTION).sort("timestamp", -1).limit(n).to_list(n)
+    docs.reverse()
+    return [Round.from_doc(doc) for doc in docs]
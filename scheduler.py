@@ -0,0 +1,177 @@
+# scheduler.py (ROUND-BOUNDARY-AWARE CAPTURE SCHEDULER)
+#
+# Replaces the flat "do work, then sleep 30s" cadence. The scheduler anchors to
+# the moment a new period id first appears (monotonic clock), sleeps until just
+# before the next expected WinGo_30S boundary, then re-polls in a short bounded
+# burst until the period changes. Each round re-anchors the estimate, so
+# processing time never accumulates as drift.
+#
+#      python scheduler.py        (simulated clock + synthetic round source)
+
+import time
+
+from history_cache import _period_key
+from metrics import StageMetrics
+
+ROUND_SECONDS = 30.0    # WinGo_30S round length
+BURST_INTERVAL = 1.0    # Seconds between re-polls around a boundary
+BURST_LIMIT = 10        # Max re-polls per round before giving up on it
+LEAD = 1.0              # Start polling this long before the expected boundary
+
+
+class RoundScheduler:
+    """
+    Decides when to poll for the next round.
+
+    `clock` must be monotonic. Call wait_for_new_round (capture thread) or
+    async_wait_for_new_round (event loop) with a cheap `probe()` returning the
+    period id currently shown on the page.
+    """
+
+    def __init__(self, round_seconds=ROUND_SECONDS, burst_interval=BURST_INTERVAL,
+                 burst_limit=BURST_LIMIT, lead=LEAD, clock=time.monotonic):
+        self.round_seconds = round_seconds
+        self.burst_interval = burst_interval
+        self.burst_limit = burst_limit
+        self.lead = lead
+        self.clock = clock
+
+        self.last_key = None        # Newest period seen
+        self.closed_at = None       # Estimated close time of that period's predecessor round
+        self.next_boundary = None   # Expected time the next period appears
+        self._last_old_seen = None  # Last time a poll still showed the old period
+
+        self.polls = 0
+        self.missed = 0             # Bursts that ended without a new period
+        self.latency = StageMetrics("round_close_to_stored")
+
+    # --- Core logic (pure, clock-driven) ---
+    def mark(self, period):
+        """Record one probe result. Returns True if it is a new period."""
+        now = self.clock()
+        self.polls += 1
+        key = _period_key(period)
+        if key is None:
+            return False
+        if self.last_key is not None and key <= self.last_key:
+            self._last_old_seen = now
+            return False
+
+        # New period: it appeared between the last "old" poll and now
+        if self._last_old_seen is not None and now - self._last_old_seen <= self.burst_interval * 1.5:
+            self.closed_at = now - (now - self._last_old_seen) / 2
+        else:
+            self.closed_at = now
+        self.next_boundary = self.closed_at + self.round_seconds
+        self.last_key = key
+        self._last_old_seen = None
+        return True
+
+    def time_until_burst(self):
+        """Seconds to sleep before the next burst starts (0 = poll now)."""
+        if self.next_boundary is None:
+            return 0.0
+        return max(0.0, self.next_boundary - self.lead - self.clock())
+
+    def give_up_round(self):
+        """Burst exhausted: assume the round was missed and aim for the following boundary."""
+        self.missed += 1
+        if self.next_boundary is not None:
+            self.next_boundary += self.round_seconds
+
+    def record_stored(self):
+        """Round close -> stored prediction latency for the newest period."""
+        if self.closed_at is not None:
+            self.latency.observe(self.clock() - self.closed_at)
+
+    # --- Drivers ---
+    def wait_for_new_round(self, probe, sleep=time.sleep):
+        """
+        Blocking driver (capture thread). `sleep(seconds)` may return True to
+        abort (e.g. threading.Event.wait). Returns the new period or None.
+        """
+        delay = self.time_until_burst()
+        if delay > 0 and sleep(delay):
+            return None
+        for _ in range(self.burst_limit):
+            period = probe()
+            if self.mark(period):
+                return period
+            if sleep(self.burst_interval):
+                return None
+        self.give_up_round()
+        return None
+
+    async def async_wait_for_new_round(self, probe, sleep=None):
+        """Event-loop driver; `probe` is a coroutine function."""
+        import asyncio
+        sleep = sleep or asyncio.sleep
+
+        delay = self.time_until_burst()
+        if delay > 0:
+            await sleep(delay)
+        for _ in range(self.burst_limit):
+            period = await probe()
+            if self.mark(period):
+                return period
+            await sleep(self.burst_interval)
+        self.give_up_round()
+        return None
+
+
+# -------------------- Simulation helpers --------------------
+class SimulatedClock:
+    """Manually advanced monotonic clock; `sleep` advances it instantly."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class SyntheticRoundSource:
+    """Period ids that change every `round_seconds` on the given clock."""
+
+    def __init__(self, clock, round_seconds=ROUND_SECONDS, first_period=20250101100010000, phase=7.3):
+        self.clock = clock
+        self.round_seconds = round_seconds
+        self.first_period = first_period
+        self.phase = phase
+
+    def period_at(self, t):
+        return str(self.first_period + int((t + self.phase) // self.round_seconds))
+
+    def probe(self):
+        return self.period_at(self.clock())
+
+
+def simulate(rounds=200, processing=(0.5, 6.0), seed=1):
+    """Run the scheduler against a synthetic source with random processing time per round."""
+    import random
+    rng = random.Random(seed)
+    clock = SimulatedClock()
+    source = SyntheticRoundSource(clock)
+    scheduler = RoundScheduler(clock=clock)
+
+    seen = []
+    while len(seen) < rounds:
+        period = scheduler.wait_for_new_round(source.probe, clock.sleep)
+        if period is None:
+            continue
+        seen.append(int(period))
+        clock.sleep(rng.uniform(*processing))   # capture + OCR + model + insert
+        scheduler.record_stored()
+
+    gaps = sum(b - a - 1 for a, b in zip(seen, seen[1:]))
+    duplicates = len(seen) - len(set(seen))
+    return {"rounds": len(seen), "missed_periods": gaps, "duplicates": duplicates,
+            "polls_per_round": round(scheduler.polls / len(seen), 2),
+            "close_to_stored": scheduler.latency.summary()}
+
+
+if __name__ == "__main__":
+    print(simulate())
@@ -0,0 +1,282 @@
+# staged_pipeline.py (NON-BLOCKING CAPTURE -> OCR/PARSE -> MODEL/PERSIST PIPELINE)
+#
+# Selenium calls (WebDriverWait, the DOM history rows, or body text + screenshot
+# when those fail validation) run in a dedicated capture thread that keeps the
+# page open and produces frames. OCR/parse and the
+# model+persist step run as asyncio stages. Stages are connected by bounded
+# queues, so a slow stage applies backpressure instead of piling up frames.
+#
+#      python staged_pipeline.py --replay-dir recordings/     (fake driver, no Chrome)
+
+import asyncio
+import datetime
+import re
+import threading
+import time
+
+from dom_history import parse_history_rows, read_history_rows
+from jsonlog import log
+from metrics import StageMetrics, histogram
+from ocr import capture_result_box, ocr_service, parse_ocr_text
+
+QUEUE_SIZE = 2          # Frames/results buffered between stages
+CAPTURE_INTERVAL = 30   # Seconds between captures
+
+STAGE_SECONDS = histogram("bdg_stage_seconds", "Pipeline stage latency per round.", ("stage",))
+HISTORY_ROWS_SECONDS = histogram("bdg_history_rows_seconds", "Game history rows read from the DOM (one scripted call).")
+PARSE_SECONDS = histogram("bdg_parse_seconds", "Result parse per capture source.", ("source",))
+
+
+# -------------------- Stage functions --------------------
+def capture_frame(driver):
+    """
+    Capture stage (runs in the capture thread): read the already-open page
+    without reloading it and grab the result box crop.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    WebDriverWait(driver, 5).until(
+        EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'Game history')]"))
+    )
+    frame = {"captured_at": time.monotonic(), "timestamp": datetime.datetime.utcnow()}
+
+    # Fast path: the history rows straight from the DOM (one scripted call, no screenshot)
+    try:
+        with HISTORY_ROWS_SECONDS.time():
+            raw_rows = read_history_rows(driver)
+        with PARSE_SECONDS.time("dom"):
+            frame["rows"] = parse_history_rows(raw_rows)
+        return frame
+    except Exception as e:
+        log("dom_rows_unusable", "warning", error=str(e))
+
+    frame["page_text"] = driver.find_element(By.TAG_NAME, "body").text
+    frame["crop"] = capture_result_box(driver)
+    return frame
+
+
+def read_page_period(driver):
+    """Cheap probe for the scheduler: first period id visible in the page text."""
+    from selenium.webdriver.common.by import By
+
+    match = re.search(r"\b20\d{11,}\b", driver.find_element(By.TAG_NAME, "body").text)
+    return match.group(0) if match else None
+
+
+async def parse_frame(frame):
+    """OCR/parse stage: turn a captured frame into a result dict (same shape as before)."""
+    if frame.get("rows"):
+        # Validated DOM rows: the newest one is the round that just closed
+        result = dict(frame["rows"][0], timestamp=frame["timestamp"])
+        log("parsed", source="dom", **result)
+        result["_rows"] = frame["rows"]  # All visible rows, for gap backfill in the process stage
+        return result
+
+    raw_ocr_text = ""
+    period_id, number_text, size_from_number, color_from_number = "Unknown", None, None, None
+    try:
+        raw_ocr_text = await ocr_service.read(frame["crop"])
+        with PARSE_SECONDS.time("ocr"):
+            period_id, number_text, size_from_number, color_from_number = parse_ocr_text(raw_ocr_text)
+        log("ocr_text", "debug", text=raw_ocr_text, period=period_id, number=number_text)
+    except Exception as ocr_e:
+        log("ocr_failed", "error", error=str(ocr_e))
+
+    if period_id == "Unknown":
+        match = re.search(r"\b20\d{11,}\b", frame["page_text"])
+        period_id = match.group(0) if match else "Unknown"
+
+    result = {
+        "period": period_id,
+        "color": color_from_number,
+        "size": size_from_number,
+        "number": number_text,
+        "timestamp": frame["timestamp"],
+    }
+    log("parsed", source="ocr", **result)
+    return result
+
+
+# -------------------- Pipeline --------------------
+class StagedPipeline:
+    """
+    capture (thread) -> frames queue -> parse (async) -> results queue -> process (async)
+
+    `capture()` is a blocking callable returning a frame dict (or None),
+    `parse(frame)` and `process(result)` are coroutines. `is_running()` pauses
+    capture without tearing the pipeline down. With a `scheduler` (see
+    scheduler.RoundScheduler) and a cheap `probe()` returning the visible
+    period id, captures are aligned to round boundaries instead of `interval`.
+    """
+
+    def __init__(self, capture, parse, process, interval=CAPTURE_INTERVAL, is_running=lambda: True,
+                 queue_size=QUEUE_SIZE, scheduler=None, probe=None):
+        self.capture = capture
+        self.parse = parse
+        self.process = process
+        self.interval = interval
+        self.is_running = is_running
+        self.queue_size = queue_size
+        self.scheduler = scheduler
+        self.probe = probe
+        self.metrics = {name: StageMetrics(name) for name in
+                        ("capture", "parse", "process", "end_to_end", "close_to_stored")}
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._loop = None
+        self._thread = None
+        self._frames = None
+        self._results = None
+
+    # --- Capture thread ---
+    def _put_blocking(self, item):
+        """Hand a frame to the event loop, blocking while the queue is full (backpressure)."""
+        fut = asyncio.run_coroutine_threadsafe(self._frames.put(item), self._loop)
+        while not self._stop.is_set():
+            try:
+                fut.result(timeout=0.5)
+                return True
+            except TimeoutError:
+                continue
+            except Exception:
+                return False  # Event loop shut down / put cancelled
+        fut.cancel()
+        return False
+
+    def _capture_thread(self):
+        while not self._stop.is_set():
+            if not self.is_running():
+                self._stop.wait(0.1)
+                continue
+
+            closed_at = None
+            if self.scheduler is not None:
+                # Sleep to the next boundary, then burst-poll until a new period shows up
+                try:
+                    period = self.scheduler.wait_for_new_round(self.probe, self._stop.wait)
+                except Exception as e:
+                    log("probe_failed", "error", error=str(e))
+                    self._stop.wait(self.scheduler.burst_interval)
+                    continue
+                if period is None:
+                    continue
+                closed_at = self.scheduler.closed_at
+
+            started = time.monotonic()
+            try:
+                frame = self.capture()
+            except Exception as e:
+                log("capture_failed", "error", error=str(e))
+                frame = None
+            self._observe("capture", time.monotonic() - started)
+
+            if frame is not None:
+                frame["closed_at"] = closed_at
+                if not self._put_blocking(frame):
+                    break
+            if self.scheduler is None:
+                # Sleep the remainder of the interval (capture time does not add drift)
+                self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    # --- Async stages ---
+    async def _parse_stage(self):
+        while True:
+            frame = await self._frames.get()
+            started = time.monotonic()
+            try:
+                result = await self.parse(frame)
+            except Exception as e:
+                log("parse_failed", "error", error=str(e))
+                result = None
+            self._observe("parse", time.monotonic() - started)
+
+            if result and result.get("number") is not None:
+                result["_captured_at"] = frame.get("captured_at", started)
+                result["_closed_at"] = frame.get("closed_at")
+                await self._results.put(result)
+            else:
+                # This handles OCR failure (transient)
+                self.dropped += 1
+                log("incomplete_result", "warning", dropped=self.dropped)
+
+    async def _process_stage(self):
+        while True:
+            result = await self._results.get()
+            captured_at = result.pop("_captured_at")
+            closed_at = result.pop("_closed_at")
+            started = time.monotonic()
+            try:
+                stored = await self.process(result)
+            except Exception as e:
+                log("process_failed", "error", error=str(e))
+                stored = False
+            now = time.monotonic()
+            self._observe("process", now - started)
+            self._observe("end_to_end", now - captured_at)
+            if stored and closed_at is not None:
+                self._observe("close_to_stored", now - closed_at)
+
+    def _observe(self, stage, seconds):
+        self.metrics[stage].observe(seconds)
+        STAGE_SECONDS.observe(seconds, stage)
+
+    def metrics_summary(self):
+        summary = {name: m.summary() for name, m in self.metrics.items()}
+        summary["queues"] = {"frames": self._frames.qsize() if self._frames else 0,
+                             "results": self._results.qsize() if self._results else 0}
+        summary["dropped"] = self.dropped
+        return summary
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._frames = asyncio.Queue(maxsize=self.queue_size)
+        self._results = asyncio.Queue(maxsize=self.queue_size)
+        self._stop.clear()
+
+        self._thread = threading.Thread(target=self._capture_thread, name="capture", daemon=True)
+        self._thread.start()
+        try:
+            await asyncio.gather(self._parse_stage(), self._process_stage())
+        finally:
+            self._stop.set()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        """Wait for the capture thread to finish its current Selenium call (after stop())."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# -------------------- Start (local replay with a fake driver) --------------------
+if __name__ == "__main__":
+    import argparse
+    from fake_driver import FakeDriver
+
+    parser = argparse.ArgumentParser(description="Run the capture/parse stages against recorded pages.")
+    parser.add_argument("--replay-dir", required=True, help="Directory of recorded NNN.png / NNN.txt / NNN.html")
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    async def replay_main():
+        driver = FakeDriver(args.replay_dir)
+        done = asyncio.Event()
+        seen = []
+
+        async def process(result):
+            seen.append(result)
+            if len(seen) >= args.rounds:
+                done.set()
+
+        pipeline = StagedPipeline(lambda: capture_frame(driver), parse_frame, process, interval=args.interval)
+        task = asyncio.create_task(pipeline.run())
+        await done.wait()
+        pipeline.stop()
+        task.cancel()
+        print(f"[METRICS] {pipeline.metrics_summary()}")
+
+    asyncio.run(replay_main())
@@ -0,0 +1,232 @@
+# sweep.py (HYPERPARAMETER SWEEP OVER STORED HISTORY)
+#
+# Evaluates a grid of model configurations (PAClassifier C x number-model
+# AdaGrad learning rate) in one pass over a game's stored rounds. The history
+# is read once into compact number/color/size arrays; features are built from
+# them in chunks of CHUNK_ROUNDS (batch_features matrix per chunk, each with the
+# HISTORY rounds before it), so memory stays flat however long the history is.
+# Every candidate set of pipelines runs the same predict-then-learn step as
+# replay over that shared stream. Configs are split into groups, one per
+# worker process, and each worker builds a round's feature dict once for all
+# of its configs.
+#
+# Scores use accuracy_stats.score_round, so accuracy and log-loss are the
+# numbers /stats would report had the config been live.
+#
+#      python sweep.py --game WinGo_30S --pa-c 0.001 0.01 0.1 --lr 0.01 0.05 0.2 [--processes 8] [--json sweep.json]
+#      python sweep.py --synthetic 20000       (offline, seeded rounds from bench.py)
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import model_updater
+from accuracy_stats import TARGETS, score_round
+import numpy as np
+
+from batch_features import HISTORY, extract_features_batch, row_to_dict, rounds_to_arrays
+from games import DEFAULT_GAME, GAMES
+from replay import REPLAY_PROJECTION, _to_model_round
+
+# Default grid around the live values (model_updater.PA_C / NUMBER_LR)
+DEFAULT_PA_C = (0.001, 0.003, 0.01, 0.03, 0.1)
+DEFAULT_LR = (0.01, 0.02, 0.05, 0.1, 0.2)
+
+# Rounds per feature matrix (~200 bytes of features per round)
+CHUNK_ROUNDS = 5000
+
+
+def grid(pa_c=DEFAULT_PA_C, number_lr=DEFAULT_LR):
+    """Every (C, learning rate) combination as build_models keyword arguments."""
+    return [{"pa_c": c, "number_lr": lr} for c, lr in itertools.product(pa_c, number_lr)]
+
+
+# -------------------- History (read once) --------------------
+
+async def load_stream(collection, game_code=DEFAULT_GAME, query=None, limit=0, batch_size=2000):
+    """
+    The shared input of every config: number/color/size arrays of one game's
+    usable rounds in timestamp order, as replay sees them (documents without a
+    result are dropped). Documents are not kept, only these three fields.
+    """
+    cursor = collection.find(dict(query or {}, game_code=game_code), REPLAY_PROJECTION).sort(
+        "timestamp", 1).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    numbers, colors, sizes = [], [], []
+    async for doc in cursor:
+        model_round = _to_model_round(doc)
+        if model_round is not None:
+            numbers.append(model_round["number"])
+            colors.append(model_round["color"])
+            sizes.append(model_round["size"])
+    return np.array(numbers, dtype=np.int64), np.array(colors, dtype=str), np.array(sizes, dtype=str)
+
+
+def build_stream(rounds):
+    """load_stream's arrays for rounds already in memory (e.g. synthetic ones)."""
+    return rounds_to_arrays(rounds)
+
+
+def feature_chunks(numbers, colors, sizes, start=0, chunk=CHUNK_ROUNDS):
+    """
+    Yield (first round index, feature matrix) for rounds start.. in chunks of
+    `chunk` rows. Each chunk is built together with the HISTORY rounds before
+    it and then trimmed, so its rows equal those of one matrix over all rounds.
+    """
+    for lo in range(start, len(numbers), chunk):
+        hi = min(lo + chunk, len(numbers))
+        base = max(0, lo - HISTORY)
+        yield lo, extract_features_batch(numbers[base:hi], colors[base:hi], sizes[base:hi])[lo - base:]
+
+
+# -------------------- Evaluation (worker side) --------------------
+
+_stream = None  # Set in each worker by _init_worker
+
+
+def _init_worker(stream):
+    # Under fork the stream is inherited, not pickled
+    global _stream
+    _stream = stream
+
+
+def _new_totals():
+    return {t: {"n": 0, "hits": 0, "log_loss_sum": 0.0, "brier_sum": 0.0} for t in TARGETS}
+
+
+def _stream_rows(numbers, colors, sizes, chunk):
+    """(round index, feature row) from MIN_HISTORY on, one feature chunk in memory at a time."""
+    for lo, X in feature_chunks(numbers, colors, sizes, model_updater.MIN_HISTORY, chunk):
+        for k, row in enumerate(X):
+            yield lo + k, row
+
+
+def evaluate_group(configs, stream=None, chunk=CHUNK_ROUNDS):
+    """
+    Run every config in `configs` over the stream, round by round: the
+    feature dict and the labels are built once per round and fed to each
+    config's pipelines (predict-then-learn, as in replay).
+    Returns one result dict per config.
+    """
+    numbers, colors, sizes = stream if stream is not None else _stream
+    runs = [(config, model_updater.build_models(**config), _new_totals(), [0.0]) for config in configs]
+
+    for i, row in _stream_rows(numbers, colors, sizes, chunk):
+        x = row_to_dict(row)
+        current_round = {"number": int(numbers[i]), "color": str(colors[i]), "size": str(sizes[i])}
+        ys = model_updater.outcomes(current_round)
+        for config, models, totals, elapsed in runs:
+            started = time.perf_counter()
+            probas = {name: model_updater.learn_step(name, models[name], x, ys[name]) for name in model_updater.MODEL_NAMES}
+            elapsed[0] += time.perf_counter() - started
+
+            probs = model_updater.combine_predictions(probas)
+            doc = dict(current_round, prob_red=probs["prob_red"], prob_green=probs["prob_green"],
+                       prob_violet=probs["prob_violet"], prob_size_big=probs["prob_big"],
+                       prob_size_small=probs["prob_small"], prob_numbers=probs["prob_numbers"])
+            for target, (hit, brier, log_loss, _) in score_round(doc).items():
+                t = totals[target]
+                t["n"] += 1
+                t["hits"] += hit
+                t["log_loss_sum"] += log_loss
+                t["brier_sum"] += brier
+
+    return [_summary(config, totals, elapsed[0]) for config, models, totals, elapsed in runs]
+
+
+def _summary(config, totals, elapsed):
+    rounds = max(t["n"] for t in totals.values())
+    return {
+        **config,
+        "rounds": rounds,
+        "accuracy": {t: round(v["hits"] / v["n"], 4) if v["n"] else None for t, v in totals.items()},
+        "log_loss": {t: round(v["log_loss_sum"] / v["n"], 4) if v["n"] else None for t, v in totals.items()},
+        "brier": {t: round(v["brier_sum"] / v["n"], 4) if v["n"] else None for t, v in totals.items()},
+        "rounds_per_s": round(rounds / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+# -------------------- Driver --------------------
+
+def sweep(stream, configs, processes=None):
+    """
+    Evaluate `configs` over one shared stream. With processes > 1 the configs
+    are dealt round-robin into one group per worker; processes=0 runs them all
+    in this process. Results come back in config order.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    started = time.perf_counter()
+    if processes <= 1 or len(configs) == 1:
+        results = evaluate_group(configs, stream)
+    else:
+        groups = [configs[k::processes] for k in range(min(processes, len(configs)))]
+        by_config = {}
+        with ProcessPoolExecutor(max_workers=len(groups), initializer=_init_worker, initargs=(stream,)) as pool:
+            futures = [pool.submit(evaluate_group, group) for group in groups]
+            for done, future in enumerate(as_completed(futures), 1):
+                for result in future.result():
+                    by_config[(result["pa_c"], result["number_lr"])] = result
+                print(f"[SWEEP] {done}/{len(groups)} config groups done ({time.perf_counter() - started:.1f}s)")
+        results = [by_config[(c["pa_c"], c["number_lr"])] for c in configs]
+
+    wall = time.perf_counter() - started
+    rounds = results[0]["rounds"] if results else 0
+    print(f"[SWEEP] {len(configs)} configs x {rounds} rounds in {wall:.1f}s "
+          f"({round(len(configs) * rounds / wall, 1) if wall > 0 else 0.0} config-rounds/s)")
+    return results
+
+
+def print_table(results, sort_by="number"):
+    """One line per config, best (lowest) log-loss on `sort_by` first."""
+    ordered = sorted(results, key=lambda r: r["log_loss"][sort_by] if r["log_loss"][sort_by] is not None else float("inf"))
+    header = f"{'C':>8} {'lr':>6} | " + " ".join(f"{'acc_' + t:>10}" for t in TARGETS) + " | " + \
+             " ".join(f"{'ll_' + t:>9}" for t in TARGETS) + f" | {'rounds/s':>9}"
+    print(header)
+    for r in ordered:
+        live = " *" if (r["pa_c"], r["number_lr"]) == (model_updater.PA_C, model_updater.NUMBER_LR) else ""
+        print(f"{r['pa_c']:>8g} {r['number_lr']:>6g} | " + " ".join(f"{r['accuracy'][t]:>10}" for t in TARGETS)
+              + " | " + " ".join(f"{r['log_loss'][t]:>9}" for t in TARGETS) + f" | {r['rounds_per_s']:>9}{live}")
+
+
+# -------------------- Start --------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a grid of model hyperparameters over stored rounds.")
+    parser.add_argument("--game", default=DEFAULT_GAME, choices=list(GAMES), help="Game code to read")
+    parser.add_argument("--limit", type=int, default=0, help="Oldest N rounds only (0: all)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N seeded synthetic rounds instead of MongoDB")
+    parser.add_argument("--pa-c", type=float, nargs="+", default=list(DEFAULT_PA_C), help="PAClassifier C values")
+    parser.add_argument("--lr", type=float, nargs="+", default=list(DEFAULT_LR), help="Number-model AdaGrad learning rates")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: CPU count, 0: in this process)")
+    parser.add_argument("--sort", default="number", choices=TARGETS, help="Order the table by this target's log-loss")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.synthetic:
+        from bench import synthetic_rounds
+        stream = build_stream([_to_model_round(doc) for doc in synthetic_rounds(args.synthetic)])
+    else:
+        from database import close_client, get_collection, open_client
+
+        async def read():
+            open_client()
+            try:
+                return await load_stream(get_collection(), args.game, limit=args.limit)
+            finally:
+                close_client()
+
+        stream = asyncio.run(read())
+    print(f"[SWEEP] {len(stream[0])} rounds loaded in {time.perf_counter() - started:.2f}s")
+
+    results = sweep(stream, grid(args.pa_c, args.lr), args.processes)
+    print_table(results, args.sort)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[SWEEP] Results written to {args.json}")
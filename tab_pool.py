@@ -0,0 +1,76 @@
+# tab_pool.py (SHARED BROWSER / TAB POOL FOR PER-GAME WORKERS)
+#
+# Each game code gets its own tab; tabs are spread over a small number of
+# browser instances. A WebDriver is not thread-safe and only drives its active
+# tab, so every use of a tab holds that driver's lock and switches to the tab
+# first. Workers on different drivers never wait on each other.
+
+import threading
+import time
+from contextlib import contextmanager
+
+from jsonlog import log
+from metrics import StageMetrics
+
+
+class TabPool:
+    """
+    `make_driver(index)` creates browser instance number `index`; tabs are
+    assigned round-robin over `drivers` instances as games are opened.
+    """
+
+    def __init__(self, make_driver, drivers=1):
+        self.make_driver = make_driver
+        self.size = max(1, drivers)
+        self._drivers = []      # [(driver, lock)]
+        self._tabs = {}         # game_code -> (driver index, window handle)
+        self._active = {}       # driver index -> window handle currently switched to
+        self.lock_wait = StageMetrics("tab_lock_wait")
+
+    def open(self, game_code, url):
+        """Open `url` in a new tab dedicated to `game_code`."""
+        index = len(self._tabs) % self.size
+        if index == len(self._drivers):
+            driver = self.make_driver(index)
+            self._drivers.append((driver, threading.Lock()))
+            handle = driver.current_window_handle   # First game reuses the initial tab
+        else:
+            driver, lock = self._drivers[index]
+            with lock:
+                driver.switch_to.new_window("tab")
+                handle = driver.current_window_handle
+        self._tabs[game_code] = (index, handle)
+        self._active[index] = handle
+
+        with self.tab(game_code) as driver:
+            driver.get(url)
+            driver.implicitly_wait(15)
+        log("page_opened", game_code=game_code, browser=index)
+        return handle
+
+    @contextmanager
+    def tab(self, game_code):
+        """Exclusive use of the game's tab: `with pool.tab(code) as driver: ...`"""
+        index, handle = self._tabs[game_code]
+        driver, lock = self._drivers[index]
+        started = time.monotonic()
+        with lock:
+            self.lock_wait.observe(time.monotonic() - started)
+            if self._active.get(index) != handle:
+                driver.switch_to.window(handle)
+                self._active[index] = handle
+            yield driver
+
+    @property
+    def game_codes(self):
+        return list(self._tabs)
+
+    def quit(self):
+        for driver, lock in self._drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                log("browser_quit_failed", "error", error=str(e))
+        self._drivers = []
+        self._tabs = {}
+        self._active = {}
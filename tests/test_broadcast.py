@@ -0,0 +1,191 @@
+import asyncio
+import datetime
+
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import AutoReconnect, OperationFailure, ServerSelectionTimeoutError
+
+from broadcast import RoundBroadcaster
+
+PROJECTION = {"_id": 0, "game_code": 1, "period": 1, "number": 1, "color": 1, "size": 1, "timestamp": 1}
+NOW = datetime.datetime(2025, 6, 1, 12, 0, 0)
+
+
+def _round(period, game_code="WinGo_30S", seconds_ago=0):
+    return {"game_code": game_code, "period": str(period), "number": "3", "color": "Green", "size": "Small",
+            "timestamp": NOW - datetime.timedelta(seconds=seconds_ago)}
+
+
+async def _drain(queue, count, timeout=2.0):
+    received = []
+    while len(received) < count:
+        received.append(await asyncio.wait_for(queue.get(), timeout))
+    await asyncio.sleep(0.05)
+    while not queue.empty():
+        received.append(queue.get_nowait())
+    return received
+
+
+def test_polling_tail_pushes_backdated_and_out_of_order_rounds():
+    async def run():
+        collection = AsyncMongoMockClient()["betting_db"]["game_results"]
+        await collection.insert_many([_round(100 + i, seconds_ago=300 - 30 * i) for i in range(5)])
+        broadcaster = RoundBroadcaster(collection, PROJECTION, poll_interval=0.01, change_stream=False)
+        queue = broadcaster.subscribe()
+        await asyncio.sleep(0.05)
+
+        # Backfilled round (older timestamp than everything stored), then a
+        # write-behind batch of two games whose timestamps are not in insert order
+        await collection.insert_one(_round(99, seconds_ago=3600))
+        await collection.insert_many([_round(200, "WinGo_1M", seconds_ago=0), _round(105, seconds_ago=60)])
+        received = await _drain(queue, 3)
+        broadcaster._task.cancel()
+        return received
+
+    received = asyncio.run(run())
+    assert [r["period"] for r in received] == ["99", "200", "105"]
+    assert all("_id" not in r and "predicted_color" in r for r in received)
+
+
+def test_polling_tail_catches_ids_sorting_behind_the_newest():
+    """Another writer's _id from the same second can sort below the newest one already seen."""
+    async def run():
+        collection = AsyncMongoMockClient()["betting_db"]["game_results"]
+        broadcaster = RoundBroadcaster(collection, PROJECTION, poll_interval=0.01, change_stream=False)
+        created = datetime.datetime.now(datetime.UTC)
+        high = ObjectId.from_datetime(created)
+        high = ObjectId(str(high)[:8] + "ffffffffffffffff")
+        await collection.insert_one(dict(_round(1), _id=high))
+        queue = broadcaster.subscribe()
+        await asyncio.sleep(0.05)
+
+        await collection.insert_one(dict(_round(2), _id=ObjectId(str(high)[:8] + "0000000000000001")))
+        await collection.insert_one(_round(3))
+        received = await _drain(queue, 2)
+        broadcaster._task.cancel()
+        return received
+
+    received = asyncio.run(run())
+    assert [r["period"] for r in received] == ["2", "3"]
+
+
+class FakeStream:
+    """Change stream over a scripted list of events; an exception in the list is raised there."""
+
+    def __init__(self, events, end):
+        self.events = list(events)
+        self.end = end          # "invalidate" ends the stream, "block" waits forever
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.events:
+            if self.end == "invalidate":
+                raise StopAsyncIteration
+            await asyncio.Event().wait()
+        event = self.events.pop(0)
+        if isinstance(event, BaseException):
+            raise event
+        self.resume_token = {"_data": event["period"]}
+        return {"operationType": "insert", "fullDocument": event}
+
+
+class FakeWatchCollection:
+    """collection.watch() that plays one script per call (an exception raises on open)."""
+
+    def __init__(self, *scripts):
+        self.scripts = list(scripts)
+        self.resume_after = []
+
+    def watch(self, pipeline, resume_after=None):
+        self.resume_after.append(resume_after)
+        script = self.scripts.pop(0)
+        if isinstance(script, BaseException):
+            raise script
+        events, end = script
+        return FakeStream(events, end)
+
+
+def _watch(collection, subscribers=1):
+    async def run():
+        broadcaster = RoundBroadcaster(collection, PROJECTION, poll_interval=0.001)
+        queues = [broadcaster.subscribe() for _ in range(subscribers)]
+        await asyncio.sleep(0.1)
+        task = broadcaster._task
+        task.cancel()
+        received = [[q.get_nowait() for _ in range(q.qsize())] for q in queues]
+        return received, broadcaster, task
+    return asyncio.run(run())
+
+
+def _periods(records):
+    return [r["period"] if r is not None else None for r in records]
+
+
+def test_change_stream_resumes_after_network_error():
+    collection = FakeWatchCollection(([_round(1), AutoReconnect("primary stepped down")], "block"),
+                                     ([_round(2)], "block"))
+    (received,), broadcaster, _ = _watch(collection)
+    assert collection.resume_after == [None, {"_data": "1"}]
+    assert _periods(received) == ["1", "2"]
+    assert broadcaster.subscriber_count == 1
+
+
+def test_change_stream_restart_without_resume_token_ends_subscriber_streams():
+    collection = FakeWatchCollection(([_round(1), OperationFailure("resume token not found", 286)], "block"),
+                                     ([_round(2)], "invalidate"),
+                                     ([], "block"))
+    received, broadcaster, _ = _watch(collection, subscribers=2)
+    assert collection.resume_after == [None, None, None]
+    # Both clients get round 1 and then the end-of-stream sentinel; they reconnect with a fresh snapshot
+    assert [_periods(r) for r in received] == [["1", None], ["1", None]]
+    assert broadcaster.subscriber_count == 0
+
+
+def test_watcher_failure_ends_subscriber_streams_and_is_restarted(capsys):
+    collection = FakeWatchCollection(([ValueError("bad change event")], "block"), ([_round(7)], "block"))
+
+    async def run():
+        broadcaster = RoundBroadcaster(collection, PROJECTION, poll_interval=0.001)
+        first = broadcaster.subscribe()
+        assert await asyncio.wait_for(first.get(), 1.0) is None
+        await asyncio.sleep(0.01)
+        second = broadcaster.subscribe()
+        record = await asyncio.wait_for(second.get(), 1.0)
+        broadcaster._task.cancel()
+        return record
+
+    assert asyncio.run(run())["period"] == "7"
+    assert '"event": "stream_watcher_failed"' in capsys.readouterr().out
+
+
+def test_stream_unsubscribes_when_the_snapshot_fails(monkeypatch):
+    import main
+
+    async def failing_latest_data(limit, game):
+        raise ServerSelectionTimeoutError("mongod down")
+
+    async def run():
+        collection = AsyncMongoMockClient()["betting_db"]["game_results"]
+        broadcaster = RoundBroadcaster(collection, PROJECTION, poll_interval=0.01, change_stream=False)
+        monkeypatch.setattr(main, "broadcaster", broadcaster)
+        monkeypatch.setattr(main, "latest_data", failing_latest_data)
+        try:
+            await main.stream(limit=50, game=None)
+        except ServerSelectionTimeoutError:
+            pass
+        else:
+            raise AssertionError("snapshot error was swallowed")
+        if broadcaster._task is not None:
+            broadcaster._task.cancel()
+        return broadcaster.subscriber_count
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,75 @@
+import asyncio
+import pickle
+
+import checkpoint
+import model_updater
+from bench import synthetic_rounds
+from replay import _to_model_round
+from round_record import Round
+from utils import RollingFeatureState
+
+GAME = "TEST_CHECKPOINT"
+PROBE = {"number": 3, "is_big": 0, "red_freq_10": 4, "big_freq_10": 6, "current_color_streak": 2}
+
+
+def _feature_stream(n):
+    state = RollingFeatureState(100)
+    for doc in synthetic_rounds(n, seed=3):
+        current_round = _to_model_round(doc)
+        record = Round.from_doc(current_round)
+        if state.length >= model_updater.MIN_HISTORY:
+            yield state.features(record), current_round
+        state.append(record)
+
+
+def test_scheduled_checkpoint_holds_models_as_of_its_round(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+    stream = list(_feature_stream(80))
+    cut = 40
+
+    async def run():
+        model_updater._game_models.pop(GAME, None)
+        for x, current_round in stream[:cut]:
+            await model_updater.predict_and_learn_async(x, current_round, GAME)
+        task = checkpoint.schedule_checkpoint(stream[cut - 1][1]["period"], None, GAME)
+        trained = model_updater.models_for(GAME).rounds_trained
+        # Keep training (in the model lanes) while the write is pending
+        for x, current_round in stream[cut:]:
+            await model_updater.predict_and_learn_async(x, current_round, GAME)
+        await task
+        return trained
+
+    try:
+        trained = asyncio.run(run())
+    finally:
+        model_updater._game_models.pop(GAME, None)
+
+    with open(checkpoint.latest_checkpoint_path(GAME), "rb") as f:
+        payload = pickle.load(f)
+    assert payload["period"] == stream[cut - 1][1]["period"]
+    assert payload["rounds_trained"] == trained == cut
+
+    # Same models as a sequential run over exactly the first `cut` rounds
+    reference = model_updater.build_models()
+    for x, current_round in stream[:cut]:
+        ys = model_updater.outcomes(current_round)
+        for name in model_updater.MODEL_NAMES:
+            model_updater.learn_step(name, reference[name], x, ys[name])
+    for name in model_updater.MODEL_NAMES:
+        assert payload["models"][name].predict_proba_one(PROBE) == reference[name].predict_proba_one(PROBE)
+
+
+def test_schedule_skips_while_previous_write_is_pending(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+
+    async def run():
+        first = checkpoint.schedule_checkpoint("1", None, GAME)
+        second = checkpoint.schedule_checkpoint("2", None, GAME)
+        await checkpoint.flush_checkpoint()
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        model_updater._game_models.pop(GAME, None)
+    assert first is not None and second is None
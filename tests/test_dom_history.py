@@ -0,0 +1,53 @@
+import glob
+import json
+import os
+
+import pytest
+
+from dom_history import check_snapshot, extract_rows_from_html, parse_history_rows
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "dom_history")
+SNAPSHOTS = sorted(glob.glob(os.path.join(FIXTURES, "*.html")))
+MALFORMED = sorted(glob.glob(os.path.join(FIXTURES, "malformed", "*.html")))
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("path", SNAPSHOTS, ids=os.path.basename)
+def test_snapshot_rows_match_expected(path):
+    with open(os.path.splitext(path)[0] + ".json", encoding="utf-8") as f:
+        expected = json.load(f)
+    assert parse_history_rows(extract_rows_from_html(_read(path))) == expected
+    assert check_snapshot(path) is None
+
+
+@pytest.mark.parametrize("path", MALFORMED, ids=os.path.basename)
+def test_malformed_snapshot_fails_validation(path):
+    raw = extract_rows_from_html(_read(path))
+    assert raw  # The rows are found; validation must reject them
+    with pytest.raises(ValueError):
+        parse_history_rows(raw)
+    assert check_snapshot(path) is not None
+
+
+def test_rows_before_the_label_are_ignored():
+    # The header shows the round in progress; only rows after "Game history" count
+    rows = extract_rows_from_html(_read(os.path.join(FIXTURES, "wingo_30s_rows.html")))
+    assert rows[0]["text"].startswith("20251018100051234")
+    assert "violet" in rows[1]["classes"]
+
+
+def test_row_without_period_is_skipped():
+    rows = extract_rows_from_html(_read(os.path.join(FIXTURES, "missing_period.html")))
+    assert [r["text"].split()[0] for r in rows] == ["20251018100051300", "20251018100051298"]
+
+
+def test_limit_and_missing_label():
+    html = _read(os.path.join(FIXTURES, "wingo_30s_rows.html"))
+    assert len(extract_rows_from_html(html, limit=3)) == 3
+    assert extract_rows_from_html(html.replace("Game history", "Chart")) is None
+    with pytest.raises(ValueError):
+        parse_history_rows(None)
@@ -0,0 +1,87 @@
+import asyncio
+import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from batch_features import extract_features_batch, row_to_dict, rounds_to_arrays
+from bench import synthetic_rounds
+from utils import RollingFeatureState, extract_features, get_last_n_rounds
+
+GAME = "WinGo_30S"
+HISTORY = 100
+T0 = datetime.datetime(2025, 1, 1)
+
+
+def _docs(n, seed=7):
+    docs = []
+    for i, doc in enumerate(synthetic_rounds(n, seed=seed)):
+        # Stored rounds keep OCR strings; mix the casing the way older rows have it
+        color = doc["color"].upper() if i % 7 == 0 else doc["color"]
+        docs.append(dict(doc, color=color, game_code=GAME, timestamp=T0 + datetime.timedelta(seconds=30 * i)))
+    return docs
+
+
+def _model_round(doc):
+    return dict(doc, number=int(doc["number"]))
+
+
+def test_rolling_state_matches_extract_features():
+    """push() gives the same vectors (values and key order) as a fresh DB read, from 0 history up to past capacity."""
+    docs = _docs(300)
+
+    async def run():
+        collection = AsyncMongoMockClient()["betting_db"]["game_results"]
+        state = RollingFeatureState(HISTORY)
+        for i, doc in enumerate(docs):
+            history = await get_last_n_rounds(HISTORY, collection, GAME)
+            assert len(history) == min(i, HISTORY)
+            expected = extract_features(history, _model_round(doc))
+            got = state.push(_model_round(doc))
+            assert list(got.items()) == list(expected.items()), f"round {i}"
+            await collection.insert_one(dict(doc))
+
+    asyncio.run(run())
+
+
+def test_warm_up_matches_extract_features():
+    """A state warmed up from a (short or full) stored history continues exactly like extract_features."""
+    docs = _docs(160, seed=11)
+
+    async def run():
+        collection = AsyncMongoMockClient()["betting_db"]["game_results"]
+        for count in (0, 3, 12, 60, 150):
+            await collection.delete_many({})
+            if count:
+                await collection.insert_many([dict(d) for d in docs[:count]])
+            history = await get_last_n_rounds(HISTORY, collection, GAME)
+            state = RollingFeatureState(HISTORY).warm_up(history)
+            assert state.length == min(count, HISTORY)
+            current = _model_round(docs[count])
+            assert list(state.features(current).items()) == list(extract_features(history, current).items())
+
+    asyncio.run(run())
+
+
+def _round(number, color, size):
+    return {"number": number, "color": color, "size": size}
+
+
+def _edge_case_rounds():
+    """Short-history start, strict size alternation, violet rounds and a color run longer than the window."""
+    rounds = [_round(1, "Green", "Small"), _round(6, "Red", "Big"), _round(3, "Green", "Small"),
+              _round(8, "Red", "Big"), _round(0, "Red Violet", "Small"), _round(5, "Green Violet", "Big")]
+    rounds += [_round(2 * (i % 5), "Red", "Small" if i % 5 < 3 else "Big") for i in range(HISTORY + 20)]
+    rounds += [_round(7, "Green", "Big")] * 3
+    rounds += [_model_round(doc) for doc in synthetic_rounds(250, seed=5)]
+    return rounds
+
+
+def test_batch_matrix_matches_extract_features():
+    """Every row of extract_features_batch equals extract_features over the same (normalized) history."""
+    rounds = _edge_case_rounds()
+    X = extract_features_batch(*rounds_to_arrays(rounds))
+    # extract_features sees history the way get_last_n_rounds returns it (lower-cased labels)
+    stored = [dict(r, color=r["color"].lower(), size=r["size"].lower()) for r in rounds]
+    for i, current in enumerate(rounds):
+        expected = extract_features(stored[max(0, i - HISTORY):i], current)
+        assert row_to_dict(X[i]) == expected, f"round {i}"
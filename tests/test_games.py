@@ -0,0 +1,16 @@
+import pytest
+
+from games import DEFAULT_GAME, GAMES, parse_game_codes
+
+
+def test_game_codes_default_to_the_single_previous_game():
+    assert parse_game_codes(None) == [DEFAULT_GAME]
+    assert parse_game_codes("") == [DEFAULT_GAME]
+    assert parse_game_codes("  ") == [DEFAULT_GAME]
+
+
+def test_game_codes_opt_in():
+    assert parse_game_codes("all") == list(GAMES)
+    assert parse_game_codes("WinGo_1M, WinGo_5M") == ["WinGo_1M", "WinGo_5M"]
+    with pytest.raises(ValueError):
+        parse_game_codes("WinGo_30S,WinGo_10M")
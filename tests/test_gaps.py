@@ -0,0 +1,119 @@
+import asyncio
+import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+import bdg_ocr_pipeline
+import model_updater
+from gaps import (GAPS_COLLECTION_NAME, MAX_GAP_ROUNDS, ensure_gaps_indexes, estimated_timestamp, gap_event,
+                  missing_count, missing_rows)
+from history_cache import history_for
+
+P = 20250601100010000
+T0 = datetime.datetime(2025, 6, 1, 12, 0, 0)
+
+
+def _row(period, number=3):
+    return {"period": str(period), "number": str(number), "color": "Green" if number % 2 else "Red",
+            "size": "Small" if number <= 4 else "Big"}
+
+
+def test_missing_count_ignores_consecutive_periods_and_day_rollovers():
+    assert missing_count(str(P), str(P + 1)) == 0
+    assert missing_count(str(P), str(P + 3)) == 2
+    assert missing_count(str(P), str(P + MAX_GAP_ROUNDS + 1)) == MAX_GAP_ROUNDS
+    assert missing_count(str(P), str(P + MAX_GAP_ROUNDS + 2)) == 0
+    assert missing_count("Unknown", str(P + 3)) == 0
+
+
+def test_missing_rows_are_strictly_between_and_oldest_first():
+    rows = [_row(P + k) for k in (5, 4, 3, 2, 1, 0)]  # Newest first, as on the page
+    assert [r["period"] for r in missing_rows(str(P + 1), rows, str(P + 5))] == [str(P + 2), str(P + 3), str(P + 4)]
+    assert missing_rows(str(P + 4), rows, str(P + 5)) == []
+
+
+def test_missing_rows_follow_the_rollover_rule():
+    rows = [_row(P + MAX_GAP_ROUNDS + 2), _row(P + MAX_GAP_ROUNDS + 1), _row(P + 1)]
+    assert missing_rows(str(P), rows, str(P + MAX_GAP_ROUNDS + 2)) == []
+    event = gap_event("WinGo_30S", str(P), str(P + MAX_GAP_ROUNDS + 2), 0)
+    assert (event["missing"], event["backfilled"], event["lost"]) == (0, 0, 0)
+
+
+def test_estimated_timestamps_keep_period_order():
+    stamps = [estimated_timestamp(T0, str(P + 5), str(P + k), 30) for k in (1, 2, 3, 4, 5)]
+    assert stamps == sorted(stamps)
+    assert stamps[0] == T0 - datetime.timedelta(seconds=120) and stamps[-1] == T0
+
+
+def test_gaps_indexes_cover_the_per_game_event_read():
+    async def run():
+        gaps = AsyncMongoMockClient()["betting_db"][GAPS_COLLECTION_NAME]
+        await ensure_gaps_indexes(gaps)
+        await ensure_gaps_indexes(gaps)  # Idempotent (runs at every startup)
+        return await gaps.index_information()
+
+    indexes = asyncio.run(run())
+    assert indexes["game_detected_at_desc"]["key"] == [("game_code", 1), ("detected_at", -1)]
+
+
+class CollectionWriter:
+    """Write-behind stand-in that inserts straight into the (mongomock) collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.submitted = []
+
+    async def submit(self, doc):
+        self.submitted.append(doc["period"])
+        await self.collection.insert_one(dict(doc))
+
+
+def _process_with_hole(monkeypatch, game_code, visible):
+    """Stored P..P+9, then the round P+12 arrives with the history rows `visible` (periods, newest first)."""
+    db = AsyncMongoMockClient()["betting_db"]
+    collection, gaps = db["game_results"], db[GAPS_COLLECTION_NAME]
+    writer = CollectionWriter(collection)
+    trained = []
+    real_update_model = model_updater.update_model
+
+    async def update_model(result, coll, code):
+        trained.append(result["period"])
+        return await real_update_model(result, coll, code)
+
+    monkeypatch.setattr(bdg_ocr_pipeline, "collection", collection)
+    monkeypatch.setattr(bdg_ocr_pipeline, "gaps", gaps)
+    monkeypatch.setattr(bdg_ocr_pipeline, "writer", writer)
+    monkeypatch.setattr(bdg_ocr_pipeline, "update_model", update_model)
+    monkeypatch.setattr(bdg_ocr_pipeline, "schedule_checkpoint", lambda *args: None)
+
+    async def run():
+        await collection.insert_many([dict(_row(P + k, k % 10), game_code=game_code,
+                                           timestamp=T0 + datetime.timedelta(seconds=180 * k)) for k in range(10)])
+        await history_for(game_code).load(collection)
+        current = dict(_row(P + 12, 7), timestamp=T0 + datetime.timedelta(seconds=180 * 12),
+                       _rows=[_row(p, p % 10) for p in visible])
+        stored = await bdg_ocr_pipeline.process_result(current, game_code)
+        events = await gaps.find({}, {"_id": 0}).to_list(None)
+        docs = await collection.find({"period": {"$gt": str(P + 9)}}, {"_id": 0}).sort("timestamp", 1).to_list(None)
+        return stored, events, docs
+
+    stored, events, docs = asyncio.run(run())
+    assert stored
+    return writer.submitted, trained, events, docs
+
+
+def test_process_result_backfills_the_hole_before_the_current_round(monkeypatch):
+    submitted, trained, events, docs = _process_with_hole(
+        monkeypatch, "WinGo_3M", [P + 12, P + 11, P + 10, P + 9, P + 8])
+    assert submitted == trained == [str(P + 10), str(P + 11), str(P + 12)]
+    assert [d["period"] for d in docs] == [str(P + 10), str(P + 11), str(P + 12)]  # Timestamps follow periods
+    assert [d.get("backfilled", False) for d in docs] == [True, True, False]
+    assert len(events) == 1
+    assert {k: events[0][k] for k in ("game_code", "after", "before", "missing", "backfilled", "lost")} == {
+        "game_code": "WinGo_3M", "after": str(P + 9), "before": str(P + 12), "missing": 2, "backfilled": 2, "lost": 0}
+
+
+def test_process_result_reports_rounds_no_longer_visible_as_lost(monkeypatch):
+    submitted, trained, events, _ = _process_with_hole(monkeypatch, "WinGo_5M", [P + 12, P + 11])
+    assert submitted == trained == [str(P + 11), str(P + 12)]
+    assert (events[0]["missing"], events[0]["backfilled"], events[0]["lost"]) == (2, 1, 1)
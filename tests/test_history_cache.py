@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from bench import synthetic_rounds
+from history_cache import RoundHistoryCache
+from utils import RollingFeatureState
+
+GAME = "WinGo_30S"
+T0 = datetime.datetime(2025, 1, 1)
+
+
+def _docs(n, start=0, game_code=GAME):
+    return [dict(doc, game_code=game_code, timestamp=T0 + datetime.timedelta(seconds=30 * i))
+            for i, doc in enumerate(synthetic_rounds(start + n))][start:]
+
+
+def _collection():
+    return AsyncMongoMockClient()["betting_db"]["game_results"]
+
+
+def _periods(cache):
+    return [r.period for r in cache.rounds()]
+
+
+def test_cold_load_keeps_last_n_rounds_of_its_game():
+    docs = _docs(30)
+
+    async def run():
+        collection = _collection()
+        await collection.insert_many([dict(d) for d in docs] + [dict(d, game_code="WinGo_1M") for d in _docs(5, 30)])
+        cache = RoundHistoryCache(maxlen=10, game_code=GAME)
+        assert not cache.loaded and len(cache) == 0
+        await cache.ensure_loaded(collection)
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache.loaded and not cache.stale
+    assert _periods(cache) == [d["period"] for d in docs[-10:]]
+    assert cache.state.length == 10
+    assert cache.last().period == docs[-1]["period"]
+
+
+def test_append_past_capacity_matches_a_reload():
+    docs = _docs(25)
+
+    async def run():
+        collection = _collection()
+        await collection.insert_many([dict(d) for d in docs[:5]])
+        cache = RoundHistoryCache(maxlen=10, game_code=GAME)
+        await cache.load(collection)
+        for doc in docs[5:]:
+            await collection.insert_one(dict(doc))
+            cache.append(doc)
+        reloaded = await RoundHistoryCache(maxlen=10, game_code=GAME).load(collection)
+        return cache, reloaded
+
+    cache, reloaded = asyncio.run(run())
+    assert not cache.stale
+    assert len(cache) == 10
+    assert _periods(cache) == _periods(reloaded) == [d["period"] for d in docs[-10:]]
+    probe = dict(docs[0], number=int(docs[0]["number"]))
+    assert cache.features(probe) == reloaded.features(probe)
+    assert cache.features(probe) == RollingFeatureState(10).warm_up(docs[-10:]).features(probe)
+
+
+def test_out_of_order_append_marks_stale_and_resyncs():
+    docs = _docs(12)
+
+    async def run():
+        collection = _collection()
+        await collection.insert_many([dict(d) for d in docs])
+        cache = RoundHistoryCache(maxlen=10, game_code=GAME)
+        await cache.ensure_loaded(collection)
+
+        # A period at or before the newest cached one disagrees with the DB order
+        cache.append(dict(docs[3], timestamp=None))
+        assert cache.stale
+        await cache.ensure_loaded(collection)
+        return cache
+
+    cache = asyncio.run(run())
+    assert not cache.stale
+    assert _periods(cache) == [d["period"] for d in docs[-10:]]
+
+
+def test_ensure_loaded_does_not_requery_a_fresh_cache():
+    async def run():
+        collection = _collection()
+        await collection.insert_many([dict(d) for d in _docs(3)])
+        cache = RoundHistoryCache(maxlen=10, game_code=GAME)
+        await cache.ensure_loaded(collection)
+        await collection.insert_many([dict(d) for d in _docs(3, 3)])  # Written elsewhere, not appended
+        await cache.ensure_loaded(collection)
+        before = len(cache)
+        await cache.resync(collection)
+        return before, len(cache)
+
+    assert asyncio.run(run()) == (3, 6)
+
+
+def test_has_period_sees_only_cached_rounds():
+    docs = _docs(15)
+    cache = RoundHistoryCache(maxlen=10, game_code=GAME)
+    for doc in docs:
+        cache.append(doc)
+    assert cache.has_period(docs[-1]["period"])
+    assert cache.has_period(docs[5]["period"])
+    assert not cache.has_period(docs[4]["period"])     # Evicted past capacity
+    assert not cache.has_period("20990101000000000")
+    assert not cache.has_period("Unknown")
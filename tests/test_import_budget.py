@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bench import IMPORT_BUDGETS, _import_once
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_entry_module_does_not_import_heavy_packages(module):
+    """Importing the API / ingestion entry modules must leave river, selenium, OCR etc. unloaded."""
+    forbidden = IMPORT_BUDGETS[module][1]
+    code = f"import sys, {module}; print(','.join(m for m in {list(forbidden)!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    assert proc.stdout.strip() == "", f"import {module} loaded: {proc.stdout.strip()}"
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_entry_module_imports_within_its_time_budget(module):
+    """Cumulative `python -X importtime` seconds, best of 3 fresh interpreters (as `bench.py importtime`)."""
+    budget, forbidden = IMPORT_BUDGETS[module]
+    runs = [_import_once(module, forbidden) for _ in range(3)]
+    best = min(seconds for seconds, _ in runs)
+    assert best <= budget, f"import {module} took {best:.3f}s (budget {budget}s)"
+    assert not {m for _, loaded in runs for m in loaded}
+
+
+def test_budgets_cover_the_heavy_packages():
+    for module in ("main", "bdg_ocr_pipeline"):
+        assert {"river", "selenium", "pytesseract"} <= set(IMPORT_BUDGETS[module][1])
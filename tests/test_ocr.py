@@ -0,0 +1,28 @@
+import asyncio
+
+from PIL import Image, ImageDraw
+
+from ocr import OCRService, crop_key
+
+
+def _crop(text="20250601100010001 3"):
+    img = Image.new("RGB", (460, 54), "white")
+    ImageDraw.Draw(img).text((10, 20), text, fill="black")
+    return img
+
+
+def test_crop_key_is_exact_match_only():
+    a = _crop()
+    b = a.copy()
+    b.putpixel((200, 2), (250, 250, 250))  # One barely visible pixel
+    assert crop_key(a) == crop_key(a.copy())
+    assert crop_key(a) != crop_key(b)
+    assert crop_key(a) != crop_key(_crop("20250601100010002 3"))
+
+
+def test_identical_crop_is_answered_from_the_cache():
+    service = OCRService()
+    service._cache_put(crop_key(_crop()), "20250601100010001 3")
+    assert asyncio.run(service.read(_crop())) == "20250601100010001 3"
+    assert (service.cache_hits, service.cache_misses) == (1, 0)
+    assert service._executor is None  # No worker process was started
@@ -0,0 +1,44 @@
+import asyncio
+import datetime
+
+import bdg_ocr_pipeline
+from history_cache import history_for
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.submitted = []
+
+    async def submit(self, doc):
+        self.submitted.append(doc)
+
+
+def _result(period, number="3"):
+    return {"period": period, "number": number, "color": "Green", "size": "Small",
+            "timestamp": datetime.datetime(2025, 6, 1, 12, 0, 0)}
+
+
+def test_rounds_without_a_period_are_neither_trained_nor_stored(monkeypatch):
+    writer = RecordingWriter()
+    trained = []
+
+    async def update_model(result, collection, game_code):
+        trained.append(result["period"])
+        return {"prob_red": 0.4, "prob_green": 0.4, "prob_violet": 0.2, "prob_big": 0.5, "prob_small": 0.5,
+                "prob_numbers": {str(n): 0.1 for n in range(10)}}
+
+    monkeypatch.setattr(bdg_ocr_pipeline, "writer", writer)
+    monkeypatch.setattr(bdg_ocr_pipeline, "update_model", update_model)
+    monkeypatch.setattr(bdg_ocr_pipeline, "schedule_checkpoint", lambda *args: None)
+    game_code = "WinGo_test_no_period"
+
+    async def run():
+        outcomes = []
+        for period in ("Unknown", None, "2025060110001x", "20250601100010001", "Unknown"):
+            outcomes.append(await bdg_ocr_pipeline.process_result(_result(period), game_code))
+        return outcomes
+
+    assert asyncio.run(run()) == [False, False, False, True, False]
+    assert trained == ["20250601100010001"]
+    assert [doc["period"] for doc in writer.submitted] == ["20250601100010001"]
+    assert history_for(game_code).has_period("20250601100010001")
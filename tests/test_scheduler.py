@@ -0,0 +1,73 @@
+import random
+
+from gaps import missing_count
+from scheduler import ROUND_SECONDS, RoundScheduler, SimulatedClock, SyntheticRoundSource, simulate
+
+
+class LateRoundSource(SyntheticRoundSource):
+    """Synthetic source where some rounds' periods show up `delay` seconds after their boundary."""
+
+    def __init__(self, clock, late, **kwargs):
+        super().__init__(clock, **kwargs)
+        self.late = late    # period offset -> delay in seconds
+
+    def period_at(self, t):
+        period = int(super().period_at(t))
+        delay = self.late.get(period - self.first_period, 0.0)
+        if delay and int(super().period_at(t - delay)) < period:
+            period -= 1     # Boundary passed, but the new period is not on the page yet
+        return str(period)
+
+
+def _run(source, clock, rounds, processing):
+    scheduler = RoundScheduler(clock=clock)
+    seen = []
+    while len(seen) < rounds:
+        period = scheduler.wait_for_new_round(source.probe, clock.sleep)
+        if period is None:
+            continue
+        seen.append(period)
+        clock.sleep(processing(len(seen)))
+        scheduler.record_stored()
+    return scheduler, seen
+
+
+def test_simulation_processes_every_round_once():
+    report = simulate(rounds=200, processing=(0.5, 6.0), seed=1)
+    assert report["rounds"] == 200
+    assert report["missed_periods"] == 0
+    assert report["duplicates"] == 0
+    assert report["polls_per_round"] <= 4
+    assert report["close_to_stored"]["count"] == 200
+
+
+def test_late_round_is_still_picked_up():
+    clock = SimulatedClock()
+    source = LateRoundSource(clock, late={5: 4.0, 9: 7.5})
+    rng = random.Random(2)
+    scheduler, seen = _run(source, clock, 20, lambda n: rng.uniform(0.5, 3.0))
+
+    numbers = [int(p) for p in seen]
+    assert numbers == list(range(numbers[0], numbers[0] + 20))
+    assert scheduler.missed == 0
+
+
+def test_missing_rounds_are_detected():
+    clock = SimulatedClock()
+    source = SyntheticRoundSource(clock)
+    # Processing round 10 takes over two round lengths: the page moves on twice, one round is never seen
+    scheduler, seen = _run(source, clock, 20, lambda n: 2 * ROUND_SECONDS + 5 if n == 10 else 1.0)
+
+    gaps = [(a, b, missing_count(a, b)) for a, b in zip(seen, seen[1:]) if missing_count(a, b)]
+    assert gaps == [(seen[9], seen[10], 1)]
+    assert len(set(seen)) == len(seen)
+
+
+def test_round_that_never_appears_ends_the_burst():
+    clock = SimulatedClock()
+    source = LateRoundSource(clock, late={3: 25.0})  # Outside the burst window
+    scheduler, seen = _run(source, clock, 6, lambda n: 1.0)
+
+    assert scheduler.missed >= 1
+    numbers = [int(p) for p in seen]
+    assert numbers == sorted(set(numbers))          # Never a duplicate or a step back
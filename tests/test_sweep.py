@@ -0,0 +1,15 @@
+import numpy as np
+
+from batch_features import extract_features_batch
+from bench import synthetic_rounds
+from replay import _to_model_round
+from sweep import build_stream, feature_chunks
+
+
+def test_feature_chunks_match_one_matrix_over_all_rounds():
+    numbers, colors, sizes = build_stream([_to_model_round(doc) for doc in synthetic_rounds(1200, seed=3)])
+    full = extract_features_batch(numbers, colors, sizes)
+    for start, chunk in ((0, 1200), (0, 37), (5, 250), (150, 99)):
+        parts = list(feature_chunks(numbers, colors, sizes, start, chunk))
+        assert [lo for lo, _ in parts] == list(range(start, 1200, chunk))
+        np.testing.assert_array_equal(np.concatenate([X for _, X in parts]), full[start:])
@@ -0,0 +1,174 @@
+import asyncio
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from write_behind import DUPLICATE_KEY, WriteBehindWriter
+
+GAME = "WinGo_30S"
+
+
+class FakeCollection:
+    """
+    insert_many with the unique (game_code, period) index: duplicates come
+    back as a BulkWriteError, and `fail_calls` lists the insert_many call
+    numbers (1-based) that raise AutoReconnect without writing anything.
+    """
+
+    def __init__(self, fail_calls=()):
+        self.stored = {}
+        self.inserts = {}           # key -> times a write actually stored it
+        self.calls = 0
+        self.fail_calls = set(fail_calls)
+        self.down = False
+        self.gate = None            # asyncio.Event an insert waits on (if set)
+
+    async def insert_many(self, docs, ordered=False):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.down or self.calls in self.fail_calls:
+            raise AutoReconnect("connection refused")
+        errors, inserted = [], 0
+        for i, doc in enumerate(docs):
+            key = (doc["game_code"], doc["period"])
+            if key in self.stored:
+                errors.append({"index": i, "code": DUPLICATE_KEY, "errmsg": "E11000 duplicate key"})
+                continue
+            self.stored[key] = dict(doc)
+            self.inserts[key] = self.inserts.get(key, 0) + 1
+            inserted += 1
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": inserted})
+
+
+def _rounds(start, n):
+    return [{"game_code": GAME, "period": str(20250101100010000 + i), "number": str(i % 10)}
+            for i in range(start, start + n)]
+
+
+def _writer(collection, tmp_path, notified, **kwargs):
+    async def on_written(docs):
+        notified.extend(d["period"] for d in docs)
+
+    return WriteBehindWriter(collection, batch_size=3, flush_interval=0.01, retry_interval=0.0,
+                             spill_path=str(tmp_path / "spill.ndjson"), on_written=on_written, **kwargs)
+
+
+def test_duplicates_count_as_stored_and_are_not_notified(tmp_path):
+    collection, notified = FakeCollection(), []
+    writer = _writer(collection, tmp_path, notified)
+    docs = _rounds(0, 3)
+
+    async def run():
+        await writer.flush([docs[1]])
+        return await writer.flush([dict(d) for d in docs])
+
+    assert asyncio.run(run()) is True
+    assert writer.duplicates == 1 and writer.written == 3 and writer.spilled == 0
+    assert not writer.degraded
+    assert notified == [docs[1]["period"], docs[0]["period"], docs[2]["period"]]
+
+
+def test_spill_recover_and_spill_again_during_replay(tmp_path):
+    collection, notified = FakeCollection(), []
+    writer = _writer(collection, tmp_path, notified, queue_size=1)
+    a, b, c = _rounds(0, 3), _rounds(3, 3), _rounds(6, 3)
+
+    async def run():
+        # 1. MongoDB down: the batch goes to the spill file
+        collection.down = True
+        assert await writer.flush(a) is False
+        assert writer.degraded and writer.spilled == 3
+
+        # 2. MongoDB back; while the spill file is being replayed (insert held
+        #    open), a full queue spills two more rounds to a fresh spill file
+        collection.down = False
+        collection.gate = asyncio.Event()
+        replay = asyncio.create_task(writer.try_recover(force=True))
+        await asyncio.sleep(0.01)
+        assert (tmp_path / "spill.ndjson.replaying").exists()
+        for doc in b:
+            await writer.submit(doc)                  # b[0] queued, b[1:] spilled
+        collection.gate.set()
+        collection.gate = None
+        assert await replay is False                  # Replayed, but spilled again meanwhile
+        assert writer.replayed == 3 and writer.degraded
+
+        # 3. The first replay of the new file fails; the next write retries it
+        collection.fail_calls = {collection.calls + 1}
+        assert await writer.try_recover(force=True) is False
+        assert await writer.flush(c) is True          # Replays b[1:], then writes c directly
+        assert not writer.degraded
+
+        # 4. close() writes what is still queued (b[0])
+        await writer.close()
+
+    asyncio.run(run())
+
+    everything = a + b + c
+    assert set(collection.stored) == {(GAME, doc["period"]) for doc in everything}
+    assert all(count == 1 for count in collection.inserts.values())
+    # on_written saw every round exactly once, and only after it was stored
+    assert sorted(notified) == sorted(doc["period"] for doc in everything)
+    assert writer.duplicates == 0
+    assert not (tmp_path / "spill.ndjson").exists()
+    assert not (tmp_path / "spill.ndjson.replaying").exists()
+
+
+def test_replay_resumes_after_a_failure_part_way_through(tmp_path):
+    collection, notified = FakeCollection(), []
+    writer = _writer(collection, tmp_path, notified)
+    first, second = _rounds(0, 3), _rounds(3, 3)
+
+    async def run():
+        collection.down = True
+        await writer.flush(first + second)            # One spill file, two replay batches
+        collection.down = False
+        collection.fail_calls = {collection.calls + 2}
+        assert await writer.try_recover(force=True) is False     # first replayed, second failed
+        assert (tmp_path / "spill.ndjson.replaying").exists()
+        assert await writer.try_recover(force=True) is True      # Whole file again: first are duplicates
+
+    asyncio.run(run())
+    assert writer.duplicates == 3 and writer.replayed == 6
+    assert all(count == 1 for count in collection.inserts.values())
+    assert sorted(notified) == sorted(doc["period"] for doc in first + second)
+
+
+def test_close_drains_the_inflight_batch(tmp_path):
+    collection, notified = FakeCollection(), []
+    writer = _writer(collection, tmp_path, notified)
+    docs = _rounds(0, 5)
+
+    async def run():
+        collection.gate = asyncio.Event()             # The first insert_many blocks
+        writer.start()
+        for doc in docs:
+            await writer.submit(doc)
+        while collection.calls == 0:
+            await asyncio.sleep(0.005)
+        assert writer._inflight                       # A batch is off the queue, mid-write
+        collection.gate.set()
+        collection.gate = None
+        await writer.close()
+
+    asyncio.run(run())
+    assert set(collection.stored) == {(GAME, doc["period"]) for doc in docs}
+    assert sorted(notified) == sorted(doc["period"] for doc in docs)
+    assert writer.spilled == 0
+
+
+def test_spilled_rounds_drop_the_failed_insert_id(tmp_path):
+    # insert_many assigns _id before sending; a replay must not reuse it (/stream tails by _id)
+    collection, notified = FakeCollection(), []
+    writer = _writer(collection, tmp_path, notified)
+    docs = [dict(doc, _id=f"stale-{i}") for i, doc in enumerate(_rounds(0, 3))]
+
+    async def run():
+        collection.down = True
+        await writer.flush(docs)
+
+    asyncio.run(run())
+    writer.spill_queued()
+    spilled = (tmp_path / "spill.ndjson").read_text().splitlines()
+    assert len(spilled) == 3 and all('"_id"' not in line for line in spilled)
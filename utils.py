@@ -1,11 +1,15 @@
 # utils.py
 
-async def get_last_n_rounds(n=100, collection=None):
+from round_record import BIG, GREEN, RED, SMALL, UNKNOWN, Round, as_round, color_code, size_code
+
+async def get_last_n_rounds(n=100, collection=None, game_code=None):
     """
-    Get the last n rounds for sequence-based features (default n=100).
+    Get the last n rounds for sequence-based features (default n=100),
+    optionally restricted to one game_code.
     Includes CRITICAL PRE-PROCESSING to convert string numbers from MongoDB into integers.
     """
-    rounds = await collection.find().sort("timestamp", -1).limit(n).to_list(n)
+    query = {"game_code": game_code} if game_code else {}
+    rounds = await collection.find(query).sort("timestamp", -1).limit(n).to_list(n)
     
     # CRITICAL PRE-PROCESSING: Convert fields for safe feature engineering
     for r in rounds:
@@ -104,4 +108,188 @@ def extract_features(rounds, current_round):
             
     features["current_color_streak"] = color_streak
     
-    return features
\ No newline at end of file
+    return features
+
+# -------------------- Incremental Feature Engine --------------------
+
+def _current_codes(current_round):
+    """(number, color code, size code) of the round being predicted (Round or dict)."""
+    if isinstance(current_round, Round):
+        return current_round.number, current_round.color, current_round.size
+    return current_round.get("number"), color_code(current_round.get("color")), size_code(current_round.get("size"))
+
+
+class RollingFeatureState:
+    """
+    Stateful, O(1)-per-round equivalent of extract_features.
+
+    Keeps a ring buffer of the last `maxlen` rounds (int number plus the
+    round_record color/size codes) and running counters for the 10/50/100
+    windows and the color streak, so pushing a round never rescans the
+    history. `features(current_round)` returns exactly the dict
+    extract_features(history, current_round) would build.
+    """
+
+    SHORT_WINDOW = 10
+    MEDIUM_WINDOW = 50
+    LAG_WINDOW = 5
+
+    def __init__(self, maxlen=100):
+        self.maxlen = maxlen
+        self.reset()
+
+    def reset(self):
+        self._numbers = [None] * self.maxlen
+        self._colors = [UNKNOWN] * self.maxlen
+        self._sizes = [UNKNOWN] * self.maxlen
+        self._head = 0      # Next write slot in the ring buffer
+        self.length = 0     # Rounds currently held (<= maxlen)
+
+        # Running window counters
+        self._red_full = 0
+        self._big_full = 0
+        self._big_50 = 0
+        self._red_10 = 0
+        self._green_10 = 0
+        self._big_10 = 0
+        self._small_10 = 0
+
+        # Running streak of the most recent color
+        self._last_color = None
+        self._streak = 0
+
+    def _slot(self, back):
+        """Ring buffer index of the round `back` positions from the newest (1 = newest)."""
+        return (self._head - back) % self.maxlen
+
+    def _window_add(self, color, size, sign):
+        self._red_10 += sign * (color == RED)
+        self._green_10 += sign * (color == GREEN)
+        self._big_10 += sign * (size == BIG)
+        self._small_10 += sign * (size == SMALL)
+
+    def append(self, r):
+        """Add a completed round (Round or stored document) to the history, updating every counter in O(1)."""
+        r = as_round(r)
+        number, color, size = r.number, r.color, r.size
+
+        # 1. Evict the rounds leaving each window (before overwriting the slot)
+        if self.length == self.maxlen:
+            old = self._head
+            self._red_full -= self._colors[old] == RED
+            self._big_full -= self._sizes[old] == BIG
+        if self.length >= self.MEDIUM_WINDOW:
+            old = self._slot(self.MEDIUM_WINDOW)
+            self._big_50 -= self._sizes[old] == BIG
+        if self.length >= self.SHORT_WINDOW:
+            old = self._slot(self.SHORT_WINDOW)
+            self._window_add(self._colors[old], self._sizes[old], -1)
+
+        # 2. Write the new round
+        self._numbers[self._head] = number
+        self._colors[self._head] = color
+        self._sizes[self._head] = size
+        self._head = (self._head + 1) % self.maxlen
+        self.length = min(self.length + 1, self.maxlen)
+
+        self._red_full += color == RED
+        self._big_full += size == BIG
+        self._big_50 += size == BIG
+        self._window_add(color, size, 1)
+
+        # 3. Running streak (extract_features only counts within the stored history)
+        if color == self._last_color:
+            self._streak += 1
+        else:
+            self._last_color = color
+            self._streak = 1
+
+    def warm_up(self, rounds):
+        """Replay a stored history (oldest first) to rebuild the state."""
+        self.reset()
+        for r in rounds:
+            self.append(r)
+        return self
+
+    def features(self, current_round):
+        """Build the feature dict for `current_round` (Round or dict) against the current history."""
+        number, current_color, current_size = _current_codes(current_round)
+        features = {
+            "number": number,
+            "is_big": 1 if current_size == BIG else 0,
+        }
+
+        # Zig-Zag pattern over the three most recent sizes
+        is_alternating_3 = 0
+        if self.length >= 3:
+            s1 = self._sizes[self._slot(1)]
+            s2 = self._sizes[self._slot(2)]
+            s3 = self._sizes[self._slot(3)]
+            if s1 != s2 and s2 != s3:
+                is_alternating_3 = 1
+        features["is_alternating_3"] = is_alternating_3
+
+        # Lagged features (oldest lag first, matching extract_features key order)
+        lags = min(self.length, self.LAG_WINDOW)
+        for lag in range(lags, 0, -1):
+            idx = self._slot(lag)
+            features[f"lag_color_{lag}"] = 1 if self._colors[idx] == RED else 0
+            features[f"lag_size_{lag}"] = 1 if self._sizes[idx] == BIG else 0
+            if lag < lags:
+                features[f"lag_num_diff_{lag}"] = self._numbers[idx] - self._numbers[self._slot(lag + 1)]
+            else:
+                features[f"lag_num_diff_{lag}"] = 0
+
+        # Long-term ratios
+        if self.length > self.SHORT_WINDOW:
+            features["red_ratio_100"] = self._red_full / self.length
+            features["big_ratio_100"] = self._big_full / self.length
+            features["big_freq_50"] = self._big_50 / min(self.length, self.MEDIUM_WINDOW)
+
+        # Short-term frequency
+        features["red_freq_10"] = self._red_10
+        features["green_freq_10"] = self._green_10
+        features["big_freq_10"] = self._big_10
+        features["small_freq_10"] = self._small_10
+
+        # Current streak length
+        streak = min(self._streak, self.length) if current_color == self._last_color else 0
+        features["current_color_streak"] = streak
+
+        return features
+
+    def push(self, current_round):
+        """Build features for `current_round`, then add it to the history."""
+        features = self.features(current_round)
+        self.append(current_round)
+        return features
+
+
+# -------------------- Derived Prediction Fields --------------------
+
+def derive_prediction_fields(record):
+    """
+    Model guess and match flags for a stored round (dashboard fields).
+    Computed once at write time (or by the backfill migration) so /latest_data
+    only has to project them.
+    """
+    # Determine the model's color guess
+    max_color_prob = max(record.get('prob_red', 0), record.get('prob_green', 0), record.get('prob_violet', 0))
+    if max_color_prob == record.get('prob_red'):
+        predicted_color = 'Red'
+    elif max_color_prob == record.get('prob_green'):
+        predicted_color = 'Green'
+    elif max_color_prob == record.get('prob_violet'):
+        predicted_color = 'Violet'
+    else:
+        predicted_color = 'Unknown'
+
+    # Determine the model's size guess
+    predicted_size = 'Big' if record.get('prob_size_big', 0.5) > 0.5 else 'Small'
+
+    return {
+        "predicted_color": predicted_color,
+        "predicted_size": predicted_size,
+        "color_match": predicted_color.lower() == (record.get('color') or '').lower(),
+        "size_match": predicted_size.lower() == (record.get('size') or '').lower(),
+    }
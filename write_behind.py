@@ -0,0 +1,260 @@
+# write_behind.py (WRITE-BEHIND ROUND PERSISTENCE)
+#
+# The ingestion loop hands each finished round to a WriteBehindWriter instead
+# of awaiting insert_one. A background task drains the bounded queue in batches
+# with unordered insert_many; the unique (game_code, period) index makes every
+# write idempotent, so a batch can safely be retried. While MongoDB is
+# unreachable (or the queue is full) rounds are appended to a local spill file,
+# which is replayed into MongoDB once it is reachable again.
+
+import asyncio
+import os
+import time
+
+from bson import json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from jsonlog import log
+from metrics import StageMetrics, histogram
+
+SPILL_PATH = os.environ.get("BDG_SPILL_PATH", "spill/game_results.ndjson")
+QUEUE_SIZE = 1000        # Rounds buffered in memory before spilling to disk
+BATCH_SIZE = 100         # Max rounds per insert_many
+FLUSH_INTERVAL = 1.0     # Seconds to wait for more rounds before flushing a partial batch
+RETRY_INTERVAL = 5.0     # Seconds between reconnect attempts while degraded
+
+DUPLICATE_KEY = 11000
+
+INSERT_SECONDS = histogram("bdg_mongo_insert_seconds", "insert_many of one write-behind batch.")
+
+
+def _spill_lines(docs):
+    """
+    NDJSON lines for the spill file. The _id a failed insert_many assigned is
+    dropped: the replay gets a fresh (newer) one, so /stream's _id tail picks
+    the round up; the unique (game_code, period) index still rejects a round
+    that did reach MongoDB.
+    """
+    return [json_util.dumps({k: v for k, v in doc.items() if k != "_id"}) + "\n" for doc in docs]
+
+
+class WriteBehindWriter:
+    """
+    Bounded write-behind queue in front of `collection`.
+
+    `submit(doc)` never waits on MongoDB. `run()` is the background flusher;
+    `close()` drains the queue (spilling whatever cannot be written) on shutdown.
+    """
+
+    def __init__(self, collection, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, retry_interval=RETRY_INTERVAL, spill_path=SPILL_PATH,
+                 on_written=None):
+        self.collection = collection
+        self.on_written = on_written    # async fn(docs) called with the rounds each insert actually stored
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.spill_path = spill_path
+        self.replay_path = spill_path + ".replaying"
+
+        self._queue = None
+        self._task = None
+        self._inflight = None     # Batch taken off the queue but not yet written or spilled
+        self._last_retry = 0.0
+        # Rounds on disk must reach MongoDB before new ones are written directly
+        self.degraded = os.path.exists(self.spill_path) or os.path.exists(self.replay_path)
+
+        self.flush_latency = StageMetrics("flush")
+        self.max_queue_depth = 0
+        self.written = 0        # Rounds inserted into MongoDB
+        self.duplicates = 0     # Rounds already stored (retries / replays)
+        self.rejected = 0       # Rounds MongoDB refused for another reason (logged)
+        self.spilled = 0        # Rounds appended to the spill file
+        self.replayed = 0       # Spilled rounds written back to MongoDB
+
+    @property
+    def queue(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # --- Producer side ---
+    async def submit(self, doc):
+        """Queue one round for writing; spills it to disk if the queue is full."""
+        try:
+            self.queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            log("write_queue_full", "warning", queue_size=self.queue_size, period=doc.get("period"))
+            await self._spill([doc])
+            return
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    # --- Flusher ---
+    async def _next_batch(self):
+        """Wait for the first round, then collect more for up to flush_interval."""
+        batch = self._inflight = [await self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _insert(self, batch):
+        """
+        Unordered insert_many. Returns True once every round is stored (or was
+        already); raises PyMongoError if MongoDB could not be reached.
+        """
+        started = time.monotonic()
+        inserted = batch
+        try:
+            with INSERT_SECONDS.time():
+                await self.collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            dupes = [err for err in errors if err.get("code") == DUPLICATE_KEY]
+            self.written += e.details.get("nInserted", 0)
+            self.duplicates += len(dupes)
+            for err in errors:
+                if err.get("code") != DUPLICATE_KEY:
+                    self.rejected += 1
+                    log("round_rejected", "error", period=batch[err["index"]].get("period"), error=err.get("errmsg"))
+            failed = {err["index"] for err in errors}
+            inserted = [doc for i, doc in enumerate(batch) if i not in failed]
+        finally:
+            self.flush_latency.observe(time.monotonic() - started)
+        if self.on_written is not None and inserted:
+            await self.on_written(inserted)
+        return True
+
+    async def flush(self, batch):
+        """Write one batch, or spill it if MongoDB is down (or spilled rounds are still pending)."""
+        if self.degraded and not await self.try_recover():
+            await self._spill(batch)
+            return False
+        try:
+            return await self._insert(batch)
+        except PyMongoError as e:
+            log("write_failed", "error", error_type=e.__class__.__name__, error=str(e), spilled=len(batch))
+            self.degraded = True
+            self._last_retry = time.monotonic()
+            await self._spill(batch)
+            return False
+
+    async def run(self):
+        """Background flusher: drain the queue in batches until cancelled."""
+        if self.degraded:
+            await self.try_recover(force=True)
+        while True:
+            batch = await self._next_batch()
+            await self.flush(batch)
+            self._inflight = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def close(self):
+        """Stop the flusher and write (or spill) everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        docs = self._take_pending()
+        for i in range(0, len(docs), self.batch_size):
+            await self.flush(docs[i:i + self.batch_size])
+
+    def _take_pending(self):
+        """Everything not yet written: the interrupted batch (re-inserting is a no-op) plus the queue."""
+        docs = self._inflight or []
+        self._inflight = None
+        while self._queue is not None and not self._queue.empty():
+            docs.append(self._queue.get_nowait())
+        return docs
+
+    def spill_queued(self):
+        """Synchronously spill whatever is still pending (e.g. after the event loop died)."""
+        docs = self._take_pending()
+        if docs:
+            self._append_lines(_spill_lines(docs))
+            self.spilled += len(docs)
+            log("rounds_spilled", "warning", rounds=len(docs), path=self.spill_path)
+        return len(docs)
+
+    # --- Spill file ---
+    def _append_lines(self, lines):
+        os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _spill(self, docs):
+        lines = _spill_lines(docs)
+        await asyncio.to_thread(self._append_lines, lines)
+        self.spilled += len(docs)
+        self.degraded = True
+
+    def _read_replay_file(self):
+        with open(self.replay_path, encoding="utf-8") as f:
+            return [json_util.loads(line) for line in f if line.strip()]
+
+    async def try_recover(self, force=False):
+        """
+        Replay spilled rounds into MongoDB (at most every retry_interval unless
+        forced). Returns True when nothing is left on disk.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_retry < self.retry_interval:
+            return False
+        self._last_retry = now
+
+        # New spills keep going to spill_path while the previous file is replayed
+        if not os.path.exists(self.replay_path):
+            if not os.path.exists(self.spill_path):
+                self.degraded = False
+                return True
+            os.replace(self.spill_path, self.replay_path)
+
+        docs = await asyncio.to_thread(self._read_replay_file)
+        try:
+            for i in range(0, len(docs), self.batch_size):
+                await self._insert(docs[i:i + self.batch_size])
+        except PyMongoError as e:
+            # Keep the file; re-inserting rounds already written is a no-op
+            log("replay_failed", "error", error_type=e.__class__.__name__, spilled=len(docs))
+            return False
+
+        os.remove(self.replay_path)
+        self.replayed += len(docs)
+        log("spill_replayed", rounds=len(docs))
+        if os.path.exists(self.spill_path):
+            return False  # Spilled again meanwhile: replay that file on the next attempt
+        self.degraded = False
+        return True
+
+    def metrics_summary(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "flush": self.flush_latency.summary(),
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "degraded": self.degraded,
+        }